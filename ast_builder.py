@@ -1,7 +1,15 @@
 from lark import Transformer
 
+from indicator_specs import INDICATOR_ARITY, INDICATOR_INPUTS, normalize_timeframe
+
 class DSLtoAST(Transformer):
 
+    # ----------------------------
+    # Root: list of (section, AST_Node)
+    # ----------------------------
+    def start(self, items):
+        return items
+
     # ----------------------------
     # ENTRY / EXIT
     # ----------------------------
@@ -11,6 +19,17 @@ class DSLtoAST(Transformer):
     def exit(self, items):
         return ("exit", items[0])
 
+    # ----------------------------
+    # STOP_LOSS / TAKE_PROFIT / TRAILING_STOP: <percent>%
+    # ----------------------------
+    def risk(self, items):
+        kind = items[0].value.rstrip(":").replace("-", "_").lower()
+        percent = float(items[1])
+        if not percent > 0 or (kind != "take_profit" and percent >= 100):
+            raise ValueError(f"{kind.upper()} must be a percentage above 0"
+                             + ("" if kind == "take_profit" else " and below 100"))
+        return ("risk", (kind, percent))
+
     # ----------------------------
     # Boolean operations
     # ----------------------------
@@ -63,24 +82,42 @@ class DSLtoAST(Transformer):
         }
 
     # ----------------------------
-    # Series like close, volume, close[1]
+    # Series like close, volume, close[1], close@1W
     # ----------------------------
     def series(self, items):
-        # items = [name] or [name, index]
+        # items = [name], optionally followed by a TIMEFRAME and / or an index
         name = items[0].value
-        if len(items) == 2:
-            return {"type": "series", "name": name, "index": int(items[1])}
-        return {"type": "series", "name": name, "index": None}
+        timeframe = None
+        if len(items) > 1 and items[1].type == "TIMEFRAME":
+            timeframe = normalize_timeframe(items[1].value)
+            items = items[:1] + items[2:]
+        node = {"type": "series", "name": name, "index": int(items[1]) if len(items) == 2 else None}
+        if timeframe is not None:       # only when given: plain series keep their AST (and hash)
+            node["timeframe"] = timeframe
+        return node
 
     # ----------------------------
-    # Indicators like SMA(close,20)
+    # Indicators like SMA(close,20), MACD(close,12,26,9)
     # ----------------------------
     def indicator(self, items):
+        name = items[0].value.upper()
+        periods = [int(item) for item in items[2:]]
+
+        if name not in INDICATOR_ARITY:
+            raise ValueError(f"Unknown indicator {name} (supported: {', '.join(INDICATOR_ARITY)})")
+        low, high = INDICATOR_ARITY[name]
+        if not low <= len(periods) <= high:
+            expected = low if low == high else f"{low} to {high}"
+            raise ValueError(f"{name} takes {expected} number(s) after the series, got {len(periods)}")
+        if name in INDICATOR_INPUTS and not (isinstance(items[1], dict) and items[1]["type"] == "series"):
+            raise ValueError(f"{name} needs a price series (e.g. {name}(close,14))")
+
         return {
             "type": "indicator",
-            "name": items[0].value.lower(),  # sma, rsi
+            "name": name.lower(),            # sma, rsi, ema, atr, macd
             "series": items[1],              # structured series node
-            "period": int(items[2]),
+            # one number → int (SMA / RSI / EMA / ATR), several → list (MACD)
+            "period": periods[0] if len(periods) == 1 else periods,
         }
 
 
@@ -98,7 +135,8 @@ def build_final_ast(tree):
     Output:
         {
             "entry": [...],
-            "exit": [...]
+            "exit": [...],
+            "risk": {"stop_loss": 5.0, ...}      (only with risk clauses)
         }
     """
     final_ast = {"entry": [], "exit": []}
@@ -108,5 +146,11 @@ def build_final_ast(tree):
             final_ast["entry"].append(ast)
         elif section == "exit":
             final_ast["exit"].append(ast)
+        elif section == "risk":
+            kind, percent = ast
+            risk = final_ast.setdefault("risk", {})
+            if kind in risk:
+                raise ValueError(f"{kind.upper()} given more than once")
+            risk[kind] = percent
 
     return final_ast
@@ -0,0 +1,191 @@
+import json
+from collections import OrderedDict
+
+from lark.lexer import Token
+
+from indicator_specs import INDICATOR_INPUTS, indicator_params
+
+
+# ============================================================
+# Common-subexpression elimination over the final AST
+# ============================================================
+#
+# Every value-producing node (series, shifted series, indicator) is
+# rewritten into a reference to a temporary.  Structurally identical
+# nodes share one temporary, across ENTRY and EXIT, so generated code
+# computes each rolling window / shift exactly once.
+#
+#   close crosses_above SMA(close,50) AND close > SMA(close,50)
+#
+#   _t0 = df['close']
+#   _t1 = INDICATOR(df, 'SMA', _t0, 50, 'close', 0, cache)
+#   _t2 = _t0.shift(1)
+#   _t3 = _t1.shift(1)
+#   entry = (((_t2 <= _t3) & (_t0 > _t1)) & (_t0 > _t1))
+#
+# Indicator definitions also carry "source": [column, lag], the key the
+# shared indicator cache (caching.py) stores their result under, and, for
+# indicators reading more columns (ATR: high / low), "inputs": the refs of
+# those columns at the series' lag.
+#
+# Temporary definitions use three node types on top of the AST ones:
+#   {"type": "column", "name": "close"}                 → df['close']
+#   {"type": "shift", "operand": ref, "periods": k}     → ref.shift(k)
+#   {"type": "ref", "name": "_t0"}                      → _t0
+#
+# Timeframe-qualified series (close@1W) read resampled bars; their shifts
+# and indicators stay on those bars, and each such value is brought back
+# to the base bars once, where a condition uses it (timeframes.py):
+#   {"type": "column", "name": "close", "timeframe": "1W"}    → TF(df, '1W')['close']
+#   {"type": "align", "operand": ref, "timeframe": "1W"}      → ALIGN(df, ref, '1W')
+# ============================================================
+
+
+def node_key(node):
+    """Canonical string for structural equality (NUMBER tokens serialize as text)."""
+    return json.dumps(node, sort_keys=True, default=str)
+
+
+class CommonSubexpressions:
+    """
+    Result of the pass:
+        temps  : OrderedDict name → definition node (in dependency order)
+        ast    : final AST whose value nodes are {"type": "ref"} nodes
+    """
+
+    def __init__(self, final_ast, prefix="_t"):
+        self.prefix = prefix
+        self.temps = OrderedDict()
+        self._names = {}        # node_key → temp name
+        self._shifts = {}       # temp name → (base temp name, periods)
+        self._origins = {}      # temp name → (column label, lag)
+        self.timeframes = {}    # temp name → timeframe of values on resampled bars
+
+        self.ast = {
+            section: [self._condition(node) for node in final_ast.get(section, [])]
+            for section in ("entry", "exit")
+        }
+
+    # ------------------------------------------------------------
+    # Temporaries
+    # ------------------------------------------------------------
+    def _temp(self, definition):
+        key = node_key(definition)
+        name = self._names.get(key)
+        if name is None:
+            name = f"{self.prefix}{len(self.temps)}"
+            self._names[key] = name
+            self.temps[name] = definition
+        return {"type": "ref", "name": name}
+
+    def _shift(self, ref, periods):
+        if not periods:
+            return ref
+        # shift(shift(x, a), b) == shift(x, a + b): keep one canonical form
+        base, already = self._shifts.get(ref["name"], (ref["name"], 0))
+        shifted = self._temp({"type": "shift",
+                              "operand": {"type": "ref", "name": base},
+                              "periods": already + periods})
+        self._shifts[shifted["name"]] = (base, already + periods)
+        self._origins[shifted["name"]] = (self._origins[base][0], already + periods)
+        if base in self.timeframes:                 # a lookback in resampled bars
+            self.timeframes[shifted["name"]] = self.timeframes[base]
+        return shifted
+
+    def _origin(self, value):
+        """(column label, lag) of a value: 'close', 3 for close[3]."""
+        if isinstance(value, dict):
+            return self._origins[value["name"]]
+        return str(value), 0
+
+    # ------------------------------------------------------------
+    # Values: series / indicator / number
+    # ------------------------------------------------------------
+    def _value(self, operand):
+        if isinstance(operand, (Token, int, float)):
+            return operand
+
+        if isinstance(operand, str):            # legacy 'col[lag]' strings
+            col, _, lag = operand.partition("[")
+            operand = {"type": "series", "name": col,
+                       "index": int(lag.replace("]", "")) if lag else None}
+
+        if operand["type"] == "series":
+            timeframe = operand.get("timeframe")
+            if timeframe:
+                column = self._temp({"type": "column", "name": operand["name"], "timeframe": timeframe})
+                self._origins[column["name"]] = (f"{operand['name']}@{timeframe}", 0)
+                self.timeframes[column["name"]] = timeframe
+            else:
+                column = self._temp({"type": "column", "name": operand["name"]})
+                self._origins[column["name"]] = (operand["name"], 0)
+            return self._shift(column, operand.get("index") or 0)
+
+        if operand["type"] == "indicator":
+            definition = dict(operand)
+            definition["series"] = self._value(operand["series"])
+            columns = INDICATOR_INPUTS.get(operand["name"].upper())
+            if columns:
+                # same lag (and timeframe) as the series
+                inputs = [dict(operand["series"], name=column) for column in columns]
+                definition["inputs"] = [self._value(series) for series in inputs]
+            # where the input comes from, for the shared indicator cache
+            definition["source"] = list(self._origin(definition["series"]))
+            ref = self._temp(definition)
+            self._origins[ref["name"]] = (self._label(definition), 0)
+            if isinstance(definition["series"], dict) and definition["series"]["name"] in self.timeframes:
+                self.timeframes[ref["name"]] = self.timeframes[definition["series"]["name"]]
+            return ref
+
+        raise ValueError("Unsupported operand:", operand)
+
+    @staticmethod
+    def _label(indicator):
+        column, lag = indicator["source"]
+        lookback = f"[{lag}]" if lag else ""
+        params = ",".join(str(p) for p in indicator_params(indicator["period"]))
+        return f"{indicator['name'].upper()}({column}{lookback},{params})"
+
+    def _aligned(self, value):
+        """A value on the base bars: resampled values go through an align temp."""
+        if not isinstance(value, dict) or value["name"] not in self.timeframes:
+            return value
+        ref = self._temp({"type": "align", "operand": value, "timeframe": self.timeframes[value["name"]]})
+        self._origins[ref["name"]] = self._origins[value["name"]]
+        return ref
+
+    def _previous(self, value):
+        if isinstance(value, dict):
+            return self._shift(value, 1)
+        return value
+
+    # ------------------------------------------------------------
+    # Conditions
+    # ------------------------------------------------------------
+    def _condition(self, node):
+        if node["type"] in ("and", "or"):
+            return {"type": node["type"],
+                    "left": self._condition(node["left"]),
+                    "right": self._condition(node["right"])}
+
+        if node["type"] == "comparison":
+            return {"type": "comparison",
+                    "left": self._aligned(self._value(node["left"])),
+                    "operator": node["operator"],
+                    "right": self._aligned(self._value(node["right"]))}
+
+        if node["type"] == "cross":
+            left = self._aligned(self._value(node["left"]))
+            right = self._aligned(self._value(node["right"]))
+            return {"type": "cross",
+                    "direction": node["direction"],
+                    "left": left,
+                    "right": right,
+                    "left_prev": self._previous(left),
+                    "right_prev": self._previous(right)}
+
+        raise ValueError("Unknown AST node:", node)
+
+
+def eliminate_common_subexpressions(final_ast, prefix="_t"):
+    return CommonSubexpressions(final_ast, prefix)
@@ -1,20 +1,43 @@
+import warnings
+from collections.abc import Sequence
+
 import pandas as pd
 import numpy as np
 
-def backtest_signals(df, signals, initial_capital=100000.0, slippage=0.0, commission=0.0):
+from datastore import as_frame
+from instrumentation import stage
+
+BACKTEST_ENGINES = ("loop", "vectorized")
+
+# STOP_LOSS / TAKE_PROFIT / TRAILING_STOP clauses of the DSL ("risk" in the AST)
+RISK_EXITS = ("stop_loss", "take_profit", "trailing_stop")
+
+
+def backtest_signals(df, signals, initial_capital=100000.0, slippage=0.0, commission=0.0,
+                     engine="loop", stop_loss=None, take_profit=None, trailing_stop=None):
     """
     Simple backtesting engine that trades based on ENTRY and EXIT signals.
-    
+
     Args:
-        df (DataFrame): OHLCV data with columns ['open','high','low','close','volume']
+        df (DataFrame or datastore.Dataset): OHLCV data with columns ['open','high','low','close','volume']
         signals (DataFrame): Boolean DataFrame with columns ['entry','exit']
         initial_capital (float): Starting cash
         slippage (float): Per-share slippage
         commission (float): Fixed commission per trade
+        engine (str): "loop" walks every bar in Python (reference implementation),
+                      "vectorized" derives the same trades with NumPy array operations
+        stop_loss (float): exit intrabar once `low` falls this many percent below
+                           the entry price
+        take_profit (float): exit intrabar once `high` rises this many percent above it
+        trailing_stop (float): exit intrabar once `low` falls this many percent below
+                               the highest high since entry
+                               (default for all three: signals.attrs["risk"], set by
+                               strategies with STOP_LOSS / TAKE_PROFIT / TRAILING_STOP
+                               clauses; None disables)
 
     Returns:
         dict with:
-        - trades (list)
+        - trades (TradeLog: list-like of trade dicts, records as a structured array)
         - equity (Series)
         - final_capital
         - total_return_pct
@@ -22,36 +45,322 @@ def backtest_signals(df, signals, initial_capital=100000.0, slippage=0.0, commis
         - num_trades
     """
 
+    df = as_frame(df)
+
     assert 'entry' in signals.columns, "signals must include 'entry'"
     assert 'exit' in signals.columns, "signals must include 'exit'"
     assert len(df) == len(signals), "df and signals must have same length"
 
+    risk = dict(signals.attrs.get("risk") or {})
+    explicit = {"stop_loss": stop_loss, "take_profit": take_profit, "trailing_stop": trailing_stop}
+    risk.update({name: value for name, value in explicit.items() if value is not None})
     signals = signals.reindex(df.index)
 
+    with stage("backtest", rows=len(df)):
+        if engine == "loop":
+            return _backtest_loop(df, signals, initial_capital, slippage, commission, risk)
+
+        if engine == "vectorized":
+            results = _backtest_vectorized(df, signals, initial_capital, slippage, commission, risk)
+            if results is None:
+                # a fill the vectorized state machine cannot model (non-positive
+                # price or cash) -> let the reference loop decide trade by trade
+                return _backtest_loop(df, signals, initial_capital, slippage, commission, risk)
+            return results
+
+    raise ValueError(f"Unknown backtest engine: {engine!r} (expected one of {BACKTEST_ENGINES})")
+
+
+# =============================================================
+# TRADE LOG
+# =============================================================
+# One record per round trip; bars are positions into the backtested index
+# (-1 / NaN while a trade is still open)
+TRADE_DTYPE = np.dtype([
+    ("entry_bar", np.int64),
+    ("entry_fill_bar", np.int64),
+    ("entry_price", np.float64),
+    ("exit_bar", np.int64),
+    ("exit_fill_bar", np.int64),
+    ("exit_price", np.float64),
+    ("shares", np.float64),
+    ("pnl", np.float64),
+    ("return_pct", np.float64),
+])
+
+TRADE_FIELDS = ["entry_index", "entry_fill_index", "entry_price", "exit_index", "exit_fill_index",
+                "exit_price", "shares", "pnl", "return_pct"]
+
+
+class TradeLog(Sequence):
+    """
+    Trades of one backtest, stored as a TRADE_DTYPE structured array.
+
+    `records` holds the fixed-width columns (72 bytes per trade); the
+    dict format of earlier versions (string index labels, None for exit
+    fields of an open trade) is only built when asked for: indexing and
+    iterating yield those dicts, to_dicts() returns them all and
+    to_frame() gives a DataFrame with the original index labels.
+    """
+
+    def __init__(self, index, records=None, capacity=16):
+        self.index = index
+        self._records = records if records is not None else np.empty(capacity, dtype=TRADE_DTYPE)
+        self._size = len(records) if records is not None else 0
+
+    @property
+    def records(self):
+        return self._records[:self._size]
+
+    def open(self, bar, fill_bar, price, shares):
+        """Append an open trade (the loop engine)."""
+        if self._size == len(self._records):
+            self._records = np.concatenate([self._records, np.empty(max(len(self._records), 16),
+                                                                    dtype=TRADE_DTYPE)])
+        self._records[self._size] = (bar, fill_bar, price, -1, -1, np.nan, shares, np.nan, np.nan)
+        self._size += 1
+
+    def close(self, bar, fill_bar, price, pnl, return_pct):
+        """Fill in the exit of the last trade."""
+        record = self._records[self._size - 1:self._size]
+        record["exit_bar"], record["exit_fill_bar"], record["exit_price"] = bar, fill_bar, price
+        record["pnl"], record["return_pct"] = pnl, return_pct
+
+    # ------------------------------------------------------------
+    # Lazy views
+    # ------------------------------------------------------------
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._as_dict(record) for record in self.records[i]]
+        return self._as_dict(self.records[i])
+
+    def _label(self, bar):
+        return str(self.index[bar]) if bar >= 0 else None
+
+    def _as_dict(self, record):
+        is_open = record["exit_bar"] < 0
+        return {
+            "entry_index": self._label(record["entry_bar"]),
+            "entry_fill_index": self._label(record["entry_fill_bar"]),
+            "entry_price": float(record["entry_price"]),
+            "exit_index": self._label(record["exit_bar"]),
+            "exit_fill_index": self._label(record["exit_fill_bar"]),
+            "exit_price": None if is_open else float(record["exit_price"]),
+            "shares": float(record["shares"]),
+            "pnl": None if is_open else float(record["pnl"]),
+            "return_pct": None if is_open else float(record["return_pct"]),
+        }
+
+    def to_dicts(self):
+        """Every trade in the dict format (one dict per trade)."""
+        return [self._as_dict(record) for record in self.records]
+
+    def __eq__(self, other):
+        # compares like the list of dicts it stands for
+        if isinstance(other, TradeLog):
+            other = other.to_dicts()
+        if isinstance(other, list):
+            return self.to_dicts() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def to_frame(self):
+        """DataFrame with TRADE_FIELDS columns; index columns keep the original labels."""
+        records = self.records
+        frame = pd.DataFrame(columns=TRADE_FIELDS, index=pd.RangeIndex(len(records)))
+        for field in TRADE_FIELDS:
+            if field.endswith("_index"):
+                bars = records[field[:-len("_index")] + "_bar"]
+                labels = pd.Series(self.index[np.maximum(bars, 0)])
+                frame[field] = labels.where(bars >= 0) if (bars < 0).any() else labels
+            else:
+                frame[field] = records[field]
+        return frame
+
+    def __repr__(self):
+        return f"TradeLog({len(self)} trades)"
+
+
+# =============================================================
+# RISK EXITS: stop-loss / take-profit / trailing stop
+# =============================================================
+class RiskLevels:
+    """
+    Stop and target prices of one open trade, from percentages of its
+    entry price.  Checked on every bar from the entry fill bar on: a bar
+    whose low reaches the stop (or whose high reaches the target) closes
+    the trade on that bar, at the stop / target or at the open when the
+    bar gaps through it.  A bar reaching both is taken as stopped out.
+
+    The trailing stop trails the highest high of the bars before the one
+    checked (starting at the entry price), so a bar's own high never
+    lifts the stop it is tested against.
+    """
+
+    def __init__(self, entry_price, fill_bar, stop_loss=None, take_profit=None, trailing_stop=None):
+        self.fill_bar = fill_bar
+        self.stop = entry_price * (1 - stop_loss / 100.0) if stop_loss is not None else -np.inf
+        self.target = entry_price * (1 + take_profit / 100.0) if take_profit is not None else np.inf
+        self.trail = 1 - trailing_stop / 100.0 if trailing_stop is not None else None
+        self.peak = entry_price
+
+    def fill(self, open_, high, low, stop):
+        """Fill price (before slippage) of a bar against `stop` and the target, None if neither is reached."""
+        if low <= stop:
+            return min(open_, stop)
+        if high >= self.target:
+            return max(open_, self.target)
+        return None
+
+    def check(self, open_, high, low):
+        """The next bar (reference loop): its fill price or None, then trail the stop."""
+        stop = self.stop if self.trail is None else max(self.stop, self.peak * self.trail)
+        self.peak = max(self.peak, high)
+        return self.fill(open_, high, low, stop)
+
+    def first_hit(self, opens, highs, lows, start, end):
+        """
+        First bar of [start, end) closing the trade and its fill price,
+        (-1, None) if none does.
+
+        Searches array windows growing 4x (16, 64, 256, ... bars), so a
+        trade costs a few array operations over about the bars it is held,
+        never the whole series.
+        """
+        size = 16
+        while start < end:
+            stop_ = min(start + size, end)
+            high, low = highs[start:stop_], lows[start:stop_]
+            if self.trail is None:
+                stops = self.stop
+            else:
+                peaks = np.fmax.accumulate(np.concatenate(([self.peak], high[:-1])))   # before each bar
+                stops = np.maximum(self.stop, peaks * self.trail)
+                self.peak = max(float(peaks[-1]), float(high[-1]))
+            hit = (low <= stops) | (high >= self.target)
+            k = int(hit.argmax())
+            if hit[k]:
+                stop = stops if self.trail is None else float(stops[k])
+                return start + k, self.fill(float(opens[start + k]), float(high[k]), float(low[k]), stop)
+            start, size = stop_, size * 4
+        return -1, None
+
+
+def require_no_risk_exits(final_ast, engine):
+    """Engines that only model EXIT signals refuse risk clauses rather than ignore them."""
+    if final_ast.get("risk"):
+        raise ValueError(f"{engine} does not apply STOP_LOSS / TAKE_PROFIT / TRAILING_STOP; "
+                         "backtest the strategy with backtest_signals")
+
+
+def _next_flags(flags):
+    """(n + 1,) first bar >= t with a flag (n when none), for t = 0..n."""
+    n = len(flags)
+    bars = np.where(flags, np.arange(n), n)
+    return np.append(np.minimum.accumulate(bars[::-1])[::-1], n)
+
+
+def _risk_trades(opens, highs, lows, closes, entries, exits, slippage, risk):
+    """
+    Entry bars, exit bars, exit fill bars and exit fill prices of the trades
+    when risk exits can end a trade before its EXIT signal.  A stopped-out
+    trade changes where the next one starts, so trades are walked one by
+    one; each costs a first-hit search over the bars it is held.
+    """
+    n = len(closes)
+    next_entry = _next_flags(entries)
+    next_exit = _next_flags(exits)
+
+    entry_bars, exit_bars, exit_fill_bars, exit_fills = [], [], [], []
+    bar = int(next_entry[0])
+    while bar < n:
+        entry_bars.append(bar)
+        fill_bar = bar + 1 if bar + 1 < n else bar
+        exit_bar = int(next_exit[bar + 1])          # EXIT signal, n when there is none
+
+        hit = -1
+        if fill_bar > bar:                          # an entry on the last bar fills at its close
+            buy_price = float(opens[fill_bar]) + slippage
+            levels = RiskLevels(buy_price, fill_bar, **risk)
+            hit, price = levels.first_hit(opens, highs, lows, fill_bar, min(exit_bar, n - 1) + 1)
+
+        if hit >= 0:
+            exit_bars.append(hit)
+            exit_fill_bars.append(hit)
+            exit_fills.append(price)
+            bar = int(next_entry[hit])              # flat again from the stop's bar
+        elif exit_bar < n:
+            exit_bars.append(exit_bar)
+            has_next = exit_bar + 1 < n
+            exit_fill_bars.append(exit_bar + 1 if has_next else exit_bar)
+            exit_fills.append(opens[exit_bar + 1] if has_next else closes[exit_bar])
+            bar = int(next_entry[exit_bar + 1])
+        else:
+            break                                   # open until the forced close
+
+    return (np.array(entry_bars, dtype=np.int64), np.array(exit_bars, dtype=np.int64),
+            np.array(exit_fill_bars, dtype=np.int64), np.array(exit_fills, dtype=np.float64))
+
+
+# =============================================================
+# REFERENCE ENGINE: one Python iteration per bar
+# =============================================================
+def _backtest_loop(df, signals, initial_capital, slippage, commission, risk=None):
     cash = float(initial_capital)
     position = 0.0  # number of shares (fractional allowed)
     entry_price = None
+    levels = None   # RiskLevels of the open trade
+
+    labels = df.index
+    n = len(labels)
+    opens = df["open"].to_numpy(dtype=float)
+    closes = df["close"].to_numpy(dtype=float)
+    entries = signals["entry"].to_numpy()
+    exits = signals["exit"].to_numpy()
+
+    if risk:
+        highs = df["high"].to_numpy(dtype=float)
+        lows = df["low"].to_numpy(dtype=float)
+
+    trades = TradeLog(labels)
+    equity_values = np.empty(n)
+
+    for i in range(n):
+        close_price = float(closes[i])
+
+        # =============================================================
+        # STOP-LOSS / TAKE-PROFIT / TRAILING STOP (intrabar, once filled)
+        # =============================================================
+        if levels is not None and i >= levels.fill_bar:
+            fill_price = levels.check(float(opens[i]), float(highs[i]), float(lows[i]))
+            if fill_price is not None:
+                sell_price = fill_price - slippage
+                proceeds = position * sell_price
+                cost = position * entry_price
 
-    trades = []
-    equity_values = []
-    equity_index = []
+                pnl = proceeds - cost - commission
+                return_pct = pnl / cost if cost != 0 else 0
 
-    idxs = list(df.index)
-    n = len(idxs)
+                trades.close(i, i, sell_price, pnl, float(return_pct) * 100.0)
 
-    for i, idx in enumerate(idxs):
-        row = df.loc[idx]
-        close_price = float(row["close"])
+                cash += proceeds
+                position = 0
+                entry_price = None
+                levels = None
 
         # =============================================================
         # ENTRY
         # =============================================================
-        if position == 0 and signals.loc[idx, "entry"]:
+        if position == 0 and entries[i]:
             if i + 1 < n:
-                fill_idx = idxs[i+1]
-                fill_price = float(df.loc[fill_idx]["open"])
+                fill_bar = i + 1
+                fill_price = float(opens[fill_bar])
             else:
-                fill_idx = idx
+                fill_bar = i
                 fill_price = close_price
 
             buy_price = fill_price + slippage
@@ -62,27 +371,19 @@ def backtest_signals(df, signals, initial_capital=100000.0, slippage=0.0, commis
                 entry_price = buy_price
                 cash -= commission  # commission on entry
 
-                trades.append({
-                    "entry_index": str(idx),
-                    "entry_fill_index": str(fill_idx),
-                    "entry_price": float(buy_price),
-                    "exit_index": None,
-                    "exit_fill_index": None,
-                    "exit_price": None,
-                    "shares": float(shares),
-                    "pnl": None,
-                    "return_pct": None
-                })
+                trades.open(i, fill_bar, buy_price, shares)
+                if risk and fill_bar > i:
+                    levels = RiskLevels(buy_price, fill_bar, **risk)
 
         # =============================================================
         # EXIT
         # =============================================================
-        elif position > 0 and signals.loc[idx, "exit"]:
+        elif position > 0 and exits[i]:
             if i + 1 < n:
-                fill_idx = idxs[i+1]
-                fill_price = float(df.loc[fill_idx]["open"])
+                fill_bar = i + 1
+                fill_price = float(opens[fill_bar])
             else:
-                fill_idx = idx
+                fill_bar = i
                 fill_price = close_price
 
             sell_price = fill_price - slippage
@@ -93,55 +394,369 @@ def backtest_signals(df, signals, initial_capital=100000.0, slippage=0.0, commis
             pnl = proceeds - cost - commission
             return_pct = pnl / cost if cost != 0 else 0
 
-            last_trade = trades[-1]
-            last_trade["exit_index"] = str(idx)
-            last_trade["exit_fill_index"] = str(fill_idx)
-            last_trade["exit_price"] = float(sell_price)
-            last_trade["pnl"] = float(pnl)
-            last_trade["return_pct"] = float(return_pct) * 100.0
+            trades.close(i, fill_bar, sell_price, pnl, float(return_pct) * 100.0)
 
             cash += proceeds
             position = 0
             entry_price = None
+            levels = None
 
         # =============================================================
         # DAILY MARK TO MARKET
         # =============================================================
-        mtm_equity = cash + position * close_price
-        equity_values.append(mtm_equity)
-        equity_index.append(idx)
+        equity_values[i] = cash + position * close_price
 
     # =============================================================
     # FORCE CLOSE at last price if still in position
     # =============================================================
     if position > 0:
-        last_idx = idxs[-1]
-        last_close = float(df.loc[last_idx, "close"])
+        last_close = float(closes[n - 1])
 
         sell_price = last_close - slippage
         proceeds = position * sell_price
-        cost = trades[-1]["shares"] * trades[-1]["entry_price"]
+        last_trade = trades.records[-1]
+        cost = last_trade["shares"] * last_trade["entry_price"]
 
         pnl = proceeds - cost - commission
         return_pct = pnl / cost if cost != 0 else 0
 
-        last_trade = trades[-1]
-        last_trade["exit_index"] = str(last_idx)
-        last_trade["exit_fill_index"] = str(last_idx)
-        last_trade["exit_price"] = float(sell_price)
-        last_trade["pnl"] = float(pnl)
-        last_trade["return_pct"] = float(return_pct) * 100.0
+        trades.close(n - 1, n - 1, sell_price, pnl, float(return_pct) * 100.0)
 
         cash += proceeds
         position = 0
 
         equity_values[-1] = cash
 
-    # =============================================================
-    # EQUITY CURVE & METRICS
-    # =============================================================
-    equity = pd.Series(equity_values, index=equity_index)
+    equity = pd.Series(equity_values, index=labels)
+    return _summarize(equity, trades, initial_capital)
+
+
+# =============================================================
+# VECTORIZED ENGINE: array operations over all bars at once
+# =============================================================
+def position_state(entry, exit, initial=False):
+    """
+    Derive the held (True) / flat (False) state after each bar.
+
+    ENTRY is only checked while flat and EXIT only while holding, so a bar
+    with exactly one flag forces the state, a bar with both flags toggles it
+    and a bar with neither keeps it.  The state is therefore the value forced
+    by the last single-flag bar (or `initial` before the first one) plus the
+    parity of the toggles since then.
+
+    Accepts 1-D arrays or 2-D (bars x columns) matrices.
+    """
+    entry = np.asarray(entry, dtype=bool)
+    exit = np.asarray(exit, dtype=bool)
+
+    n = entry.shape[0]
+    bars = np.arange(n).reshape((n,) + (1,) * (entry.ndim - 1))
+
+    forced = entry != exit
+    last_forced = np.maximum.accumulate(np.where(forced, bars, -1), axis=0)
+    has_forced = last_forced >= 0
+    last_forced = np.maximum(last_forced, 0)
+
+    toggles = np.cumsum(entry & exit, axis=0)
+    toggles_before = np.where(has_forced, np.take_along_axis(toggles, last_forced, axis=0), 0)
+
+    forced_state = np.where(has_forced, np.take_along_axis(entry, last_forced, axis=0), initial)
+    return forced_state ^ ((toggles - toggles_before) % 2 == 1)
+
+
+def next_open_fills(opens, closes, bars):
+    """Fill bar and price for orders signalled on `bars`: next open, or last close."""
+    n = len(closes)
+    has_next = bars + 1 < n
+    fill_bars = np.where(has_next, bars + 1, bars)
+    fill_prices = np.where(has_next, opens[fill_bars], closes[bars])
+    return fill_bars, fill_prices
+
+
+def _matrix_fills(opens, closes, bars, cols, stops):
+    """next_open_fills prices for (bar, column) orders; column j ends after stops[j] bars."""
+    has_next = bars + 1 < stops[cols]
+    return np.where(has_next, opens[np.minimum(bars + 1, len(closes) - 1), cols], closes[bars, cols])
+
+
+def _backtest_vectorized(df, signals, initial_capital, slippage, commission, risk=None):
+    labels = df.index
+    n = len(labels)
+    opens = df["open"].to_numpy(dtype=float)
+    closes = df["close"].to_numpy(dtype=float)
+    entries = signals["entry"].to_numpy(dtype=bool)
+    exits = signals["exit"].to_numpy(dtype=bool)
+
+    if risk:
+        entry_bars, exit_bars, exit_fill_bars, exit_fills = _risk_trades(
+            opens, df["high"].to_numpy(dtype=float), df["low"].to_numpy(dtype=float), closes,
+            entries, exits, slippage, risk)
+    else:
+        held = position_state(entries, exits)
+        was_held = np.concatenate(([False], held[:-1]))
+
+        entry_bars = np.flatnonzero(held & ~was_held)
+        exit_bars = np.flatnonzero(~held & was_held)
+        exit_fill_bars, exit_fills = next_open_fills(opens, closes, exit_bars)
+
+    entry_fill_bars, entry_fills = next_open_fills(opens, closes, entry_bars)
+    buy_prices = entry_fills + slippage
+    sell_prices = exit_fills - slippage
+
+    # -------------------------------------------------------------
+    # Cash compounds trade by trade (all-in sizing), so this is the
+    # one sequential step; it runs once per trade, never per bar.
+    # -------------------------------------------------------------
+    num_trades = len(entry_bars)
+    num_exits = len(exit_bars)
+    shares = np.empty(num_trades)
+    event_cash = np.empty(num_trades + num_exits)
+
+    cash = float(initial_capital)
+    for k in range(num_trades):
+        buy_price = float(buy_prices[k])
+        trade_shares = cash / buy_price if buy_price > 0 else 0
+        if not trade_shares > 0:
+            return None
+
+        cash -= commission
+        shares[k] = trade_shares
+        event_cash[2 * k] = cash
+
+        if k < num_exits:
+            cash += trade_shares * float(sell_prices[k])
+            event_cash[2 * k + 1] = cash
+
+    records = np.empty(num_trades, dtype=TRADE_DTYPE)
+    records["entry_bar"] = entry_bars
+    records["entry_fill_bar"] = entry_fill_bars
+    records["entry_price"] = buy_prices
+    records["shares"] = shares
+    records["exit_bar"][:num_exits] = exit_bars
+    records["exit_fill_bar"][:num_exits] = exit_fill_bars
+    records["exit_price"][:num_exits] = sell_prices
+
+    # -------------------------------------------------------------
+    # Broadcast cash / shares from the entry & exit bars to every bar
+    # -------------------------------------------------------------
+    event_bars = np.empty(len(event_cash), dtype=np.int64)
+    event_bars[0::2] = entry_bars
+    event_bars[1::2] = exit_bars
+    event_shares = np.zeros(len(event_cash))
+    event_shares[0::2] = shares
+
+    # last event on or before each bar (a stop and the next entry can share one)
+    last_event = np.searchsorted(event_bars, np.arange(n), side="right") - 1
+    has_event = last_event >= 0
+
+    if len(event_bars):
+        bar_cash = np.where(has_event, event_cash[last_event], float(initial_capital))
+        bar_shares = np.where(has_event, event_shares[last_event], 0.0)
+    else:
+        bar_cash = np.full(n, float(initial_capital))
+        bar_shares = np.zeros(n)
+    equity_values = bar_cash + bar_shares * closes
+
+    # FORCE CLOSE at last price if still in position
+    if num_trades > num_exits:
+        records[-1]["exit_bar"] = records[-1]["exit_fill_bar"] = n - 1
+        records[-1]["exit_price"] = closes[n - 1] - slippage
+        cash += shares[-1] * records[-1]["exit_price"]
+        equity_values[-1] = cash
+
+    cost = records["shares"] * records["entry_price"]
+    records["pnl"] = records["shares"] * records["exit_price"] - cost - commission
+    with np.errstate(divide="ignore", invalid="ignore"):
+        records["return_pct"] = np.where(cost != 0, records["pnl"] / cost, 0.0) * 100.0
+    trades = TradeLog(labels, records)
+
+    equity = pd.Series(equity_values, index=labels)
+    return _summarize(equity, trades, initial_capital)
+
+
+# =============================================================
+# BATCHED ENGINE: many signal columns over the same bars
+# =============================================================
+def backtest_signal_matrix(df, entries, exits, initial_capital=100000.0, slippage=0.0,
+                           commission=0.0):
+    """
+    Backtest every column of (bars x strategies) ENTRY / EXIT matrices at once.
+
+    Same trading rules as backtest_signals (all-in, next-open fills, forced
+    close on the last bar); only the summary metrics are produced.
+
+    Returns:
+        dict of 1-D arrays (one value per column):
+        - final_capital
+        - total_return_pct
+        - max_drawdown_pct
+        - num_trades
+    """
+    df = as_frame(df)
+    entries = np.asarray(entries, dtype=bool)
+    exits = np.asarray(exits, dtype=bool)
+    assert entries.shape == exits.shape, "entries and exits must have the same shape"
+    assert entries.ndim == 2 and entries.shape[0] == len(df), "expected (bars x columns) matrices"
+
+    opens = df["open"].to_numpy(dtype=float)
+    closes = df["close"].to_numpy(dtype=float)
+    return backtest_price_matrix(opens, closes, entries, exits, initial_capital, slippage, commission)
+
+
+def backtest_price_matrix(opens, closes, entries, exits, initial_capital=100000.0, slippage=0.0,
+                          commission=0.0, stops=None, held=None):
+    """
+    backtest_signal_matrix on bare arrays: `opens` / `closes` are the
+    (bars,) prices shared by every column or (bars x columns) matrices
+    giving each column its own prices (e.g. one column per window).
+
+    `stops` (one bar count per column) ends column j after its first
+    stops[j] bars, as if it had been sliced there: later bars are ignored,
+    the last of its bars fills at the close and the position is closed
+    there.  Shorter series can so be padded into one matrix.
+
+    `held` is position_state(entries, exits) when the caller already has it
+    (constant after a column's stop).
+    """
+    entries = np.asarray(entries, dtype=bool)
+    exits = np.asarray(exits, dtype=bool)
+    n, m = entries.shape
+    opens = np.broadcast_to(np.asarray(opens, dtype=float).reshape(n, -1), (n, m))
+    closes = np.broadcast_to(np.asarray(closes, dtype=float).reshape(n, -1), (n, m))
+
+    if stops is None:
+        stops = np.full(m, n, dtype=np.int64)
+        live = None
+    else:
+        stops = np.asarray(stops, dtype=np.int64)
+        live = np.arange(n)[:, None] < stops
+        entries, exits = entries & live, exits & live
+
+    if held is None:
+        held = position_state(entries, exits)
+    was_held = np.vstack([np.zeros((1, m), dtype=bool), held[:-1]])
+
+    # (column, bar) of every entry / exit, ordered column by column
+    entry_cols, entry_bars = np.nonzero((held & ~was_held).T)
+    exit_cols, exit_bars = np.nonzero((~held & was_held).T)
+
+    buy_prices = _matrix_fills(opens, closes, entry_bars, entry_cols, stops)
+    sell_prices = _matrix_fills(opens, closes, exit_bars, exit_cols, stops)
+    buy_prices = buy_prices + slippage
+    sell_prices = sell_prices - slippage
+
+    num_trades = np.bincount(entry_cols, minlength=m)
+    num_exits = np.bincount(exit_cols, minlength=m)
+    entry_start = np.concatenate(([0], np.cumsum(num_trades)[:-1]))
+    exit_start = np.concatenate(([0], np.cumsum(num_exits)[:-1]))
+    entry_rank = np.arange(len(entry_cols)) - entry_start[entry_cols]
+
+    # -------------------------------------------------------------
+    # Compound cash trade by trade, all columns in lock-step
+    # -------------------------------------------------------------
+    cash = np.full(m, float(initial_capital))
+    shares = np.zeros(len(entry_cols))
+    entry_cash = np.zeros(len(entry_cols))
+    exit_cash = np.zeros(len(exit_cols))
+    invalid = np.zeros(m, dtype=bool)
+
+    for k in range(int(num_trades.max()) if m else 0):
+        cols = np.flatnonzero(num_trades > k)
+        trade = entry_start[cols] + k
+        buy = buy_prices[trade]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            trade_shares = np.where(buy > 0, cash[cols] / buy, 0.0)
+        invalid[cols[~(trade_shares > 0)]] = True
+
+        cash[cols] -= commission
+        shares[trade] = trade_shares
+        entry_cash[trade] = cash[cols]
+
+        closed = num_exits[cols] > k
+        cols, trade_shares = cols[closed], trade_shares[closed]
+        exit_trade = exit_start[cols] + k
+        cash[cols] += trade_shares * sell_prices[exit_trade]
+        exit_cash[exit_trade] = cash[cols]
+
+    # -------------------------------------------------------------
+    # Broadcast cash / shares to every bar for the drawdown
+    # -------------------------------------------------------------
+    # event ids must increase with time inside each column: a column's
+    # entries and exits alternate, so entry k / exit k get slots 2k / 2k + 1
+    column_start = entry_start + exit_start
+    exit_rank = np.arange(len(exit_cols)) - exit_start[exit_cols]
+    entry_slot = column_start[entry_cols] + 2 * entry_rank
+    exit_slot = column_start[exit_cols] + 2 * exit_rank + 1
+
+    num_events = len(entry_cols) + len(exit_cols)
+    event_bars = np.empty(num_events, dtype=np.int64)
+    event_cols = np.empty(num_events, dtype=np.int64)
+    event_cash = np.empty(num_events)
+    event_shares = np.zeros(num_events)
+    event_bars[entry_slot], event_bars[exit_slot] = entry_bars, exit_bars
+    event_cols[entry_slot], event_cols[exit_slot] = entry_cols, exit_cols
+    event_cash[entry_slot], event_cash[exit_slot] = entry_cash, exit_cash
+    event_shares[entry_slot] = shares
+
+    # int32 ids halve the (bars x columns) passes below
+    id_type = np.int32 if num_events < 2 ** 31 else np.int64
+    last_event = np.full((n, m), -1, dtype=id_type)
+    last_event[event_bars, event_cols] = np.arange(num_events, dtype=id_type)
+    last_event = np.maximum.accumulate(last_event, axis=0)
+    has_event = last_event >= 0
+    last_event = np.maximum(last_event, 0)
+
+    if len(event_bars):
+        bar_cash = np.where(has_event, event_cash[last_event], float(initial_capital))
+        bar_shares = np.where(has_event, event_shares[last_event], 0.0)
+    else:
+        bar_cash = np.full((n, m), float(initial_capital))
+        bar_shares = np.zeros((n, m))
+    equity = bar_cash + bar_shares * closes
+
+    # FORCE CLOSE at last price if still in position
+    still_open = np.flatnonzero(num_trades > num_exits)
+    last_trade = entry_start[still_open] + num_trades[still_open] - 1
+    last_bar = stops - 1
+    cash[still_open] += shares[last_trade] * (closes[last_bar[still_open], still_open] - slippage)
+    equity[last_bar[still_open], still_open] = cash[still_open]
+    if live is not None:
+        equity[~live] = np.nan
+
+    roll_max = np.fmax.accumulate(equity, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = (equity - roll_max) / roll_max
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN columns
+        max_drawdown_pct = np.nanmin(drawdown, axis=0) * 100.0
+
+    final_capital = equity[last_bar, np.arange(m)]
+    results = {
+        "final_capital": final_capital,
+        "total_return_pct": (final_capital - initial_capital) / initial_capital * 100.0,
+        "max_drawdown_pct": max_drawdown_pct,
+        "num_trades": num_trades,
+    }
+
+    # columns the state machine cannot model → reference loop, one by one
+    for col in np.flatnonzero(invalid):
+        bars = slice(0, stops[col])
+        prices = pd.DataFrame({"open": opens[bars, col], "close": closes[bars, col]})
+        signals = pd.DataFrame({"entry": entries[bars, col], "exit": exits[bars, col]})
+        single = _backtest_loop(prices, signals, initial_capital, slippage, commission)
+        results["final_capital"][col] = single["final_capital"]
+        results["total_return_pct"][col] = single["total_return_pct"]
+        results["max_drawdown_pct"][col] = single["max_drawdown_pct"]
+        results["num_trades"][col] = single["num_trades"]
+
+    return results
+
 
+# =============================================================
+# EQUITY CURVE & METRICS
+# =============================================================
+def _summarize(equity, trades, initial_capital):
     final_capital = float(equity.iloc[-1])
     total_return_pct = ((final_capital - initial_capital) / initial_capital) * 100.0
 
@@ -0,0 +1,315 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from ast_builder import DSLtoAST, build_final_ast
+from backtest import backtest_signals
+from caching import IndicatorCache
+from code_generator import ast_to_python_code
+from dsl_parser import dsl_parser
+from lazy_eval import compile_lazy
+from strategy_compiler import compile_ast, compile_strategy
+
+DEFAULT_STRATEGY = (
+    "ENTRY: close crosses_above SMA(close,20) AND RSI(close,14) < 70 AND volume > volume[1]\n"
+    "EXIT: close crosses_below SMA(close,50) OR RSI(close,14) > 80"
+)
+
+# DSL strategies of increasing complexity (more conditions, indicators, lookbacks)
+STRATEGY_CORPUS = {
+    "threshold": "ENTRY: close > 100\nEXIT: close < 95",
+    "trend": "ENTRY: close > SMA(close,20)\nEXIT: close < SMA(close,20)",
+    "crossover": (
+        "ENTRY: SMA(close,10) crosses_above SMA(close,50)\n"
+        "EXIT: SMA(close,10) crosses_below SMA(close,50)"
+    ),
+    "filtered": DEFAULT_STRATEGY,
+    "composite": (
+        "ENTRY: (close crosses_above SMA(close,20) OR close[1] > SMA(close[1],100)) "
+        "AND RSI(close,14) < 60 AND volume > SMA(volume,20) AND SMA(RSI(close,14),5) > 40\n"
+        "EXIT: RSI(close,14) > 75 OR close crosses_below SMA(close,50) "
+        "OR (close < open AND close[1] < open[1] AND close[2] < open[2])"
+    ),
+}
+
+# a rarely-met volume filter in front of the indicator conditions
+SELECTIVE_STRATEGY = (
+    "ENTRY: volume > 1999990 AND RSI(close,14) < 30 AND MACD(close,12,26,9) > 0\n"
+    "EXIT: volume < 100010 AND ATR(close,14) > 1"
+)
+
+DEFAULT_BARS = (1_000, 10_000, 100_000, 1_000_000)
+
+# stage → throughput unit (per strategy for the text stages, per bar for the data stages)
+STAGES = {
+    "parse": "strategies",
+    "transform": "strategies",
+    "codegen": "strategies",
+    "evaluate": "bars",
+    "backtest": "bars",
+}
+
+
+# -----------------------------------------------------------
+# Synthetic data
+# -----------------------------------------------------------
+def synthetic_ohlcv(bars, seed=0):
+    """Geometric random-walk OHLCV frame on a one-minute DatetimeIndex (10M bars fit the timestamp range)."""
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, bars)))
+    opens = np.concatenate(([100.0], close[:-1])) * (1 + rng.normal(0.0, 0.002, bars))
+    spread = np.abs(rng.normal(0.0, 0.005, bars)) * close
+    return pd.DataFrame({
+        "open": opens,
+        "high": np.maximum(opens, close) + spread,
+        "low": np.minimum(opens, close) - spread,
+        "close": close,
+        "volume": rng.integers(100_000, 2_000_000, bars),
+    }, index=pd.date_range("2000-01-01", periods=bars, freq="min", name="date"))
+
+
+# -----------------------------------------------------------
+# Measurement
+# -----------------------------------------------------------
+def best_time(fn, repeat=5, number=1):
+    """Fastest of `repeat` runs of `number` calls, in seconds per call."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def peak_memory(fn):
+    """Peak bytes allocated (Python and NumPy) while `fn` runs, in a separate untimed call."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _measure(stage, strategy, bars, fn, repeat, number=1, items=1):
+    seconds = best_time(fn, repeat, number)
+    return {
+        "stage": stage,
+        "strategy": strategy,
+        "bars": bars,
+        "seconds": seconds,
+        "throughput": items / seconds if seconds > 0 else float("inf"),
+        "unit": f"{STAGES[stage]}/s",
+        "peak_mb": peak_memory(fn) / 1e6,
+    }
+
+
+# -----------------------------------------------------------
+# Suite
+# -----------------------------------------------------------
+def run_suite(bars=DEFAULT_BARS, corpus=None, repeat=3, engine="vectorized", backend="pandas",
+              seed=0):
+    """
+    Time every pipeline stage for every strategy in `corpus` (default:
+    STRATEGY_CORPUS) and, for the data stages, every series length in `bars`.
+
+    Stages:
+        parse      dsl_parser.parse
+        transform  DSLtoAST.transform + build_final_ast
+        codegen    ast_to_python_code (generate_python_expr over the AST)
+        evaluate   compiled strategy on the bars (empty indicator cache per run)
+        backtest   backtest_signals(engine=engine) on those signals
+
+    Returns a dict with "meta" (versions, settings) and "results" (one row per
+    stage / strategy / length: seconds, throughput, unit, peak_mb).
+    """
+    corpus = STRATEGY_CORPUS if corpus is None else corpus
+    results = []
+
+    for name, dsl_text in corpus.items():
+        tree = dsl_parser.parse(dsl_text)
+        final_ast = build_final_ast(DSLtoAST().transform(tree))
+        results.append(_measure("parse", name, None, lambda: dsl_parser.parse(dsl_text),
+                                repeat, number=50))
+        results.append(_measure("transform", name, None,
+                                lambda: build_final_ast(DSLtoAST().transform(tree)),
+                                repeat, number=50))
+        results.append(_measure("codegen", name, None, lambda: ast_to_python_code(final_ast),
+                                repeat, number=50))
+
+    for length in bars:
+        df = synthetic_ohlcv(length, seed)
+        for name, dsl_text in corpus.items():
+            strategy = compile_strategy(dsl_text, backend)
+            results.append(_measure("evaluate", name, length,
+                                    lambda: strategy(df, IndicatorCache()), repeat, items=length))
+
+            signals = compile_ast(strategy.ast)(df, IndicatorCache())
+            # random-walk strategies can compound cash past float range on
+            # long series; the timing is what matters here
+            with np.errstate(all="ignore"):
+                results.append(_measure("backtest", name, length,
+                                        lambda: backtest_signals(df, signals, engine=engine),
+                                        repeat, items=length))
+        del df
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "repeat": repeat,
+            "engine": engine,
+            "backend": backend,
+        },
+        "results": results,
+    }
+
+
+def save_results(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, tolerance=0.10):
+    """
+    Rows of `current` slower than the same stage / strategy / length in
+    `baseline` by more than `tolerance` (0.10 = 10%).  Returns a DataFrame
+    with both timings and the slowdown ratio.
+    """
+    def keyed(report):
+        return {(r["stage"], r["strategy"], r["bars"]): r for r in report["results"]}
+
+    before = keyed(baseline)
+    rows = []
+    for key, row in keyed(current).items():
+        old = before.get(key)
+        if old is None or old["seconds"] <= 0:
+            continue
+        ratio = row["seconds"] / old["seconds"]
+        if ratio > 1 + tolerance:
+            rows.append({"stage": key[0], "strategy": key[1], "bars": key[2],
+                         "baseline_s": old["seconds"], "current_s": row["seconds"], "slowdown": ratio})
+    table = pd.DataFrame(rows, columns=["stage", "strategy", "bars", "baseline_s", "current_s", "slowdown"])
+    table["bars"] = table["bars"].astype("Int64")
+    return table
+
+
+def format_results(report):
+    table = pd.DataFrame(report["results"])
+    table["bars"] = table["bars"].astype("Int64")
+    table["ms"] = table.pop("seconds") * 1000
+    return table[["stage", "strategy", "bars", "ms", "throughput", "unit", "peak_mb"]].to_string(
+        index=False, float_format=lambda x: f"{x:,.3f}")
+
+
+# -----------------------------------------------------------
+# Code-generation targets: pandas vs NumPy
+# -----------------------------------------------------------
+def compare_backends(dsl_text=DEFAULT_STRATEGY, lengths=DEFAULT_BARS, repeat=5):
+    """
+    Signal-evaluation time of the pandas and NumPy compiled backends.
+
+    Each call gets an empty indicator cache so every run computes its
+    indicators from scratch.  Returns one row per series length.
+    """
+    strategies = {backend: compile_strategy(dsl_text, backend) for backend in ("pandas", "numpy")}
+
+    rows = []
+    for bars in lengths:
+        df = synthetic_ohlcv(bars)
+        row = {"bars": bars}
+        for backend, strategy in strategies.items():
+            row[f"{backend}_ms"] = 1000 * best_time(lambda: strategy(df, IndicatorCache()), repeat)
+        row["speedup"] = row["pandas_ms"] / row["numpy_ms"]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# -----------------------------------------------------------
+# Eager (compiled) vs lazy (lazy_eval) evaluation
+# -----------------------------------------------------------
+def compare_lazy(dsl_text=SELECTIVE_STRATEGY, lengths=DEFAULT_BARS, repeat=5, backend="pandas"):
+    """Signal-evaluation time of the compiled strategy and the LazyStrategy of one backend."""
+    eager = compile_strategy(dsl_text, backend)
+    lazy = compile_lazy(dsl_text, backend)
+
+    rows = []
+    for bars in lengths:
+        df = synthetic_ohlcv(bars)
+        row = {"bars": bars,
+               "eager_ms": 1000 * best_time(lambda: eager(df, IndicatorCache()), repeat),
+               "lazy_ms": 1000 * best_time(lambda: lazy(df, IndicatorCache()), repeat)}
+        row["speedup"] = row["eager_ms"] / row["lazy_ms"]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# -----------------------------------------------------------
+# Command line
+# -----------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DSL pipeline stage by stage.")
+    parser.add_argument("--bars", type=int, nargs="+", default=list(DEFAULT_BARS),
+                        help="series lengths (e.g. 1000 100000 10000000)")
+    parser.add_argument("--strategies", nargs="+", choices=list(STRATEGY_CORPUS),
+                        help="subset of the strategy corpus")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engine", default="vectorized", help="backtest_signals engine")
+    parser.add_argument("--backend", default="pandas", help="compiled strategy backend")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--backends", action="store_true",
+                        help="only compare the pandas and NumPy backends")
+    parser.add_argument("--lazy", action="store_true",
+                        help="only compare eager and lazy evaluation of a selective strategy")
+    args = parser.parse_args(argv)
+
+    if args.backends:
+        print(compare_backends(lengths=args.bars, repeat=args.repeat).to_string(
+            index=False, float_format="%.3f"))
+        return 0
+
+    if args.lazy:
+        print(compare_lazy(lengths=args.bars, repeat=args.repeat, backend=args.backend).to_string(
+            index=False, float_format="%.3f"))
+        return 0
+
+    corpus = STRATEGY_CORPUS
+    if args.strategies:
+        corpus = {name: STRATEGY_CORPUS[name] for name in args.strategies}
+
+    report = run_suite(args.bars, corpus, args.repeat, args.engine, args.backend)
+    print(format_results(report))
+
+    if args.output:
+        save_results(report, args.output)
+
+    if args.baseline:
+        regressions = compare_results(load_results(args.baseline), report, args.tolerance)
+        if len(regressions):
+            print("\nRegressions:")
+            print(regressions.to_string(index=False, float_format="%.4f"))
+            return 1
+        print("\nNo regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import itertools
+import weakref
+from collections import OrderedDict
+
+from instrumentation import stage, count
+
+# Working-memory budget of one batch in the batched evaluators (screening,
+# walk_forward, robustness): each sizes its batches so that its matrices
+# stay under this many bytes.
+BATCH_BYTES = 64_000_000
+
+
+# -----------------------------------------------------------
+# Size-bounded LRU cache
+# -----------------------------------------------------------
+class LRUCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def items(self):
+        """(key, value) pairs, least recently used first (does not count as use)."""
+        return list(self._data.items())
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._data), "maxsize": self.maxsize}
+
+
+# -----------------------------------------------------------
+# Dataset identity / version
+# -----------------------------------------------------------
+# DataFrames are unhashable, so each live dataset object gets a token the
+# first time it is seen (dropped again when the object is garbage
+# collected, so a recycled id() never inherits stale entries).  The
+# version is bumped by `invalidate_dataset` after in-place edits.
+_dataset_tokens = {}               # id(df) → (weakref, token)
+_dataset_versions = {}             # token → version
+_token_counter = itertools.count()
+
+
+def _forget(obj_id, token):
+    _dataset_tokens.pop(obj_id, None)
+    _dataset_versions.pop(token, None)
+
+
+def dataset_key(df):
+    """(token, version) identifying `df` for as long as it is alive."""
+    entry = _dataset_tokens.get(id(df))
+    if entry is None or entry[0]() is not df:
+        token = next(_token_counter)
+        ref = weakref.ref(df, lambda _, obj_id=id(df), token=token: _forget(obj_id, token))
+        entry = (ref, token)
+        _dataset_tokens[id(df)] = entry
+        _dataset_versions[token] = 0
+    token = entry[1]
+    return token, _dataset_versions[token]
+
+
+def invalidate_dataset(df):
+    """Mark `df` as modified in place: cached indicators for it are no longer used."""
+    token, version = dataset_key(df)
+    _dataset_versions[token] = version + 1
+
+
+# -----------------------------------------------------------
+# Indicator cache shared across strategies
+# -----------------------------------------------------------
+class IndicatorCache(LRUCache):
+    """
+    Indicator results keyed on
+        (dataset token, dataset version, column, lag, indicator name, period, backend)
+
+    `column` is the source column (or, for nested indicators, the label of
+    the inner indicator) and `lag` its `[n]` lookback.  `backend` keeps the
+    pandas Series and NumPy array results of the same indicator apart.
+    """
+
+    def __init__(self, maxsize=512):
+        super().__init__(maxsize)
+
+    def get_or_compute(self, df, name, column, lag, period, compute, backend="pandas"):
+        key = dataset_key(df) + (column, lag, name, period, backend)
+        value = self.get(key)
+        if value is None:
+            count("indicator_cache.misses")
+            with stage(f"indicator.{name}", rows=len(df)):
+                value = compute()
+            self.put(key, value)
+        else:
+            count("indicator_cache.hits")
+        return value
+
+
+default_indicator_cache = IndicatorCache()
+
+
+def cached_indicator(df, name, series, period, column, lag=0, cache=None, inputs=()):
+    """
+    Called by generated strategy code for every hoisted indicator.
+
+    `series` (and `inputs`, the extra columns of e.g. ATR) are the
+    already-computed arguments; they are only used on a cache miss.
+    `period` is an int or, for MACD, a tuple of periods.
+    """
+    from indicators import INDICATORS, indicator_params   # NumPy / pandas on first use
+
+    if cache is None:
+        cache = default_indicator_cache
+    return cache.get_or_compute(df, name, column, lag, period,
+                                lambda: INDICATORS[name](series, *indicator_params(period), *inputs))
+
+
+def cached_array_indicator(df, name, values, period, column, lag=0, cache=None, inputs=()):
+    """`cached_indicator` for code generated with target="numpy" (float64 arrays)."""
+    from indicators import ARRAY_INDICATORS, indicator_params
+    if cache is None:
+        cache = default_indicator_cache
+    return cache.get_or_compute(df, name, column, lag, period,
+                                lambda: ARRAY_INDICATORS[name](values, *indicator_params(period), *inputs),
+                                backend="numpy")
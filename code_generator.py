@@ -1,104 +1,121 @@
 from lark.lexer import Token
 
+from ast_optimizer import eliminate_common_subexpressions
+from indicator_specs import INDICATOR_INPUTS, indicator_params
+
+
 # ============================================================
-# Convert AST Node → Pandas Expression String
+# Operand helpers (series / number / indicator)
 # ============================================================
-def generate_python_expr(node):
-    """Convert AST node into a valid pandas-evaluable expression string."""
+def parse_number(value):
+    """NUMBER token (or plain number) → int when integral, else float."""
+    if isinstance(value, Token):
+        value = value.value
+    number = float(value)
+    return int(number) if number.is_integer() else number
 
-    # ---------------------------------------------------
-    # 1. COMPARISON NODE
-    # ---------------------------------------------------
-    if node["type"] == "comparison":
-        left = node["left"]
-        op = node["operator"]
-        right = node["right"]
-
-        # Token → int
-        if isinstance(right, Token) and right.type == "NUMBER":
-            right = int(right.value)
-
-        # LEFT SIDE
-        if isinstance(left, dict) and left.get("type") == "indicator":
-            left_expr = generate_python_expr(left)
-
-        elif isinstance(left, str):
-            if "[" in left:        # e.g. volume[7]
-                col, lag = left.split("[")
-                lag = lag.replace("]", "")
-                left_expr = f"df['{col}'].shift({lag})"
-            else:
-                left_expr = f"df['{left}']"
 
-        else:
-            raise ValueError("Unsupported left operand:", left)
+def _series_expr(name, lag=None):
+    if lag:
+        return f"df['{name}'].shift({lag})"
+    return f"df['{name}']"
 
-        # RIGHT SIDE
-        if isinstance(right, (int, float)):
-            right_expr = str(right)
 
-        elif isinstance(right, str):
-            if "[" in right:        # e.g. high[1]
-                col, lag = right.split("[")
-                lag = lag.replace("]", "")
-                right_expr = f"df['{col}'].shift({lag})"
-            else:
-                right_expr = f"df['{right}']"
+def _operand_expr(operand):
+    """Series node, indicator node, NUMBER token or legacy 'col[lag]' string → expression."""
+    if isinstance(operand, dict):
+        if operand.get("type") == "series":
+            return _series_expr(operand["name"], operand.get("index"))
+        if operand.get("type") == "ref":
+            return operand["name"]
+        return generate_python_expr(operand)
 
-        elif isinstance(right, dict) and right.get("type") == "indicator":
-            right_expr = generate_python_expr(right)
+    if isinstance(operand, (Token, int, float)):
+        return str(parse_number(operand))
 
-        else:
-            raise ValueError("Unsupported right operand:", right)
+    if isinstance(operand, str):
+        if "[" in operand:        # e.g. volume[7]
+            col, lag = operand.split("[")
+            return _series_expr(col, int(lag.replace("]", "")))
+        return _series_expr(operand)
 
-        return f"({left_expr} {op} {right_expr})"
+    raise ValueError("Unsupported operand:", operand)
 
-    # ---------------------------------------------------
-    # 2. INDICATOR NODE (SMA, RSI)
-    # ---------------------------------------------------
-    if node["type"] == "indicator":
-        name = node["name"].upper()
-        series = node["series"]
-        period = node["period"]
 
-        if isinstance(series, dict):   # nested indicator
-            series_expr = generate_python_expr(series)
+def _shifted_operand_expr(operand):
+    """Previous-bar value of an operand (used by cross events)."""
+    if isinstance(operand, dict) and operand.get("type") == "series":
+        return _series_expr(operand["name"], (operand.get("index") or 0) + 1)
 
-        elif "[" in series:            # e.g. close[5]
-            col, lag = series.split("[")
-            lag = lag.replace("]", "")
-            series_expr = f"df['{col}'].shift({lag})"
+    if isinstance(operand, (Token, int, float)):     # constants do not move
+        return _operand_expr(operand)
 
-        else:
-            series_expr = f"df['{series}']"
+    if isinstance(operand, str):
+        col, _, lag = operand.partition("[")
+        return _series_expr(col, int(lag.replace("]", "") or 0) + 1)
+
+    return f"({_operand_expr(operand)}).shift(1)"
 
-        return f"{name}({series_expr}, {period})"
+
+# ============================================================
+# Convert AST Node → Pandas Expression String
+# ============================================================
+CODE_TARGETS = ("pandas", "numpy")
+
+
+def generate_python_expr(node, target="pandas"):
+    """
+    Convert AST node into a valid pandas-evaluable expression string.
+
+    target="numpy" changes how hoisted temporaries are read: columns become
+    COLUMN(df, name) float64 arrays and shifts SHIFT(values, k) NaN-padded
+    arrays.  Comparisons, crosses and AND / OR read the same in both targets.
+    """
 
     # ---------------------------------------------------
-    # 3. CROSS EVENTS (crosses_above / crosses_below)
+    # 1. COMPARISON NODE
     # ---------------------------------------------------
-    if node["type"] == "cross":
-        left = node["left"]
-        right = node["right"]
+    if node["type"] == "comparison":
+        left_expr = _operand_expr(node["left"])
+        right_expr = _operand_expr(node["right"])
+        return f"({left_expr} {node['operator']} {right_expr})"
 
-        # Left side
-        if isinstance(left, dict):
-            left_now = generate_python_expr(left)
-            left_prev = f"({left_now}).shift(1)"
-        else:
-            left_now = f"df['{left}']"
-            left_prev = f"df['{left}'].shift(1)"
+    # ---------------------------------------------------
+    # 2. INDICATOR NODE (SMA, RSI, EMA, ATR, MACD)
+    # ---------------------------------------------------
+    if node["type"] == "indicator":
+        name = node["name"].upper()
+        series_expr = _operand_expr(node["series"])
+        params = indicator_params(node["period"])
+
+        if "source" in node:       # hoisted → shared indicator cache
+            column, lag = node["source"]
+            period = params[0] if len(params) == 1 else params
+            inputs = ""
+            if node.get("inputs"):
+                inputs = f", inputs=[{', '.join(_operand_expr(i) for i in node['inputs'])}]"
+            return f"INDICATOR(df, '{name}', {series_expr}, {period!r}, {column!r}, {lag}, cache{inputs})"
+
+        args = [series_expr] + [str(p) for p in params]
+        if name in INDICATOR_INPUTS:      # extra columns at the series' lookback
+            lag = node["series"].get("index")
+            args += [_series_expr(column, lag) for column in INDICATOR_INPUTS[name]]
+        return f"{name}({', '.join(args)})"
 
-        # Right side
-        if "[" in right:           # high[1]
-            col, lag = right.split("[")
-            lag = int(lag.replace("]", ""))
-            right_now = f"df['{col}'].shift({lag})"
-            right_prev = f"df['{col}'].shift({lag+1})"
+    # ---------------------------------------------------
+    # 3. CROSS EVENTS (crosses_above / crosses_below)
+    #    (optimized ASTs carry hoisted left_prev / right_prev)
+    # ---------------------------------------------------
+    if node["type"] == "cross":
+        left_now = _operand_expr(node["left"])
+        right_now = _operand_expr(node["right"])
 
+        if "left_prev" in node:
+            left_prev = _operand_expr(node["left_prev"])
+            right_prev = _operand_expr(node["right_prev"])
         else:
-            right_now = f"df['{right}']"
-            right_prev = f"df['{right}'].shift(1)"
+            left_prev = _shifted_operand_expr(node["left"])
+            right_prev = _shifted_operand_expr(node["right"])
 
         # CROSS ABOVE
         if node["direction"] == "above":
@@ -115,13 +132,30 @@ def generate_python_expr(node):
             )
 
     # ---------------------------------------------------
-    # 4. LOGICAL OPERATORS
+    # 4. HOISTED TEMPORARIES (see ast_optimizer)
+    # ---------------------------------------------------
+    if node["type"] == "column":
+        frame = f"TF(df, {node['timeframe']!r})" if "timeframe" in node else "df"
+        if target == "numpy":
+            return f"COLUMN({frame}, {node['name']!r})"
+        return f"{frame}[{node['name']!r}]"
+
+    if node["type"] == "shift":
+        if target == "numpy":
+            return f"SHIFT({_operand_expr(node['operand'])}, {node['periods']})"
+        return f"{_operand_expr(node['operand'])}.shift({node['periods']})"
+
+    if node["type"] == "align":
+        return f"ALIGN(df, {_operand_expr(node['operand'])}, {node['timeframe']!r})"
+
+    # ---------------------------------------------------
+    # 5. LOGICAL OPERATORS
     # ---------------------------------------------------
     if node["type"] == "and":
-        return f"({generate_python_expr(node['left'])} & {generate_python_expr(node['right'])})"
+        return f"({generate_python_expr(node['left'], target)} & {generate_python_expr(node['right'], target)})"
 
     if node["type"] == "or":
-        return f"({generate_python_expr(node['left'])} | {generate_python_expr(node['right'])})"
+        return f"({generate_python_expr(node['left'], target)} | {generate_python_expr(node['right'], target)})"
 
     # ---------------------------------------------------
     # UNKNOWN NODE
@@ -129,26 +163,70 @@ def generate_python_expr(node):
     raise ValueError("Unknown AST node:", node)
 
 
+def _uses_timeframes(node):
+    if isinstance(node, dict):
+        return "timeframe" in node or any(_uses_timeframes(child) for child in node.values())
+    if isinstance(node, list):
+        return any(_uses_timeframes(child) for child in node)
+    return False
+
+
 # ============================================================
 # Convert Full AST → Python Function Code
 # ============================================================
-def ast_to_python_code(final_ast):
-    entry_expr = ""
-    exit_expr = ""
+def ast_to_python_code(final_ast, optimize=True, target="pandas"):
+    """
+    Generate `run_strategy(df, cache=None)` source.
+
+    With optimize=True every distinct series / shift / indicator is computed
+    once into a temporary and shared by ENTRY and EXIT, and indicators are
+    looked up in the shared indicator cache (`cache`, see caching.py).
+
+    target="pandas" returns the ['entry','exit'] signals DataFrame;
+    target="numpy" (always optimized) works on contiguous float64 arrays
+    and returns an (entry, exit) pair of boolean arrays.  Strategies with
+    timeframe-qualified series (close@1W) are always optimized too.
+    """
+    if target not in CODE_TARGETS:
+        raise ValueError(f"Unknown code target: {target!r} (expected one of {CODE_TARGETS})")
+
+    temp_lines = ""
+    if optimize or target == "numpy" or _uses_timeframes(final_ast):
+        cse = eliminate_common_subexpressions(final_ast)
+        final_ast = cse.ast
+        temp_lines = "".join(
+            f"    {name} = {generate_python_expr(definition, target)}\n"
+            for name, definition in cse.temps.items()
+        )
+
+    entry_expr = "False"
+    exit_expr = "False"
 
     if final_ast["entry"]:
-        entry_expr = generate_python_expr(final_ast["entry"][0])
+        entry_expr = generate_python_expr(final_ast["entry"][0], target)
     if final_ast["exit"]:
-        exit_expr = generate_python_expr(final_ast["exit"][0])
+        exit_expr = generate_python_expr(final_ast["exit"][0], target)
+
+    if target == "numpy":
+        return f"""
+def run_strategy(df, cache=None):
+    n = len(df)
+{temp_lines}
+    entry = BOOLS({entry_expr}, n)
+    exit = BOOLS({exit_expr}, n)
+
+    return entry, exit
+"""
 
     code = f"""
-def run_strategy(df):
+def run_strategy(df, cache=None):
     import pandas as pd
 
+{temp_lines}
     signals = pd.DataFrame(index=df.index)
     signals['entry'] = {entry_expr}
     signals['exit'] = {exit_expr}
 
-    return signals
+    return signals.fillna(False)
 """
     return code
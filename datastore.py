@@ -0,0 +1,269 @@
+import datetime
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------
+# On-disk layout
+# -----------------------------------------------------------
+# One dataset = one directory:
+#   meta.json      {"rows", "columns": {name: dtype}, "tz", "sorted"}
+#   date.bin       int64 nanoseconds since the epoch (UTC when tz is set)
+#   <column>.bin   raw float64 / int64 values, one file per column
+#
+# Raw little-endian arrays (no header) so the converter can append chunk by
+# chunk and the loader can memory-map each column independently.
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+_META_FILE = "meta.json"
+_DATE_FILE = "date.bin"
+_DTYPES = {"float64": "<f8", "int64": "<i8"}
+
+
+def _column_dtype(name, values):
+    # prices stay float even when a file happens to start with whole numbers
+    if name not in PRICE_COLUMNS and pd.api.types.is_integer_dtype(values):
+        return "int64"
+    return "float64"
+
+
+def convert_csv(csv_path, directory, date_column="date", date_format=None, dayfirst=False,
+                columns=None, chunksize=1_000_000):
+    """
+    Convert a `date,open,high,low,close,volume` CSV to the columnar format.
+
+    The CSV is read `chunksize` rows at a time, so files larger than memory
+    can be converted.  Prices are stored as float64, integer columns such as
+    volume as int64.
+
+    Args:
+        csv_path: source CSV
+        directory: output directory (created if missing, existing files replaced)
+        date_column (str): column parsed into the date index
+        date_format / dayfirst: passed to pd.to_datetime (sample.csv needs dayfirst=True)
+        columns (list): value columns to keep (default: every column but the date)
+        chunksize (int): rows parsed per pass
+
+    Returns:
+        the opened Dataset
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    dtypes = None
+    files = {}
+    rows = 0
+    tz = ""
+    ordered = True
+    last_date = None
+
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            if date_column not in chunk.columns:
+                raise ValueError(f"CSV has no {date_column!r} column")
+
+            dates = pd.DatetimeIndex(pd.to_datetime(chunk[date_column], format=date_format,
+                                                    dayfirst=dayfirst))
+            if dtypes is None:
+                names = columns or [c for c in chunk.columns if c != date_column]
+                dtypes = {name: _column_dtype(name, chunk[name]) for name in names}
+                tz = str(dates.tz or "")
+                files = {name: open(directory / f"{name}.bin", "wb") for name in names}
+                files[_DATE_FILE] = open(directory / _DATE_FILE, "wb")
+
+            stamps = (dates.tz_convert("UTC") if tz else dates).as_unit("ns").asi8
+            if len(stamps):
+                if last_date is not None and stamps[0] < last_date:
+                    ordered = False
+                ordered = ordered and bool(np.all(stamps[1:] >= stamps[:-1]))
+                last_date = stamps[-1]
+            stamps.astype("<i8").tofile(files[_DATE_FILE])
+
+            for name, dtype in dtypes.items():
+                values = chunk[name]
+                if dtype == "int64" and not pd.api.types.is_integer_dtype(values):
+                    raise ValueError(f"column {name!r} changed from integers to {values.dtype} "
+                                     f"after row {rows}; convert with columns stored as float")
+                values.to_numpy(dtype=_DTYPES[dtype]).tofile(files[name])
+            rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    if dtypes is None:
+        raise ValueError(f"{csv_path} is empty")
+
+    with open(directory / _META_FILE, "w") as f:
+        json.dump({"rows": rows, "columns": dtypes, "tz": tz, "sorted": ordered}, f)
+
+    return open_dataset(directory)
+
+
+def write_frame(df, directory):
+    """Store an in-memory DatetimeIndex'ed OHLCV frame in the columnar format."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    index = pd.DatetimeIndex(df.index)
+    tz = str(index.tz or "")
+    stamps = (index.tz_convert("UTC") if tz else index).as_unit("ns").asi8
+    stamps.astype("<i8").tofile(directory / _DATE_FILE)
+
+    dtypes = {}
+    for name in df.columns:
+        dtypes[name] = _column_dtype(name, df[name])
+        df[name].to_numpy(dtype=_DTYPES[dtypes[name]]).tofile(directory / f"{name}.bin")
+
+    with open(directory / _META_FILE, "w") as f:
+        json.dump({"rows": len(df), "columns": dtypes, "tz": tz,
+                   "sorted": bool(index.is_monotonic_increasing)}, f)
+
+    return open_dataset(directory)
+
+
+# -----------------------------------------------------------
+# Memory-mapped dataset
+# -----------------------------------------------------------
+class Dataset:
+    """
+    Read-only OHLCV history backed by memory-mapped column files.
+
+    Behaves enough like a DataFrame for the rest of the engine: `ds['close']`
+    is a zero-copy Series, `ds.index` the DatetimeIndex and `len(ds)` the bar
+    count, so compiled strategies, BatchEvaluator and StreamingStrategy.run
+    take it directly; backtest_signals wraps it with `to_frame()`.
+
+        ds = open_dataset("data/AAPL")
+        recent = ds.between("2020-01-01", "2020-12-31")   # binary search on dates
+        signals = compile_strategy(dsl)(recent)
+        result = backtest_signals(recent, signals)
+
+    Only the pages actually touched are read from disk.
+    """
+
+    def __init__(self, directory, start=0, stop=None):
+        self.directory = Path(directory)
+        with open(self.directory / _META_FILE) as f:
+            self.meta = json.load(f)
+
+        rows = self.meta["rows"]
+        self.start = start
+        self.stop = rows if stop is None else stop
+        self._dates = self._map(_DATE_FILE, "int64", rows)
+        self._arrays = {}
+        self._index = None
+        self._frame = None
+
+    def _map(self, filename, dtype, rows):
+        if rows == 0:
+            return np.empty(0, dtype=_DTYPES[dtype])
+        values = np.memmap(self.directory / filename, dtype=_DTYPES[dtype], mode="r", shape=(rows,))
+        # plain ndarray view: same mapped pages, without memmap leaking into results
+        return values[self.start:self.stop].view(np.ndarray)
+
+    # ------------------------------------------------------------
+    # DataFrame-like access
+    # ------------------------------------------------------------
+    @property
+    def columns(self):
+        return list(self.meta["columns"])
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __contains__(self, name):
+        return name in self.meta["columns"]
+
+    def array(self, name):
+        """The raw memory-mapped values of one column (no copy)."""
+        values = self._arrays.get(name)
+        if values is None:
+            if name not in self.meta["columns"]:
+                raise KeyError(name)
+            values = self._map(f"{name}.bin", self.meta["columns"][name], self.meta["rows"])
+            self._arrays[name] = values
+        return values
+
+    @property
+    def index(self):
+        if self._index is None:
+            index = pd.DatetimeIndex(self._dates.view("datetime64[ns]"), name="date")
+            if self.meta["tz"]:
+                index = index.tz_localize("UTC").tz_convert(self.meta["tz"])
+            self._index = index
+        return self._index
+
+    def __getitem__(self, name):
+        return pd.Series(self.array(name), index=self.index, name=name, copy=False)
+
+    def to_frame(self, columns=None):
+        """Zero-copy DataFrame over the mapped columns (cached for the default column set)."""
+        if columns is not None:
+            return pd.DataFrame({name: self.array(name) for name in columns},
+                                index=self.index, copy=False)
+        if self._frame is None:
+            self._frame = self.to_frame(self.columns)
+        return self._frame
+
+    # ------------------------------------------------------------
+    # Slicing
+    # ------------------------------------------------------------
+    def _stamp(self, value):
+        stamp = pd.Timestamp(value)
+        if self.meta["tz"]:
+            stamp = stamp.tz_localize(self.meta["tz"]) if stamp.tz is None else stamp
+            stamp = stamp.tz_convert("UTC").tz_localize(None)
+        return stamp.as_unit("ns").value
+
+    def _end_position(self, end):
+        """Position just past the bars an `end` bound covers."""
+        period = None
+        if isinstance(end, str) and pd.Timestamp(end).tz is None:
+            period = pd.Period(end)                     # "2021-03-05" → that whole day
+        elif isinstance(end, datetime.date) and not isinstance(end, datetime.datetime):
+            period = pd.Period(end, freq="D")
+        if period is None:
+            return int(np.searchsorted(self._dates, self._stamp(end), side="right"))
+        return int(np.searchsorted(self._dates, self._stamp((period + 1).start_time), side="left"))
+
+    def between(self, start=None, end=None):
+        """
+        Bars with start <= date <= end (either bound optional), like df.loc[start:end].
+
+        As with .loc, an end given as a date or as a string of reduced
+        resolution covers the whole period it names: "2021-03-05" includes
+        that day's intraday bars, "2021-03" all of March.  Located by binary
+        search on the mapped date file, so only a few pages are read
+        whatever the size of the history.
+        """
+        if not self.meta["sorted"]:
+            raise ValueError("dates are not sorted; date-range slicing needs an ordered index")
+        lo = 0 if start is None else int(np.searchsorted(self._dates, self._stamp(start), side="left"))
+        hi = len(self) if end is None else self._end_position(end)
+        return self.take(lo, max(lo, hi))
+
+    def take(self, start, stop):
+        """Positional slice [start, stop) as a new Dataset over the same files."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return Dataset(self.directory, self.start + start, self.start + max(start, stop))
+
+    def chunks(self, rows):
+        """Yield zero-copy DataFrames of `rows` bars (input for stream_backtest.backtest_stream)."""
+        for start in range(0, len(self), rows):
+            yield self.take(start, start + rows).to_frame()
+
+    def __repr__(self):
+        return f"Dataset({str(self.directory)!r}, bars={len(self)}, columns={self.columns})"
+
+
+def open_dataset(directory):
+    return Dataset(directory)
+
+
+def as_frame(data):
+    """DataFrame view of `data` (a Dataset is wrapped, anything else returned as-is)."""
+    if isinstance(data, Dataset):
+        return data.to_frame()
+    return data
@@ -4,11 +4,9 @@ import pandas as pd
 # IMPORTING MODULES FROM PROJECT FILES
 # -----------------------------------------
 from nl_parser import nl_to_json_rules
-from dsl_parser import dsl_parser
-from ast_builder import DSLtoAST
-from code_generator import generate_python_expr
-from indicators import SMA, RSI
+from strategy_compiler import parse_dsl_to_ast, compile_ast
 from backtest import backtest_signals
+from instrumentation import stage, instrumented
 
 
 # ---------------------------------------------------
@@ -34,60 +32,32 @@ def json_to_dsl(json_rules):
 
 
 # ---------------------------------------------------
-# DSL → AST
-# ---------------------------------------------------
-def parse_dsl_to_ast(dsl_text):
-    tree = dsl_parser.parse(dsl_text)
-    transformer = DSLtoAST()
-    parsed = transformer.transform(tree)
-
-    final_ast = {"entry": [], "exit": []}
-
-    for node in parsed:
-        if isinstance(node, tuple):
-            section, ast = node
-            final_ast[section].append(ast)
-
-    return final_ast
-
-
-# ---------------------------------------------------
-# AST → Signals (safe eval)
+# AST → Signals (compiled once, cached by AST hash)
 # ---------------------------------------------------
 def ast_to_signals(df, ast):
-    signals = pd.DataFrame(index=df.index)
-    signals["entry"] = False
-    signals["exit"] = False
-
-    env = {
-        "df": df,
-        "SMA": SMA,
-        "RSI": RSI,
-        "pd": pd
-    }
-
-    # ENTRY
-    if ast["entry"]:
-        expr = generate_python_expr(ast["entry"][0])
-        signals["entry"] = eval(expr, env)
-
-    # EXIT
-    if ast["exit"]:
-        expr = generate_python_expr(ast["exit"][0])
-        signals["exit"] = eval(expr, env)
-
-    return signals.fillna(False)
+    return compile_ast(ast)(df)
 
 
 # ---------------------------------------------------
 # END-TO-END PIPELINE
 # ---------------------------------------------------
-def run_pipeline(entry_nl, exit_nl, df):
+def run_pipeline(entry_nl, exit_nl, df, metrics=None):
+    """
+    Run every stage and print its output.
+
+    Pass an instrumentation.Metrics as `metrics` to record per-stage wall
+    time, call counts, rows and cache hits for this run.
+    """
+    if metrics is not None:
+        with instrumented(metrics):
+            return run_pipeline(entry_nl, exit_nl, df)
+
     print("\n========================")
     print("1. NL → JSON")
     print("========================")
-    entry_json = nl_to_json_rules(entry_nl)
-    exit_json = nl_to_json_rules(exit_nl)
+    with stage("nl_to_json"):
+        entry_json = nl_to_json_rules(entry_nl)
+        exit_json = nl_to_json_rules(exit_nl)
 
     combined_json = {
         "entry": entry_json["entry"],
@@ -98,7 +68,8 @@ def run_pipeline(entry_nl, exit_nl, df):
     print("\n========================")
     print("2. JSON → DSL")
     print("========================")
-    dsl = json_to_dsl(combined_json)
+    with stage("json_to_dsl"):
+        dsl = json_to_dsl(combined_json)
     print(dsl)
 
     print("\n========================")
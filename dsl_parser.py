@@ -1,11 +1,19 @@
-from lark import Lark
+import os
 
 dsl_grammar = r"""
-    start: entry exit?
+    start: entry exit? risk*
 
     entry: "ENTRY:" expr
     exit: "EXIT:" expr
 
+    // -----------------------------
+    // Risk exits, in percent of the entry price:
+    // STOP_LOSS: 5%   TAKE_PROFIT: 10%   TRAILING_STOP: 3%
+    // -----------------------------
+    risk: RISK_EXIT NUMBER "%"
+    RISK_EXIT: "STOP_LOSS:" | "TAKE_PROFIT:" | "TRAILING_STOP:"
+             | "STOP-LOSS:" | "TAKE-PROFIT:" | "TRAILING-STOP:"
+
     // -----------------------------
     // Boolean expressions
     // Precedence: parentheses > comparison/cross > AND > OR
@@ -28,38 +36,68 @@ dsl_grammar = r"""
     comparison: operand OP operand
 
     // -----------------------------
-    // Operands: indicator, series, constant
+    // Operands: indicator, series, constant (ROC(close,1) < -2)
     // -----------------------------
     ?operand: indicator
             | series
-            | NUMBER
+            | SIGNED_NUMBER
 
     // -----------------------------
     // Cross events
     // -----------------------------
-    cross_above: series "crosses_above" series
-    cross_below: series "crosses_below" series
+    cross_above: operand "crosses_above" operand
+    cross_below: operand "crosses_below" operand
 
     // -----------------------------
-    // Series like: close, high, low, volume, close[1]
+    // Series like: close, high, low, volume, close[1],
+    // and on a higher timeframe: close@1W, high@4h[1]
     // -----------------------------
-    series: CNAME ("[" NUMBER "]")?
+    series: CNAME ("@" TIMEFRAME)? ("[" NUMBER "]")?
 
     // -----------------------------
-    // Indicators like SMA(close,20), RSI(close,14)
+    // Indicators like SMA(close,20), RSI(close,14), MACD(close,12,26,9)
     // -----------------------------
-    indicator: CNAME "(" operand "," NUMBER ")"
+    indicator: CNAME "(" operand ("," NUMBER)+ ")"
 
     // -----------------------------
     // Operators
     // -----------------------------
     OP: ">" | "<" | ">=" | "<=" | "=="
+    TIMEFRAME: /[0-9]+[A-Za-z]+/
 
     %import common.CNAME
     %import common.NUMBER
+    %import common.SIGNED_NUMBER
     %import common.WS
     %ignore WS
 """
 
-# Important: use LALR (fast + safe)
-dsl_parser = Lark(dsl_grammar, start="start", parser="lalr")
+# -----------------------------------------------------------
+# Parser: built on first use, LALR tables cached on disk
+# -----------------------------------------------------------
+# Grammar analysis is the slow part of building the parser, so the
+# analysed LALR parser is serialized to a cache file (keyed by a hash of
+# the grammar, options and lark version) and reloaded by later processes.
+# DSL_PARSER_CACHE overrides the file path; an empty value disables the
+# cache.  The default is lark's per-user file in the temp directory.
+PARSER_CACHE = os.environ.get("DSL_PARSER_CACHE", True)
+
+_parser = None
+
+
+def get_parser():
+    global _parser
+    if _parser is None:
+        from lark import Lark
+
+        # Important: use LALR (fast + safe)
+        _parser = Lark(dsl_grammar, start="start", parser="lalr", cache=PARSER_CACHE or False)
+    return _parser
+
+
+def __getattr__(name):
+    # `from dsl_parser import dsl_parser` keeps working without building
+    # the parser at import time
+    if name == "dsl_parser":
+        return get_parser()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
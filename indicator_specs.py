@@ -0,0 +1,43 @@
+# -----------------------------------------------------------
+# Indicator signatures (no NumPy / pandas: used while parsing)
+# -----------------------------------------------------------
+# (min, max) count of the numbers after the series: MACD(close,12,26[,9])
+INDICATOR_ARITY = {
+    "SMA": (1, 1),
+    "RSI": (1, 1),
+    "EMA": (1, 1),
+    "ATR": (1, 1),
+    "MACD": (2, 3),
+    "ROC": (1, 1),
+}
+
+# Extra columns an indicator reads at the same lookback as its series
+INDICATOR_INPUTS = {
+    "ATR": ("high", "low"),
+}
+
+
+def indicator_params(period):
+    """An AST node's "period" (an int, or a list for MACD) as a tuple of arguments."""
+    if isinstance(period, (list, tuple)):
+        return tuple(period)
+    return (period,)
+
+
+# -----------------------------------------------------------
+# Timeframes of qualified series: close@1W, high@4h
+# -----------------------------------------------------------
+# m minutes, h hours, D days, W weeks (from Monday), M calendar months
+TIMEFRAME_UNITS = ("m", "h", "D", "W", "M")
+_UNIT_ALIASES = {"min": "m", "H": "h", "d": "D", "w": "W"}
+
+
+def normalize_timeframe(text):
+    """'1w' / '4H' / '15min' → canonical '1W' / '4h' / '15m' (ValueError when unknown)."""
+    unit = text.lstrip("0123456789")
+    digits = text[:len(text) - len(unit)]
+    unit = _UNIT_ALIASES.get(unit, unit)
+    if not digits or int(digits) < 1 or unit not in TIMEFRAME_UNITS:
+        raise ValueError(f"Unknown timeframe {text!r} (expected a count and one of: "
+                         f"{', '.join(TIMEFRAME_UNITS)}, e.g. 1W, 4h, 15m)")
+    return f"{int(digits)}{unit}"
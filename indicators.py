@@ -1,5 +1,10 @@
+import numpy as np
 import pandas as pd
 
+import kernels
+# signatures live apart so the parser can use them without NumPy / pandas
+from indicator_specs import INDICATOR_ARITY, INDICATOR_INPUTS, indicator_params
+
 # -----------------------------------------------------------
 # Simple Moving Average
 # -----------------------------------------------------------
@@ -18,16 +23,139 @@ def SMA(series, period):
 def RSI(series, period=14):
     """
     Compute RSI using Wilder's smoothing.
+
+    Average gain / loss start as the simple mean of the first `period`
+    changes, then follow avg = (avg * (period - 1) + change) / period
+    (one recursive pass over the values, see kernels.py).
+    """
+    return _wrap(kernels.rsi(_values(series), period), series)
+
+
+# -----------------------------------------------------------
+# Exponential Moving Average / ATR / MACD / Rate of Change
+# -----------------------------------------------------------
+def EMA(series, period):
+    """EMA with alpha = 2 / (period + 1), seeded with the SMA of the first `period` values."""
+    return _wrap(kernels.ema(_values(series), period), series)
+
+
+def ATR(series, period, high, low):
+    """
+    Average True Range: Wilder-smoothed max(high - low, |high - prev close|, |low - prev close|).
+
+    `series` is the close; `high` / `low` are read by the caller at the same lookback.
+    """
+    return _wrap(kernels.atr(_values(series), period, _values(high), _values(low)), series)
+
+
+def MACD(series, fast=12, slow=26, signal=None):
+    """MACD line EMA(fast) - EMA(slow); given `signal`, the histogram line - EMA(line, signal)."""
+    return _wrap(kernels.macd(_values(series), fast, slow, signal), series)
+
+
+def ROC(series, period):
+    """Rate of change in percent: 100 * (x - x[period]) / x[period] (NaN where x[period] is 0)."""
+    previous = series.shift(period)
+    previous = previous.where(previous != 0)
+    return (series - previous) / previous * 100.0
+
+
+def _values(series):
+    return np.asarray(series, dtype=np.float64)
+
+
+def _wrap(values, series):
+    return pd.Series(values, index=series.index)
+
+
+# -----------------------------------------------------------
+# Indicator banks: many periods of one indicator in one pass
+# -----------------------------------------------------------
+def SMA_bank(values, periods):
     """
-    delta = series.diff()
+    SMA(values, p) for every p in `periods` → (bars x periods).
+
+    One pass of the rolling-mean kernel per period: the same values as
+    Series.rolling(p).mean() bit for bit, so ties such as close == SMA on
+    cent prices come out as pandas has them.
+    """
+    values = np.asarray(values, dtype=float)
+    bank = np.empty((len(values), len(periods)))
+    for j, period in enumerate(periods):
+        bank[:, j] = kernels.sma(values, period)
+    return bank
+
 
-    gain = delta.where(delta > 0, 0.0)
-    loss = -delta.where(delta < 0, 0.0)
+def RSI_bank(values, periods):
+    """RSI(values, p) for every p in `periods`, sharing one gain/loss pass."""
+    values = np.asarray(values, dtype=float)
+    delta = np.diff(values, prepend=np.nan)
 
-    avg_gain = gain.rolling(period).mean()
-    avg_loss = loss.rolling(period).mean()
+    gain = np.maximum(delta, 0.0)
+    loss = np.maximum(-delta, 0.0)
+
+    bank = np.empty((len(values), len(periods)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for j, period in enumerate(periods):
+            alpha = kernels.wilder_alpha(period)
+            avg_gain = kernels.RecursiveMean(alpha, period).process(gain)
+            avg_loss = kernels.RecursiveMean(alpha, period).process(loss)
+            bank[:, j] = 100 - (100 / (1 + avg_gain / avg_loss))
+    return bank
+
+
+# -----------------------------------------------------------
+# Array kernels: NumPy in, NumPy out (no index alignment)
+# -----------------------------------------------------------
+def shift_array(values, periods):
+    """NaN-padded equivalent of Series.shift(periods) for a float array."""
+    if periods == 0:
+        return values
+    shifted = np.full(len(values), np.nan)
+    if periods < len(values):
+        shifted[periods:] = values[:len(values) - periods]
+    return shifted
+
+
+def SMA_array(values, period):
+    """SMA over a float64 array (same values as SMA)."""
+    return kernels.sma(values, period)
+
+
+def RSI_array(values, period=14):
+    """RSI over a float64 array (same definition as RSI)."""
+    return kernels.rsi(values, period)
+
+
+def ROC_array(values, period):
+    """ROC over a float64 array (same definition as ROC)."""
+    previous = shift_array(values, period)
+    previous = np.where(previous == 0, np.nan, previous)
+    return (values - previous) / previous * 100.0
+
+
+# -----------------------------------------------------------
+# Registry: DSL indicator name → implementation
+# -----------------------------------------------------------
+INDICATORS = {
+    "SMA": SMA,
+    "RSI": RSI,
+    "EMA": EMA,
+    "ATR": ATR,
+    "MACD": MACD,
+    "ROC": ROC,
+}
 
-    rs = avg_gain / avg_loss
+ARRAY_INDICATORS = {
+    "SMA": SMA_array,
+    "RSI": RSI_array,
+    "EMA": kernels.ema,
+    "ATR": kernels.atr,
+    "MACD": kernels.macd,
+    "ROC": ROC_array,
+}
 
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+INDICATOR_BANKS = {
+    "SMA": SMA_bank,
+    "RSI": RSI_bank,
+}
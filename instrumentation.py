@@ -0,0 +1,189 @@
+import contextlib
+import json
+import logging
+import time
+
+
+# ============================================================
+# Pipeline instrumentation
+# ============================================================
+#
+# Library code marks its stages with
+#
+#     with stage("backtest", rows=len(df)):
+#         ...
+#     count("indicator_cache.hits")
+#
+# and nothing is measured until a Metrics object is enabled (or a hook is
+# registered).  While disabled, `stage` returns one shared no-op context
+# manager and `count` returns immediately, so instrumented code pays a
+# global lookup and a function call.
+#
+#     with instrumented() as metrics:
+#         run_pipeline(entry_nl, exit_nl, df)
+#     print(metrics.to_frame())
+#
+# Stages recorded by the pipeline:
+#   parse / transform           strategy_compiler.parse_dsl_to_ast (memo misses)
+#   codegen                     CompiledStrategy (generate + compile source)
+#   evaluate                    CompiledStrategy call (rows = bars)
+#   indicator.<NAME>            indicator computed on a cache miss (rows = bars)
+#   resample.<TIMEFRAME>        timeframes.resampled on a cache miss (rows = bars aggregated)
+#   backtest                    backtest_signals (rows = bars)
+#   portfolio                   portfolio.backtest_portfolio (rows = bars x symbols)
+#   screen.parse / .evaluate /  screening.screen
+#   .backtest
+#   walk_forward.evaluate /     walk_forward (signals once; rows = bars x strategies,
+#   .backtest                   window bars x strategies)
+#   robustness                  robustness.monte_carlo (rows = paths x returns per path)
+#   nl_to_json / json_to_dsl    demo.run_pipeline
+# Counters: indicator_cache.hits / .misses, strategy_cache.hits / .misses,
+#           parse_cache.hits / .misses, lazy_eval.bars_skipped, screen.duplicates,
+#           resample_cache.hits / .misses / .extended, nl_cache.hits / .misses
+# ============================================================
+
+
+class Metrics:
+    """Wall time, call count and rows per stage, plus named counters."""
+
+    def __init__(self):
+        self.stages = {}        # name → {"calls", "seconds", "rows"}
+        self.counters = {}      # name → int
+
+    def record(self, name, seconds, rows=0):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = {"calls": 0, "seconds": 0.0, "rows": 0}
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        stats["rows"] += rows
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        self.stages.clear()
+        self.counters.clear()
+
+    # ------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------
+    def as_dict(self):
+        return {"stages": {name: dict(stats) for name, stats in self.stages.items()},
+                "counters": dict(self.counters)}
+
+    def to_json(self, path=None):
+        """JSON text of `as_dict()`; also written to `path` when given."""
+        text = json.dumps(self.as_dict(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+    def to_frame(self):
+        """One row per stage: calls, seconds, rows, rows_per_sec (slowest first)."""
+        import pandas as pd
+
+        table = pd.DataFrame.from_dict(self.stages, orient="index",
+                                       columns=["calls", "seconds", "rows"])
+        table.index.name = "stage"
+        table["rows_per_sec"] = (table["rows"] / table["seconds"]).where(table["rows"] > 0)
+        return table.sort_values("seconds", ascending=False)
+
+    def log(self, logger=None, level=logging.INFO):
+        logger = logger or logging.getLogger(__name__)
+        for name, stats in self.stages.items():
+            logger.log(level, "%s: %d calls, %.6fs, %d rows",
+                       name, stats["calls"], stats["seconds"], stats["rows"])
+        for name, value in self.counters.items():
+            logger.log(level, "%s: %d", name, value)
+
+    def __repr__(self):
+        return f"Metrics(stages={len(self.stages)}, counters={self.counters})"
+
+
+# -----------------------------------------------------------
+# Global switch and hooks
+# -----------------------------------------------------------
+_active = None          # Metrics receiving measurements (None: disabled)
+_hooks = []             # callables hook(stage_name, seconds, rows)
+
+
+def enable(metrics=None):
+    """Start recording into `metrics` (a new Metrics by default); returns it."""
+    global _active
+    _active = metrics if metrics is not None else Metrics()
+    return _active
+
+
+def disable():
+    """Stop recording; returns the Metrics that was active (or None)."""
+    global _active
+    metrics, _active = _active, None
+    return metrics
+
+
+def active_metrics():
+    return _active
+
+
+@contextlib.contextmanager
+def instrumented(metrics=None):
+    """Record into `metrics` for the duration of the block, then restore the previous state."""
+    global _active
+    previous = _active
+    metrics = enable(metrics)
+    try:
+        yield metrics
+    finally:
+        _active = previous
+
+
+def add_hook(hook):
+    """Call `hook(stage_name, seconds, rows)` after every stage (even without Metrics)."""
+    _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+# -----------------------------------------------------------
+# Measurement points used by library code
+# -----------------------------------------------------------
+class _Stage:
+    __slots__ = ("name", "rows", "start")
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        metrics = _active
+        if metrics is not None:
+            metrics.record(self.name, seconds, self.rows)
+        for hook in _hooks:
+            hook(self.name, seconds, self.rows)
+        return False
+
+
+_DISABLED = contextlib.nullcontext()
+
+
+def stage(name, rows=0):
+    """Context manager timing one stage; a shared no-op while instrumentation is off."""
+    if _active is None and not _hooks:
+        return _DISABLED
+    return _Stage(name, rows)
+
+
+def count(name, n=1):
+    metrics = _active
+    if metrics is not None:
+        metrics.count(name, n)
@@ -0,0 +1,355 @@
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from caching import LRUCache
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+
+class JobError(RuntimeError):
+    """A job's own failure, as "<type>: <message>" of the original exception (see run_job)."""
+
+
+# ============================================================
+# Asynchronous backtest jobs
+# ============================================================
+#
+#     async with JobService(workers=4) as service:
+#         service.add_dataset("spy", df)                  # or a datastore directory / CSV path
+#         async for job in service.map([{"text": dsl, "dataset": "spy"} for dsl in library]):
+#             print(job.id, job.status, job.result)
+#
+# Jobs carry only text and a dataset *reference*; the parent never ships
+# frames to the workers.  Each worker process keeps an LRU of opened datasets
+# (memory-mapped datastore directories, so a dataset costs page cache, not
+# heap) and the usual strategy / indicator caches, so repeated strategies and
+# datasets are compiled, loaded and computed once per worker.
+#
+# Backpressure: `submit` waits while `max_pending` jobs are queued, and at
+# most `max_running` jobs are handed to the pool at once, so thousands of
+# submissions hold a bounded number of payloads and results in flight.
+# Results are the backtest summary (no trades / equity), small enough to
+# keep per job.
+# ============================================================
+
+
+class Job:
+    """One submitted strategy run; `await job` returns its result dict (None if it failed, see `error`)."""
+
+    def __init__(self, job_id, dsl, dataset, start, end, backtest_kwargs, future):
+        self.id = job_id
+        self.dsl = dsl
+        self.dataset = dataset
+        self.start = start
+        self.end = end
+        self.backtest_kwargs = backtest_kwargs
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.seconds = None
+        self._future = future
+
+    def done(self):
+        return self._future.done()
+
+    def __await__(self):
+        return asyncio.shield(self._future).__await__()
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.status})"
+
+
+class JobService:
+    """
+    Local asyncio front end to a process pool of backtest workers.
+
+    Args:
+        workers (int): pool size (default: os.cpu_count())
+        max_pending (int): queued jobs before `submit` waits (backpressure)
+        max_running (int): jobs in the pool at once (default: 2 x workers,
+                           enough to keep every worker busy)
+        processes (bool): False runs the workers on threads in this process
+                          (tests, notebooks: no pickling, shared caches)
+        engine (str): backtest_signals engine used by the workers
+    """
+
+    def __init__(self, workers=None, max_pending=256, max_running=None, processes=True,
+                 engine="vectorized"):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.max_running = max_running or 2 * self.workers
+        self.processes = processes
+        self.engine = engine
+
+        self._ids = itertools.count()
+        self._datasets = {}                 # registered name → datastore directory
+        self._subscribers = set()           # queues of `events()` iterators
+        self._nl_cache = LRUCache(maxsize=1024)
+        self._queue = None
+        self._runners = []
+        self._executor = None
+        self._tempdir = None
+
+    # ------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------
+    async def start(self):
+        if self._executor is not None:
+            return self
+        if self.processes:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._runners = [asyncio.create_task(self._runner()) for _ in range(self.max_running)]
+        return self
+
+    async def close(self):
+        """Finish the queued jobs, then stop the runners and the pool."""
+        if self._executor is None:
+            return
+        await self._queue.join()
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        if self._tempdir is not None:
+            self._tempdir.cleanup()
+            self._tempdir = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # ------------------------------------------------------------
+    # Datasets
+    # ------------------------------------------------------------
+    def add_dataset(self, name, df):
+        """
+        Make an in-memory DatetimeIndex'ed frame available to jobs as `name`.
+
+        The frame is written once in the datastore format to a private
+        temporary directory; workers memory-map it instead of receiving a copy
+        per job.
+        """
+        from datastore import write_frame
+
+        if self._tempdir is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix="jobs-")
+        directory = Path(self._tempdir.name) / str(len(self._datasets))
+        write_frame(df, directory)
+        self._datasets[name] = str(directory)
+
+    def add_csv(self, name, path, date_format=None, dayfirst=False):
+        """
+        Make a `date,open,high,low,close,volume` CSV available to jobs as `name`.
+
+        The file is converted once to the datastore format (datastore.convert_csv,
+        which takes `date_format` / `dayfirst`: sample.csv needs dayfirst=True),
+        so workers memory-map it and `start` / `end` select dates, not strings.
+        """
+        from datastore import convert_csv
+
+        if self._tempdir is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix="jobs-")
+        directory = Path(self._tempdir.name) / str(len(self._datasets))
+        convert_csv(path, directory, date_format=date_format, dayfirst=dayfirst)
+        self._datasets[name] = str(directory)
+
+    def _resolve(self, dataset):
+        if dataset in self._datasets:
+            return self._datasets[dataset]
+        path = Path(dataset)
+        if not path.exists():
+            raise ValueError(f"Unknown dataset: {dataset!r} (not registered and no such path)")
+        return str(path.resolve())
+
+    # ------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------
+    async def submit(self, text, dataset, nl=False, start=None, end=None, **backtest_kwargs):
+        """
+        Queue one job and return its Job (waits while the queue is full).
+
+        Args:
+            text: DSL text, or with nl=True a natural-language rule: one
+                  string, or an (entry, exit) pair of strings
+            dataset: name given to add_dataset / add_csv, a datastore directory
+                     or a CSV file (dates in pandas' default parsing; use
+                     add_csv for day-first or other formats)
+            start, end: optional date range (a date-only end covers that day)
+            **backtest_kwargs: initial_capital, slippage, commission
+        """
+        if self._executor is None:
+            await self.start()
+        dsl = self._nl_to_dsl(text) if nl else text
+        job = Job(next(self._ids), dsl, self._resolve(dataset), start, end, backtest_kwargs,
+                  asyncio.get_running_loop().create_future())
+        await self._queue.put(job)
+        self._publish(job)
+        return job
+
+    def _nl_to_dsl(self, text):
+        from demo import json_to_dsl
+        from nl_parser import nl_to_json_rules
+
+        key = text if isinstance(text, str) else tuple(text)
+        dsl = self._nl_cache.get(key)
+        if dsl is None:
+            entry_nl, exit_nl = (text, text) if isinstance(text, str) else text
+            rules = {"entry": nl_to_json_rules(entry_nl)["entry"], "exit": nl_to_json_rules(exit_nl)["exit"]}
+            dsl = json_to_dsl(rules)
+            self._nl_cache.put(key, dsl)
+        return dsl
+
+    async def map(self, jobs):
+        """
+        Submit every job spec (dict of `submit` arguments) and yield the Jobs
+        as they complete, in completion order.  Submission follows the
+        service's backpressure, so `jobs` may be a long (lazy) iterable.
+        """
+        completed = asyncio.Queue()
+        submitted = 0
+        feeding = True
+
+        async def feed():
+            nonlocal submitted, feeding
+            try:
+                for spec in jobs:
+                    job = await self.submit(**spec)
+                    job._future.add_done_callback(lambda _, job=job: completed.put_nowait(job))
+                    submitted += 1
+            finally:
+                feeding = False
+                completed.put_nowait(None)
+
+        feeder = asyncio.create_task(feed())
+        finished = 0
+        try:
+            while feeding or finished < submitted:
+                job = await completed.get()
+                if job is None:
+                    continue
+                finished += 1
+                yield job
+            await feeder                        # surface submission errors
+        finally:
+            feeder.cancel()
+
+    async def events(self):
+        """
+        Yield every job's state changes as {"job", "status", "result",
+        "error"} dicts from now until the service closes.
+        """
+        queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            self._subscribers.discard(queue)
+
+    def _publish(self, job):
+        if not self._subscribers:
+            return
+        event = {"job": job.id, "status": job.status, "result": job.result, "error": job.error}
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    async def _runner(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                job.status = "running"
+                self._publish(job)
+                started = time.perf_counter()
+                try:
+                    job.result = await loop.run_in_executor(
+                        self._executor, run_job, job.dsl, job.dataset, job.start, job.end,
+                        job.backtest_kwargs, self.engine)
+                    job.status = "done"
+                except JobError as exc:       # already "<type>: <message>"
+                    job.error = str(exc)
+                    job.status = "failed"
+                except Exception as exc:      # one bad job must not stop the service
+                    job.error = f"{type(exc).__name__}: {exc}"
+                    job.status = "failed"
+                job.seconds = time.perf_counter() - started
+                self._publish(job)
+                if not job._future.done():
+                    job._future.set_result(job.result)
+            finally:
+                self._queue.task_done()
+
+
+# ============================================================
+# Worker side
+# ============================================================
+_frames = LRUCache(maxsize=16)     # (path, start, end, date options) → frame, per worker process
+
+
+def _load(path, start, end, date_format=None, dayfirst=False):
+    key = (path, start, end, date_format, dayfirst)
+    df = _frames.get(key)
+    if df is None:
+        if Path(path).is_dir():
+            from datastore import open_dataset
+
+            dataset = open_dataset(path)
+            if start is not None or end is not None:
+                dataset = dataset.between(start, end)
+            df = dataset.to_frame()
+        else:
+            import pandas as pd
+
+            df = pd.read_csv(path, index_col=0)
+            df.index = pd.DatetimeIndex(pd.to_datetime(df.index, format=date_format, dayfirst=dayfirst),
+                                        name=df.index.name)
+            df = df.loc[start:end] if start is not None or end is not None else df
+        # the same frame object for every job: the indicator cache keys on it
+        _frames.put(key, df)
+    return df
+
+
+def run_job(dsl, dataset, start=None, end=None, backtest_kwargs=None, engine="vectorized",
+            date_format=None, dayfirst=False):
+    """
+    Compile (cached), evaluate and backtest one strategy; returns the summary dict.
+
+    `dataset` is a datastore directory or a CSV file whose first column is
+    parsed as dates (`date_format` / `dayfirst` as in pd.to_datetime).
+
+    Errors are re-raised as JobError("<type>: <message>"): the original
+    exception may not survive the trip back from a worker process (a parse
+    error holds the parser state, which cannot be pickled).
+    """
+    from backtest import backtest_signals
+    from strategy_compiler import compile_strategy
+
+    try:
+        df = _load(dataset, start, end, date_format, dayfirst)
+        signals = compile_strategy(dsl)(df)
+        result = backtest_signals(df, signals, engine=engine, **(backtest_kwargs or {}))
+    except Exception as exc:
+        raise JobError(f"{type(exc).__name__}: {exc}") from None
+    return {
+        "bars": len(df),
+        "final_capital": result["final_capital"],
+        "total_return_pct": result["total_return_pct"],
+        "max_drawdown_pct": result["max_drawdown_pct"],
+        "num_trades": result["num_trades"],
+    }
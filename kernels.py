@@ -0,0 +1,323 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+try:                                # optional: compiled recursion
+    import numba
+except ImportError:
+    numba = None
+
+NAN = float("nan")
+
+
+# ============================================================
+# Recursive smoothing kernel (EMA / Wilder RMA)
+# ============================================================
+#
+#   value[t] = (1 - alpha) * value[t-1] + alpha * x[t]
+#
+# seeded with the simple mean of the first `period` observations (the
+# TA-Lib convention: NaN until then).  NaN inputs are skipped: they output
+# NaN and leave the state untouched.
+#
+# The update is written exactly as pandas' ewm(adjust=False, ignore_na=True)
+# evaluates it (alpha round-tripped through the centre of mass, normalised
+# by the weight sum, skipped when the value would not change), so the
+# numba loop, the pandas fallback and the per-bar streaming states in
+# streaming.py produce bit-identical results.
+# ============================================================
+def smoothing_weights(alpha):
+    """(old, new) weights of the update, as pandas derives them from `alpha`."""
+    alpha = 1.0 / (1.0 + (1.0 - alpha) / alpha)
+    return 1.0 - alpha, alpha
+
+
+def _recurse_loop(values, out, old_weight, new_weight, value):
+    for i in range(len(values)):
+        x = values[i]
+        if x != x:
+            out[i] = np.nan
+            continue
+        if value != x:
+            value = (old_weight * value + new_weight * x) / (old_weight + new_weight)
+        out[i] = value
+    return value
+
+
+if numba is not None:
+    _recurse_loop = numba.njit(cache=True, nogil=True)(_recurse_loop)
+
+
+def _recurse(values, alpha, value):
+    """Continue the recursion from `value` over `values`; returns (outputs, last value)."""
+    if not len(values):
+        return np.empty(0), value
+    if numba is not None:
+        out = np.empty(len(values))
+        old_weight, new_weight = smoothing_weights(alpha)
+        return out, _recurse_loop(values, out, old_weight, new_weight, value)
+
+    # pandas' compiled ewm, started from the carried value
+    data = np.concatenate(([value], values))
+    out = pd.Series(data).ewm(alpha=alpha, adjust=False, ignore_na=True).mean().to_numpy()[1:]
+    missing = np.isnan(values)
+    if not missing.any():
+        return out, out[-1]
+    observed = np.flatnonzero(~missing)
+    if len(observed):
+        value = out[observed[-1]]
+    return np.where(missing, np.nan, out), value
+
+
+def _first_observations(values, count):
+    """Positions of the first `count` non-NaN values (scanning only as far as needed)."""
+    limit = count
+    while True:
+        observed = np.flatnonzero(~np.isnan(values[:limit]))
+        if len(observed) >= count or limit >= len(values):
+            return observed[:count]
+        limit *= 2
+
+
+class RecursiveMean:
+    """
+    Resumable smoothing state: `process` takes consecutive blocks of one
+    series and returns the same values as processing them in one piece.
+    """
+
+    def __init__(self, alpha, period):
+        self.alpha = alpha
+        self.period = period
+        self.count = 0              # observations summed into the seed so far
+        self.total = 0.0
+        self.value = NAN
+
+    def process(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if self.count == self.period:
+            out, self.value = _recurse(values, self.alpha, self.value)
+            return out
+
+        taken = _first_observations(values, self.period - self.count)
+        # sequential running sum, as the per-bar state accumulates it
+        self.total = np.cumsum(np.concatenate(([self.total], values[taken])))[-1]
+        self.count += len(taken)
+        out = np.full(len(values), np.nan)
+        if self.count < self.period:
+            return out
+
+        seed_at = taken[-1]
+        self.value = self.total / self.period
+        out[seed_at] = self.value
+        if seed_at + 1 < len(values):
+            out[seed_at + 1:], self.value = _recurse(values[seed_at + 1:], self.alpha, self.value)
+        return out
+
+
+def ema_alpha(period):
+    return 2.0 / (period + 1)
+
+
+def wilder_alpha(period):
+    return 1.0 / period
+
+
+# ============================================================
+# Rolling-window mean (SMA)
+# ============================================================
+#
+# pandas' Series.rolling(period).mean() walks the series once, adding the
+# entering value and removing the leaving one with separate Kahan
+# compensations, and corrects the mean of a window of repeated values (the
+# last value itself) and the sign of an all-positive / all-negative window.
+# Its rounding therefore depends on the whole history before a bar, and a
+# cumulative-sum window (or a restart at a chunk boundary) can land on the
+# other side of a tie such as `close == SMA(close,20)` on cent prices.
+#
+# The loop below is that algorithm with its state in two small arrays, so
+# it can resume where the previous block stopped.  NaN inputs are skipped
+# (a window holding one is NaN).  With numba unavailable, one-shot arrays
+# go through pandas itself and only resumed blocks run the Python loop.
+# ============================================================
+def _rolling_mean_loop(values, out, window, sums, counts):
+    # sums:   running sum, add / remove compensations, previous observation
+    # counts: observations, negative observations, repeats of the previous
+    #         observation, values in the window so far, ring position
+    period = len(window)
+    sum_x, add_c, remove_c, prev_value = sums[0], sums[1], sums[2], sums[3]
+    nobs, neg_ct, same_count, filled, pos = counts[0], counts[1], counts[2], counts[3], counts[4]
+
+    for i in range(len(values)):
+        x = values[i]
+        if filled == period:
+            old = window[pos]
+            if old == old:
+                nobs -= 1
+                y = -old - remove_c
+                t = sum_x + y
+                remove_c = t - sum_x - y
+                sum_x = t
+                if math.copysign(1.0, old) < 0:
+                    neg_ct -= 1
+        else:
+            filled += 1
+        window[pos] = x
+        pos = pos + 1 if pos + 1 < period else 0
+
+        if x == x:
+            nobs += 1
+            y = x - add_c
+            t = sum_x + y
+            add_c = t - sum_x - y
+            sum_x = t
+            if math.copysign(1.0, x) < 0:
+                neg_ct += 1
+            if x == prev_value:
+                same_count += 1
+            else:
+                same_count = 1
+            prev_value = x
+
+        if nobs < period:
+            out[i] = np.nan
+            continue
+        mean = sum_x / nobs
+        if same_count >= nobs:
+            mean = prev_value
+        elif neg_ct == 0 and mean < 0:
+            mean = 0.0
+        elif neg_ct == nobs and mean > 0:
+            mean = 0.0
+        out[i] = mean
+
+    sums[0], sums[1], sums[2], sums[3] = sum_x, add_c, remove_c, prev_value
+    counts[0], counts[1], counts[2], counts[3], counts[4] = nobs, neg_ct, same_count, filled, pos
+
+
+if numba is not None:
+    _rolling_mean_loop = numba.njit(cache=True, nogil=True)(_rolling_mean_loop)
+
+
+class RollingMean:
+    """
+    Resumable rolling-mean state: `process` takes consecutive blocks of one
+    series and returns Series.rolling(period).mean() of the whole series.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.window = np.full(period, np.nan)
+        self.sums = np.array([0.0, 0.0, 0.0, NAN])
+        self.counts = np.zeros(5, dtype=np.int64)
+
+    def process(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if self.period == 1:
+            # pandas starts every one-bar window afresh: the mean is the value
+            return values.copy()
+        out = np.empty(len(values))
+        _rolling_mean_loop(values, out, self.window, self.sums, self.counts)
+        return out
+
+
+# ============================================================
+# Indicator kernels (stateful: one instance per series)
+# ============================================================
+# Each kernel's `process(values, *inputs)` consumes the next block of bars
+# and keeps whatever it needs to continue (previous close, smoothing
+# state), so chunked evaluation equals one pass over the whole history.
+class EMAKernel:
+    def __init__(self, period):
+        self.mean = RecursiveMean(ema_alpha(period), period)
+
+    def process(self, values):
+        return self.mean.process(values)
+
+
+class RSIKernel:
+    """Wilder RSI: RMA of gains over RMA of losses, seeded with their simple means."""
+
+    def __init__(self, period):
+        self.prev = NAN
+        self.avg_gain = RecursiveMean(wilder_alpha(period), period)
+        self.avg_loss = RecursiveMean(wilder_alpha(period), period)
+
+    def process(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        delta = np.diff(values, prepend=self.prev)
+        if len(values):
+            self.prev = values[-1]
+
+        avg_gain = self.avg_gain.process(np.maximum(delta, 0.0))
+        avg_loss = self.avg_loss.process(np.maximum(-delta, 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+class ATRKernel:
+    """Wilder-smoothed true range (first bar: high - low)."""
+
+    def __init__(self, period):
+        self.prev_close = NAN
+        self.mean = RecursiveMean(wilder_alpha(period), period)
+
+    def process(self, close, high, low):
+        close = np.asarray(close, dtype=np.float64)
+        high = np.asarray(high, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        prev_close = np.concatenate(([self.prev_close], close[:-1]))
+        if len(close):
+            self.prev_close = close[-1]
+
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        return self.mean.process(true_range)
+
+
+class MACDKernel:
+    """EMA(fast) - EMA(slow); with a signal period, the histogram (line - EMA(line, signal))."""
+
+    def __init__(self, fast, slow, signal=None):
+        self.fast = EMAKernel(fast)
+        self.slow = EMAKernel(slow)
+        self.signal = EMAKernel(signal) if signal else None
+
+    def process(self, values):
+        line = self.fast.process(values) - self.slow.process(values)
+        if self.signal is None:
+            return line
+        return line - self.signal.process(line)
+
+
+KERNELS = {
+    "SMA": RollingMean,
+    "EMA": EMAKernel,
+    "RSI": RSIKernel,
+    "ATR": ATRKernel,
+    "MACD": MACDKernel,
+}
+
+
+# -----------------------------------------------------------
+# One-shot array functions
+# -----------------------------------------------------------
+def sma(values, period):
+    if numba is None:
+        return pd.Series(values, dtype=np.float64).rolling(period).mean().to_numpy()
+    return RollingMean(period).process(values)
+
+
+def ema(values, period):
+    return EMAKernel(period).process(values)
+
+
+def rsi(values, period=14):
+    return RSIKernel(period).process(values)
+
+
+def atr(close, period, high, low):
+    return ATRKernel(period).process(close, high, low)
+
+
+def macd(values, fast=12, slow=26, signal=None):
+    return MACDKernel(fast, slow, signal).process(values)
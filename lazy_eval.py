@@ -0,0 +1,259 @@
+import operator
+
+import numpy as np
+import pandas as pd
+
+from ast_optimizer import eliminate_common_subexpressions
+from caching import LRUCache, cached_indicator, cached_array_indicator
+from code_generator import CODE_TARGETS, parse_number
+from indicators import indicator_params, shift_array
+from instrumentation import stage, count
+from strategy_compiler import ast_hash, normalize_dsl, parse_dsl_to_ast, _column_array
+from timeframes import align, timeframe_bars
+
+
+# ============================================================
+# Lazy evaluation of ENTRY / EXIT rules
+# ============================================================
+#
+# The compiled strategies evaluate every condition over every bar.  Here the
+# CSE'd AST (ast_optimizer) becomes a DAG of value nodes (columns, shifts,
+# indicators: each computed at most once per call) and condition nodes that
+# are evaluated only on the bars still undecided:
+#
+#   A AND B     A on the live bars, then B only where A is True
+#   A OR B      A on the live bars, then B only where A is False
+#
+# and the child with the lower estimated cost goes first.  A branch whose
+# live set is empty is never evaluated, so an indicator used only behind a
+# selective filter is not computed at all; otherwise comparisons, shifts
+# and column reads touch only the live bars.
+#
+# Indicators are computed exactly as the compiled code of the same backend
+# computes them (and through the same indicator cache), so the signals are
+# identical to CompiledStrategy's.
+# ============================================================
+
+# Relative cost of computing an indicator over the full series
+INDICATOR_COSTS = {"SMA": 2.0, "EMA": 3.0, "RSI": 4.0, "ATR": 5.0, "MACD": 6.0, "ROC": 1.0}
+DEFAULT_INDICATOR_COST = 4.0
+COMPARISON_COST = 0.1        # per condition, with every operand already materialized
+# above this fraction of live bars, evaluating every bar and selecting the
+# live results is cheaper than gathering each operand at the live bars
+DENSE_FRACTION = 0.25
+
+_OPERATORS = {
+    ">": operator.gt, "<": operator.lt, ">=": operator.ge, "<=": operator.le, "==": operator.eq,
+}
+
+
+class _Evaluation:
+    """State of one call: materialized temporaries of the DAG for one frame."""
+
+    def __init__(self, strategy, df, cache):
+        self.strategy = strategy
+        self.df = df
+        self.cache = cache
+        self.values = {}        # temp name → float64 array over all bars
+        self.series = {}        # temp name → Series (pandas backend)
+
+    # ------------------------------------------------------------
+    # Value nodes
+    # ------------------------------------------------------------
+    def full(self, name):
+        """All bars of temporary `name` (computed once)."""
+        values = self.values.get(name)
+        if values is None:
+            if self.strategy.backend == "pandas":
+                series = self._series(name)
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                values = self._array(name)
+            self.values[name] = values
+        return values
+
+    def _series(self, name):
+        """pandas backend: the Series the generated code would hold in `name`."""
+        series = self.series.get(name)
+        if series is not None:
+            return series
+        node = self.strategy.temps[name]
+        if node["type"] == "column":
+            series = self._frame(node)[node["name"]]
+        elif node["type"] == "shift":
+            series = self._series(node["operand"]["name"]).shift(node["periods"])
+        elif node["type"] == "align":
+            series = align(self.df, self._series(node["operand"]["name"]), node["timeframe"])
+        else:
+            column, lag = node["source"]
+            inputs = [self._series(ref["name"]) for ref in node.get("inputs", ())]
+            series = cached_indicator(self.df, node["name"].upper(), self._series(node["series"]["name"]),
+                                      _period(node), column, lag, self.cache, inputs)
+        self.series[name] = series
+        return series
+
+    def _array(self, name):
+        """numpy backend: the array the generated code would hold in `name`."""
+        node = self.strategy.temps[name]
+        if node["type"] == "column":
+            return _column_array(self._frame(node), node["name"])
+        if node["type"] == "shift":
+            return shift_array(self.full(node["operand"]["name"]), node["periods"])
+        if node["type"] == "align":
+            return align(self.df, self.full(node["operand"]["name"]), node["timeframe"])
+        column, lag = node["source"]
+        inputs = [self.full(ref["name"]) for ref in node.get("inputs", ())]
+        return cached_array_indicator(self.df, node["name"].upper(), self.full(node["series"]["name"]),
+                                      _period(node), column, lag, self.cache, inputs)
+
+    def _frame(self, column):
+        """The frame a column node reads: df, or its resampled bars (close@1W)."""
+        if "timeframe" in column:
+            return timeframe_bars(self.df, column["timeframe"])
+        return self.df
+
+    def at(self, value, bars):
+        """Operand (ref or number) at positions `bars`."""
+        if not isinstance(value, dict):
+            return parse_number(value)
+
+        name = value["name"]
+        if len(bars) == len(self.df):       # every bar live: no gather
+            return self.full(name)
+        if name not in self.values:
+            node = self.strategy.temps[name]
+            if node["type"] == "shift":
+                # gather from the unshifted values instead of shifting every bar
+                source = bars - node["periods"]
+                out = self.full(node["operand"]["name"])[np.maximum(source, 0)]
+                return np.where(source >= 0, out, np.nan)
+        return self.full(name)[bars]
+
+    def cost(self, node):
+        """Estimated cost of a condition given what is already materialized."""
+        if node["type"] in ("and", "or"):
+            return self.cost(node["left"]) + self.cost(node["right"])
+        refs = [node[k]["name"] for k in ("left", "right", "left_prev", "right_prev")
+                if isinstance(node.get(k), dict)]
+        return COMPARISON_COST + sum(self.strategy.ref_cost(ref, self.values) for ref in set(refs))
+
+    # ------------------------------------------------------------
+    # Condition nodes: boolean result on `bars` only
+    # ------------------------------------------------------------
+    def condition(self, node, bars):
+        if not len(bars):
+            return np.zeros(0, dtype=bool)
+
+        kind = node["type"]
+        if kind in ("and", "or"):
+            first, second = node["left"], node["right"]
+            if self.cost(second) < self.cost(first):
+                first, second = second, first
+
+            result = self.condition(first, bars)
+            # AND: the second side matters only where the first is True; OR: where it is False
+            undecided = result if kind == "and" else ~result
+            live = np.count_nonzero(undecided)
+            if len(bars) == len(self.df) and live >= DENSE_FRACTION * len(bars):
+                # mostly live: plain whole-series evaluation is cheaper
+                other = self.condition(second, bars)
+                return result & other if kind == "and" else result | other
+
+            count("lazy_eval.bars_skipped", len(bars) - int(live))
+            result[undecided] = self.condition(second, bars[undecided])
+            return result
+
+        with np.errstate(invalid="ignore"):
+            if kind == "comparison":
+                compare = _OPERATORS[node["operator"]]
+                return np.asarray(compare(self.at(node["left"], bars), self.at(node["right"], bars)),
+                                  dtype=bool)
+
+            if kind == "cross":
+                left, right = self.at(node["left"], bars), self.at(node["right"], bars)
+                left_prev, right_prev = self.at(node["left_prev"], bars), self.at(node["right_prev"], bars)
+                if node["direction"] == "above":
+                    return (left_prev <= right_prev) & (left > right)
+                return (left_prev >= right_prev) & (left < right)
+
+        raise ValueError("Unknown AST node:", node)
+
+    def section(self, section, n):
+        conditions = self.strategy.rules[section]
+        if not conditions:
+            return np.zeros(n, dtype=bool)
+        return self.condition(conditions[0], np.arange(n))
+
+
+def _period(node):
+    params = indicator_params(node["period"])
+    return params[0] if len(params) == 1 else params
+
+
+class LazyStrategy:
+    """
+    Drop-in alternative to CompiledStrategy evaluating the rule DAG lazily.
+
+    Calling it returns the same boolean ['entry','exit'] signals DataFrame
+    (backend="numpy": an (entry, exit) pair of arrays) as the compiled
+    strategy of that backend, risk exits in .attrs["risk"] included.
+    """
+
+    def __init__(self, final_ast, key=None, backend="pandas"):
+        if backend not in CODE_TARGETS:
+            raise ValueError(f"Unknown backend: {backend!r} (expected one of {CODE_TARGETS})")
+        self.key = key or ast_hash(final_ast)
+        self.backend = backend
+
+        self.ast = final_ast
+        self.risk = dict(final_ast.get("risk", {}))
+        cse = eliminate_common_subexpressions(final_ast)
+        self.temps = cse.temps          # value nodes of the DAG
+        self.rules = cse.ast            # ENTRY / EXIT conditions over them
+
+    def ref_cost(self, name, materialized):
+        """Cost of producing temporary `name`, counting shared inputs not yet computed."""
+        if name in materialized:
+            return 0.0
+        node = self.temps[name]
+        if node["type"] == "column":
+            return 0.0
+        if node["type"] in ("shift", "align"):
+            return self.ref_cost(node["operand"]["name"], materialized)
+        own = INDICATOR_COSTS.get(node["name"].upper(), DEFAULT_INDICATOR_COST)
+        refs = [node["series"]] + list(node.get("inputs", ()))
+        return own + sum(self.ref_cost(ref["name"], materialized) for ref in refs)
+
+    def __call__(self, df, cache=None):
+        with stage("evaluate", rows=len(df)):
+            evaluation = _Evaluation(self, df, cache)
+            entry = evaluation.section("entry", len(df))
+            exit = evaluation.section("exit", len(df))
+
+        if self.backend == "numpy":
+            return entry, exit
+        signals = pd.DataFrame(index=df.index)
+        signals["entry"] = entry
+        signals["exit"] = exit
+        if self.risk:
+            signals.attrs["risk"] = dict(self.risk)
+        return signals
+
+    def __repr__(self):
+        return f"LazyStrategy({self.key[:12]}, backend={self.backend!r})"
+
+
+_lazy_cache = LRUCache(maxsize=256)   # (normalized DSL text, backend) → LazyStrategy
+
+
+def compile_lazy(dsl_text, backend="pandas"):
+    """Parse a DSL strategy into a (cached) LazyStrategy."""
+    key = (normalize_dsl(dsl_text), backend)
+    strategy = _lazy_cache.get(key)
+    if strategy is None:
+        count("strategy_cache.misses")
+        strategy = LazyStrategy(parse_dsl_to_ast(dsl_text), backend=backend)
+        _lazy_cache.put(key, strategy)
+    else:
+        count("strategy_cache.hits")
+    return strategy
@@ -1,155 +1,325 @@
+import itertools
 import re
+from concurrent.futures import ProcessPoolExecutor
+
+from caching import LRUCache
+from instrumentation import count
 
 # ---------------------------------------------
-# BASIC HELPERS
+# NL → JSON RULES
+# ---------------------------------------------
+#
+#   "Buy when the close is above the 20-day moving average and volume is above 1 million"
+#   → {"entry": [{"left": "close", "operator": ">", "right": "SMA(close,20)"},
+#                {"left": "volume", "operator": ">", "right": 1000000}], "exit": []}
+#
+# The text is normalized and tokenized once: its words are scanned left
+# to right against a phrase table built at import (TOKEN_PHRASES, indexed
+# by first word, longest phrase first), words that start no phrase are
+# skipped, and "and" splits the token stream into clauses.  Each clause is
+# then matched against the rule builders (percent change, cross,
+# comparison) by looking at its tokens, never at the text again.
+#
+# Every emitted rule is valid DSL: sides are series (close, high[1]),
+# indicators (SMA(close,20), RSI(close,14), ROC(volume,7)) or numbers.
+# Percent changes use ROC, since the DSL has no arithmetic:
+#   "volume increases by more than 30 percent compared to last week"
+#   → ROC(volume,7) > 30
+# and for the same reason a comparison with a percentage offset ("the
+# close is at least 2.5 percent below the ma") yields no rule rather than
+# the comparison without its offset.
+#
+# Results are memoized by normalized text, so repeated phrasings are
+# parsed once per process.
 # ---------------------------------------------
-def normalize_text(text):
-    return re.sub(r"\s+", " ", text.lower()).strip()
-
-def extract_numbers(text):
-    text = text.lower()
-    nums = re.findall(r"\d+", text)
-    nums = [int(n) for n in nums] if nums else []
-
-    if "million" in text and nums:
-        nums = [nums[0] * 1_000_000]
-    if "thousand" in text and nums:
-        nums = [nums[0] * 1000]
 
-    return nums
+FIELDS = {
+    "close": "closing/close price|close/closes|price", "open": "opening/open price|open",
+    "high": "high", "low": "low", "volume": "volume",
+}
+
+# kind → [(phrases, value)].  Phrases are separated by "|", words by " ",
+# alternatives of one word by "/"; "#" matches a number, which becomes the
+# token's value when no value is given (NUMBER multiplies it by its value).
+TOKEN_PHRASES = {
+    "AND": [("and", "and")],
+    "LOOKBACK": [("over/in/within the last/past # day/days/bar/bars/session/sessions", None)],
+    "DAYS_AGO": [("# day/days/bar/bars/session/sessions ago", None)],
+    "WEEK": [("last/previous/prior week/week's|a/one week ago", 7)],
+    "PREVIOUS": [("yesterday/yesterday's/previous/prior|previous/prior/last day/day's/bar/bar's/session/session's", 1)],
+    "PERCENT": [("# %/percent/pct|# per cent", None)],
+    "PERIOD": [("# day/days/bar/bars/period/periods", None)],
+    "NUMBER": [("# million", 1_000_000), ("# thousand/k", 1000), ("#", 1)],
+    "CROSS": [("cross/crosses/crossed/crossing above/over", "crosses_above"),
+              ("cross/crosses/crossed/crossing below/under", "crosses_below")],
+    "COMPARE": [(">=|at least|greater/more than or equal to", ">="),
+                ("<=|at most|less than or equal to", "<="),
+                (">|above/over/exceeds/exceeding/exceed|greater/more/higher than", ">"),
+                ("<|below/under|less/lower/fewer than", "<"),
+                ("=/==/equals/equal|equal to", "==")],
+    "STATE": [("oversold", "oversold"), ("overbought", "overbought")],
+    "CHANGE": [("increases/increased/increase/rises/rose/risen/grows/grew/gains/gained/jumps/jumped"
+                "/climbs/climbed/up", "up"),
+               ("decreases/decreased/decrease/falls/fell/drops/dropped/declines/declined/down", "down")],
+    "EMA": [("exponential moving average|ema", "EMA")],
+    "SMA": [("simple moving average|moving average|average|sma|ma", "SMA")],
+    "RSI": [("relative strength index|rsi", "RSI")],
+    "FIELD": [(phrases, field) for field, phrases in FIELDS.items()],
+}
+
+
+def _phrase_table():
+    """Trie of the phrases: word ('#' for a number) → node; a node's None entry is the (kind, value) ending there."""
+    root = {}
+    for kind, entries in TOKEN_PHRASES.items():
+        for phrases, value in entries:
+            for phrase in phrases.split("|"):
+                for words in itertools.product(*(word.split("/") for word in phrase.split(" "))):
+                    node = root
+                    for word in words:
+                        node = node.setdefault(word, {})
+                    node.setdefault(None, (kind, value))
+    return root
+
+
+_PHRASES = _phrase_table()
+# a minus sign belongs to the number unless it joins two words ("20-day", "5-10")
+_WORDS = re.compile(r"(?:(?<![\w)])-)?\d+(?:\.\d+)?|[a-z]+(?:'[a-z]*)?|[<>=]+|%")
+_EXIT_WORDS = re.compile(r"\b(?:exit|exits|sell|sells)\b")
+
+_DEFAULT_PERIODS = {"SMA": 20, "EMA": 20, "RSI": 14}
 
 
 # ---------------------------------------------
-# CROSS CONDITION (price crosses above yesterday’s high)
+# BASIC HELPERS
 # ---------------------------------------------
-def parse_cross_condition(sentence):
-    s = normalize_text(sentence)
+def normalize_text(text):
+    return " ".join(text.lower().replace("’", "'").split()).rstrip(".!")
+
+
+def _number(text):
+    number = float(text)
+    return int(number) if number.is_integer() else number
+
+
+def tokenize(text):
+    """
+    Normalized text → list of (kind, value).
+
+    One pass over the words: from each word the trie is walked as far as
+    the words go and the longest phrase found there becomes a token; words
+    that start no phrase are dropped.
+    """
+    words = _WORDS.findall(text)
+    tokens = []
+    position = 0
+    while position < len(words):
+        node, end, found, number = _PHRASES, position, None, None
+        while end < len(words):
+            word = words[end]
+            child = node.get(word)
+            if child is None and word[-1].isdigit():
+                child, number = node.get("#"), word
+            if child is None:
+                break
+            node, end = child, end + 1
+            if None in node:
+                found = (end, node[None], number)
+        if found is None:
+            position += 1
+            continue
+        position, (kind, value), number = found
+        if value is None:
+            value = _number(number)
+        elif kind == "NUMBER":
+            value = _number(float(number) * value)
+        tokens.append((kind, value))
+    return tokens
+
+
+def _clauses(tokens):
+    clause = []
+    for token in tokens:
+        if token[0] == "AND":
+            if clause:
+                yield clause
+            clause = []
+        else:
+            clause.append(token)
+    if clause:
+        yield clause
 
-    if "crosses above" in s or "cross above" in s:
-        left = "close"
 
-        if "yesterday" in s and "high" in s:
-            right = "high[1]"
-        elif "yesterday" in s and "low" in s:
-            right = "low[1]"
-        else:
-            right = None
+# ---------------------------------------------
+# OPERANDS (one side of a comparison or cross)
+# ---------------------------------------------
+def _first(tokens, *kinds):
+    return next((value for kind, value in tokens if kind in kinds), None)
+
+
+def _operand(tokens, subject):
+    """
+    Tokens of one side → (DSL operand, field it is about), or (None, subject).
+
+    "the 20-day moving average" → SMA(subject,20); "yesterday's high" →
+    high[1]; "the close 5 days ago" → close[5]; "1 million" → 1000000.
+    """
+    for position, (kind, name) in enumerate(tokens):
+        if kind in _DEFAULT_PERIODS:
+            # "20-day SMA", "SMA 20", "RSI(close, 7)"
+            after = [token for token in tokens[position + 1:position + 3] if token[0] != "FIELD"][:1]
+            if position and tokens[position - 1][0] == "PERIOD":
+                period = tokens[position - 1][1]
+            elif after and after[0][0] in ("PERIOD", "NUMBER") and isinstance(after[0][1], int):
+                period = after[0][1]
+            else:
+                period = _DEFAULT_PERIODS[name]
+            field = _first(tokens, "FIELD") or ("close" if name == "RSI" else subject)
+            return f"{name}({field},{period})", field
 
-        if right:
-            return {"left": left, "operator": "crosses_above", "right": right}
+    field = _first(tokens, "FIELD")
+    lag = _first(tokens, "PREVIOUS", "WEEK", "DAYS_AGO")
+    if field is not None or lag is not None:
+        field = field or subject
+        return (f"{field}[{lag}]" if lag else field), field
 
-    return None
+    number = _first(tokens, "NUMBER", "PERIOD")
+    if number is not None:
+        return number, subject
+    return None, subject
 
 
 # ---------------------------------------------
-# PERCENT INCREASE COMPARED TO LAST WEEK
-# "volume increases by more than 30 percent compared to last week"
+# RULE BUILDERS (tried in order on each clause)
 # ---------------------------------------------
-def parse_percent_last_week(sentence):
-    s = normalize_text(sentence)
-
-    if "percent" in s and ("increase" in s or "increases" in s):
-        nums = re.findall(r"\d+", s)
-        if not nums:
-            return None
+def _percent_change(tokens):
+    """'volume increases by more than 30 percent compared to last week' → ROC(volume,7) > 30"""
+    kinds = [kind for kind, _ in tokens]
+    if "PERCENT" not in kinds or "CHANGE" not in kinds:
+        return None
+    change = kinds.index("CHANGE")
+    field = _first(tokens[:change], "FIELD") or _first(tokens, "FIELD") or "close"
+    lookback = _first(tokens, "LOOKBACK", "DAYS_AGO", "WEEK", "PREVIOUS", "PERIOD") or 1
+    percent = _first(tokens, "PERCENT")
+    # "by less than": the change stays inside the percentage
+    within = _first(tokens, "COMPARE") in ("<", "<=")
+    if _first(tokens, "CHANGE") == "down":
+        return {"left": f"ROC({field},{lookback})", "operator": ">" if within else "<", "right": -percent}
+    return {"left": f"ROC({field},{lookback})", "operator": "<" if within else ">", "right": percent}
+
+
+def _cross(tokens):
+    """'price crosses above yesterday's high' → close crosses_above high[1]"""
+    split = next((i for i, (kind, _) in enumerate(tokens) if kind == "CROSS"), None)
+    if split is None:
+        return None
+    left, subject = _operand(tokens[:split], "close")
+    right, _ = _operand(tokens[split + 1:], subject)
+    if right is None:
+        return None
+    return {"left": left or "close", "operator": tokens[split][1], "right": right}
 
-        percent = int(nums[0])
 
-        if "volume" not in s:
+def _comparison(tokens):
+    """'close is above the 20-day moving average' → close > SMA(close,20); 'RSI is oversold' → RSI(close,14) < 30"""
+    state = _first(tokens, "STATE")
+    if state is not None:
+        left, _ = _operand(tokens, "close")
+        if left is None or not left.startswith("RSI("):
             return None
+        return {"left": left, "operator": "<" if state == "oversold" else ">",
+                "right": 30 if state == "oversold" else 70}
+
+    kinds = [kind for kind, _ in tokens]
+    if any(pair == ("PERCENT", "COMPARE") for pair in zip(kinds, kinds[1:])):
+        return None                     # "2.5 percent below the ma" needs arithmetic
+    split = next((i for i, kind in enumerate(kinds) if kind == "COMPARE"), None)
+    if split is None:
+        return None
+    left, subject = _operand(tokens[:split], "close")
+    right, _ = _operand(tokens[split + 1:], subject)
+    if right is None:
+        return None
+    return {"left": left or "close", "operator": tokens[split][1], "right": right}
 
-        if "last week" in s:
-            base = "volume[7]"
-        else:
-            return None
 
-        multiplier = 1 + (percent / 100)
-        right = f"{base} * {multiplier}"
+RULE_BUILDERS = [_percent_change, _cross, _comparison]
 
-        return {"left": "volume", "operator": ">", "right": right}
 
+def _clause_rule(tokens):
+    for builder in RULE_BUILDERS:
+        rule = builder(tokens)
+        if rule is not None:
+            return rule
     return None
 
 
-# ---------------------------------------------
-# MAIN CONDITION HANDLER
-# ---------------------------------------------
 def parse_one_condition(sentence):
-    s = normalize_text(sentence)
-
-    # 1) Percent change rule
-    rule = parse_percent_last_week(sentence)
-    if rule:
-        return rule
-
-    # 2) Cross condition
-    rule = parse_cross_condition(sentence)
-    if rule:
-        return rule
-
-    # 3) RSI rule
-    if "rsi" in s:
-        nums = re.findall(r"\d+", s)
-        period = int(nums[0]) if nums else 14
-        threshold = int(nums[-1]) if len(nums) >= 2 else 30
-
-        op = "<" if "below" in s else ">" if "above" in s else None
-
-        return {"left": f"rsi(close,{period})", "operator": op, "right": threshold}
-
-    # 4) Basic comparisons (close, volume, SMA)
-    left = None
-    op = None
-    right = None
-
-    if "close" in s or "price" in s:
-        left = "close"
-    elif "volume" in s:
-        left = "volume"
-
-    if "above" in s:
-        op = ">"
-    elif "below" in s:
-        op = "<"
-    elif "equal" in s:
-        op = "=="
-
-    if "moving average" in s or "ma" in s:
-        nums = extract_numbers(s)
-        period = nums[0] if nums else 20
-        right = f"sma({left},{period})"
-
-    if right is None:
-        nums = extract_numbers(s)
-        if nums:
-            right = nums[0]
-
-    if left and op and right is not None:
-        return {"left": left, "operator": op, "right": right}
-
-    return None
+    """One condition ('close is above 100') → rule dict, or None when nothing matches."""
+    return _clause_rule(tokenize(normalize_text(sentence)))
 
 
 # ---------------------------------------------
 # ENTRY POINT: NL → JSON RULES
 # ---------------------------------------------
-def nl_to_json_rules(text):
-    t = normalize_text(text)
+_memo = LRUCache(maxsize=4096)       # normalized text → rules
 
-    is_entry = any(x in t for x in ["buy", "enter", "trigger entry"])
-    is_exit = any(x in t for x in ["exit", "sell"])
 
-    entry_rules = []
-    exit_rules = []
+def _parse_normalized(text):
+    rules = [rule for rule in map(_clause_rule, _clauses(tokenize(text))) if rule is not None]
+    if _EXIT_WORDS.search(text):
+        return {"entry": [], "exit": rules}
+    return {"entry": rules, "exit": []}
 
-    parts = re.split(r"\band\b", t)
 
-    for part in parts:
-        rule = parse_one_condition(part)
-        if rule:
-            if is_exit:
-                exit_rules.append(rule)
-            else:
-                entry_rules.append(rule)
+def _copy(rules):
+    return {"entry": [dict(rule) for rule in rules["entry"]],
+            "exit": [dict(rule) for rule in rules["exit"]]}
+
 
-    return {"entry": entry_rules, "exit": exit_rules}
+def nl_to_json_rules(text):
+    key = normalize_text(text)
+    rules = _memo.get(key)
+    if rules is None:
+        count("nl_cache.misses")
+        rules = _parse_normalized(key)
+        _memo.put(key, rules)
+    else:
+        count("nl_cache.hits")
+    return _copy(rules)
+
+
+def nl_to_json_rules_batch(texts, workers=1, chunksize=None):
+    """
+    nl_to_json_rules of every text, in input order.
+
+    Texts are normalized and deduplicated first; only phrasings not in the
+    memo are parsed, on a process pool of `workers` (1 parses inline, which
+    is fastest unless there are tens of thousands of new phrasings).
+    """
+    keys = [normalize_text(text) for text in texts]
+    parsed = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        rules = _memo.get(key)
+        if rules is None:
+            missing.append(key)
+        else:
+            parsed[key] = rules
+    count("nl_cache.hits", len(keys) - len(missing))
+    count("nl_cache.misses", len(missing))
+
+    if workers > 1 and len(missing) > 1:
+        chunksize = chunksize or max(1, len(missing) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_parse_normalized, missing, chunksize=chunksize))
+    else:
+        results = [_parse_normalized(key) for key in missing]
+    for key, rules in zip(missing, results):
+        _memo.put(key, rules)
+        parsed[key] = rules
+    return [_copy(parsed[key]) for key in keys]
+
+
+def clear_nl_cache():
+    _memo.clear()
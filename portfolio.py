@@ -0,0 +1,332 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from backtest import position_state, require_no_risk_exits
+from caching import IndicatorCache
+from datastore import as_frame
+from instrumentation import stage
+from strategy_compiler import compile_strategy
+
+TRADE_COLUMNS = ["symbol", "entry_index", "entry_fill_index", "entry_price", "exit_index",
+                 "exit_fill_index", "exit_price", "shares", "pnl", "return_pct"]
+
+
+# ============================================================
+# Position sizing
+# ============================================================
+# A rule is called once per bar that has new entries:
+#
+#     rule(cash, equity, count, slots) -> dollars for each of the `count` entries
+#
+# cash / equity are valued at the fill bar's open (after that bar's exits),
+# slots is max_positions.  Requests above the free cash are scaled down
+# pro rata, so a rule only expresses the intended split.
+def equal_weight(cash, equity, count, slots):
+    """Every position targets an equal share of equity (1 / slots)."""
+    return np.full(count, equity / slots)
+
+
+def cash_split(cash, equity, count, slots):
+    """New positions split the free cash equally (all-in, like backtest_signals)."""
+    return np.full(count, cash / count)
+
+
+SIZING_RULES = {
+    "equal": equal_weight,
+    "cash": cash_split,
+}
+
+
+# ============================================================
+# Panels
+# ============================================================
+def align_panel(frames, columns=("open", "close")):
+    """
+    {symbol: OHLCV DataFrame} → {column: (bars x symbols) DataFrame} on the
+    union of the symbols' indexes (NaN where a symbol has no bar).
+    """
+    frames = {symbol: as_frame(df) for symbol, df in frames.items()}
+    return {column: pd.DataFrame({symbol: df[column] for symbol, df in frames.items()}).sort_index()
+            for column in columns}
+
+
+def panel_signals(dsl_text, frames, index=None, backend="pandas"):
+    """
+    Evaluate one DSL strategy on every symbol; returns (entries, exits)
+    boolean (bars x symbols) DataFrames aligned to `index` (default: union
+    of the symbols' indexes).  Bars a symbol does not have carry no signal.
+    """
+    strategy = compile_strategy(dsl_text, backend)
+    require_no_risk_exits(strategy.ast, "portfolio")
+    entries, exits = {}, {}
+    for symbol, df in frames.items():
+        df = as_frame(df)
+        # per-symbol cache: indicators are never shared across symbols
+        signals = strategy(df, IndicatorCache())
+        if backend == "numpy":
+            signals = pd.DataFrame({"entry": signals[0], "exit": signals[1]}, index=df.index)
+        entries[symbol] = signals["entry"]
+        exits[symbol] = signals["exit"]
+
+    entries = pd.DataFrame(entries).sort_index()
+    exits = pd.DataFrame(exits).sort_index()
+    if index is not None:
+        entries, exits = entries.reindex(index), exits.reindex(index)
+    return entries.fillna(False).astype(bool), exits.fillna(False).astype(bool)
+
+
+# ============================================================
+# Engine
+# ============================================================
+def backtest_portfolio(opens, closes, entries, exits, initial_capital=100000.0, sizing="equal",
+                       max_positions=None, slippage=0.0, commission=0.0):
+    """
+    Backtest a basket of symbols trading from one shared cash balance.
+
+    Each symbol follows the backtest_signals rules (ENTRY checked while
+    flat, EXIT while holding, fills at the next bar's open, or the close on
+    the last bar) but is sized by `sizing` instead of going all-in.  On a
+    bar, exits are filled before entries, so freed cash can be reused.  An
+    entry that cannot be funded (no free cash or slot, no valid price) is
+    skipped; the symbol waits for its next ENTRY.  Open positions are closed
+    at the last close.  Missing prices (NaN) are marked at the last close.
+
+    Only bars with fills are visited in Python, and each visit is a handful
+    of array operations across all symbols; holdings, cash, equity and
+    drawdown for the other bars are broadcast as (bars x symbols) matrices.
+
+    Args:
+        opens, closes (DataFrame): (bars x symbols) prices, e.g. from align_panel
+        entries, exits (DataFrame or array): (bars x symbols) boolean signals
+        initial_capital (float): starting cash shared by all symbols
+        sizing (str or callable): "equal" (equity / max_positions per position),
+                    "cash" (split free cash among the bar's entries) or a
+                    callable rule(cash, equity, count, slots) -> dollars per entry
+        max_positions (int): cap on simultaneous positions (default: every symbol)
+        slippage (float): per-share slippage
+        commission (float): fixed commission per fill (entry and exit)
+
+    Returns:
+        dict with:
+        - equity (Series), cash (Series), drawdown (Series, fraction)
+        - holdings (DataFrame of shares, bars x symbols)
+        - trades (DataFrame, one row per round trip, pnl net of both commissions)
+        - final_capital, total_return_pct, max_drawdown_pct, num_trades
+    """
+    rule = SIZING_RULES.get(sizing) if isinstance(sizing, str) else sizing
+    if rule is None:
+        raise ValueError(f"Unknown sizing rule: {sizing!r} (expected one of {tuple(SIZING_RULES)})")
+
+    labels = closes.index
+    symbols = np.asarray(closes.columns)
+    entries = np.asarray(entries, dtype=bool)
+    exits = np.asarray(exits, dtype=bool)
+    if not entries.shape == exits.shape == closes.shape == opens.shape:
+        raise ValueError("prices and signals must be (bars x symbols) matrices of the same shape")
+
+    n, m = closes.shape
+    slots = max_positions or m
+
+    with stage("portfolio", rows=n * m):
+        # value positions at the last known close when a bar is missing
+        marks = closes.ffill().to_numpy(dtype=float)
+        open_prices = opens.to_numpy(dtype=float)
+        open_prices = np.where(np.isnan(open_prices), marks, open_prices)
+
+        wanted = position_state(entries, exits)
+        was_wanted = np.vstack([np.zeros((1, m), dtype=bool), wanted[:-1]])
+        enter = wanted & ~was_wanted
+        leave = ~wanted & was_wanted
+
+        # first bar from each bar on with a single flag (ENTRY xor EXIT): from
+        # there a symbol's state no longer depends on its state before; and
+        # the running count of toggling bars (ENTRY and EXIT together)
+        bars = np.arange(n, dtype=np.int32)[:, None]
+        next_single = np.where(entries != exits, bars, np.int32(n))
+        next_single = np.minimum.accumulate(next_single[::-1], axis=0)[::-1]
+        toggles = np.cumsum(entries & exits, axis=0, dtype=np.int32)
+
+        def skip_entry(bar, col):
+            """An unfunded entry: the symbol is flat from `bar` on until its next ENTRY."""
+            single = int(next_single[bar + 1, col]) if bar + 1 < n else n
+            if single < n and toggles[single - 1, col] == toggles[bar, col]:
+                # no toggles before the next single flag (the usual case):
+                # flat up to it, and it enters there if it would have held
+                wanted[bar:single, col] = False
+                enter[bar, col] = False
+                leave[single, col] = False
+                if wanted[single, col]:
+                    enter[single, col] = True
+                    heapq.heappush(events, single)
+                return
+            # re-derive up to and including the next single flag; after it the
+            # state is what it was
+            stop = min(single + 1, n)
+            wanted[bar, col] = False
+            wanted[bar + 1:stop, col] = position_state(entries[bar + 1:stop, col], exits[bar + 1:stop, col])
+            state = wanted[bar:stop, col]
+            before = np.concatenate(([False], state[:-1]))
+            enter[bar:stop, col] = state & ~before
+            leave[bar:stop, col] = ~state & before
+            for event in bar + 1 + np.flatnonzero(enter[bar + 1:stop, col] | leave[bar + 1:stop, col]):
+                heapq.heappush(events, int(event))
+
+        # fills on the next bar's open; signals on the last bar fill at its close
+        fill_prices = np.vstack([open_prices[1:], marks[-1:]])
+        fill_bars = np.minimum(np.arange(n) + 1, n - 1)
+        fill_marks = np.nan_to_num(fill_prices)
+
+        # bars with entries or exits, in order; skipped entries add the bars
+        # where the re-derived symbol enters later
+        events = np.flatnonzero((enter | leave).any(axis=1)).tolist()
+        cash = float(initial_capital)
+        shares = np.zeros(m)
+        open_trade = np.full(m, -1, dtype=np.int64)     # trades row of each open position
+
+        event_bars, event_cash, event_shares = [], [], []
+        trades = {name: [] for name in ("symbol", "entry_bar", "entry_price", "shares")}
+        num_trades = 0
+        exits_at = {}                                   # trade row → (bar, fill bar, price)
+
+        while events:
+            bar = heapq.heappop(events)
+            if (event_bars and bar <= event_bars[-1]) or not (enter[bar] | leave[bar]).any():
+                continue
+            prices = fill_prices[bar]
+
+            # ---------------- exits ----------------
+            sell = np.flatnonzero(leave[bar] & (shares > 0))
+            if len(sell):
+                sell_prices = prices[sell] - slippage
+                cash += float(shares[sell] @ sell_prices) - commission * len(sell)
+                for col, price in zip(open_trade[sell], sell_prices):
+                    exits_at[col] = (bar, fill_bars[bar], price)
+                shares[sell] = 0.0
+                open_trade[sell] = -1
+
+            # ---------------- entries ----------------
+            skipped = enter[bar].copy()
+            signalled = np.flatnonzero(skipped)
+            buy_prices = prices[signalled] + slippage
+            valid = buy_prices > 0                      # NaN / non-positive prices cannot fill
+            free_slots = max(slots - np.count_nonzero(shares), 0)
+            buy, buy_prices = signalled[valid][:free_slots], buy_prices[valid][:free_slots]
+
+            if len(buy):
+                held = np.flatnonzero(shares)
+                equity = cash + float(shares[held] @ fill_marks[bar, held])
+                budgets = np.asarray(rule(cash, equity, len(buy), slots), dtype=float)
+                budgets = np.clip(np.broadcast_to(budgets, (len(buy),)), 0.0, None)
+                free = cash - commission * len(buy)
+                total = budgets.sum()
+                if total > free and total > 0:
+                    budgets = budgets * (max(free, 0.0) / total)
+
+                funded = budgets > 0
+                buy, buy_prices, budgets = buy[funded], buy_prices[funded], budgets[funded]
+                shares[buy] = budgets / buy_prices
+                cash -= float(budgets.sum()) + commission * len(buy)
+
+                open_trade[buy] = num_trades + np.arange(len(buy))
+                num_trades += len(buy)
+                trades["symbol"].append(buy)
+                trades["entry_bar"].append(np.full(len(buy), bar))
+                trades["entry_price"].append(buy_prices)
+                trades["shares"].append(shares[buy])
+
+            skipped[buy] = False
+            for col in np.flatnonzero(skipped):
+                skip_entry(bar, col)
+
+            event_bars.append(bar)
+            event_cash.append(cash)
+            event_shares.append(shares.copy())
+
+        # ---------------- broadcast to every bar ----------------
+        # holdings change on the fill bar, not the signal bar
+        event_bars = np.array(event_bars, dtype=np.int64)
+        event_cash = np.array(event_cash)
+        event_shares = np.array(event_shares).reshape(len(event_bars), m)
+        last_event = np.full(n, -1, dtype=np.int64)
+        last_event[fill_bars[event_bars]] = np.arange(len(event_bars))
+        last_event = np.maximum.accumulate(last_event)
+        has_event = last_event >= 0
+
+        if len(event_bars):
+            bar_cash = np.where(has_event, event_cash[np.maximum(last_event, 0)], float(initial_capital))
+            holdings = np.where(has_event[:, None], event_shares[np.maximum(last_event, 0)], 0.0)
+        else:
+            bar_cash = np.full(n, float(initial_capital))
+            holdings = np.zeros((n, m))
+        equity_values = bar_cash + np.einsum("ij,ij->i", holdings, np.nan_to_num(marks))
+
+        # FORCE CLOSE at the last close
+        still_open = np.flatnonzero(shares)
+        if len(still_open):
+            sell_prices = np.nan_to_num(marks[-1, still_open]) - slippage
+            cash += float(shares[still_open] @ sell_prices) - commission * len(still_open)
+            for col, price in zip(open_trade[still_open], sell_prices):
+                exits_at[col] = (n - 1, n - 1, price)
+            equity_values[-1] = cash
+
+        trades = {name: np.concatenate(parts) if parts else np.empty(0)
+                  for name, parts in trades.items()}
+        trade_table = _trade_table(trades, exits_at, fill_bars, labels, symbols, commission)
+
+    equity = pd.Series(equity_values, index=labels)
+    roll_max = equity.cummax()
+    drawdown = (equity - roll_max) / roll_max
+    final_capital = float(equity.iloc[-1])
+
+    return {
+        "equity": equity,
+        "cash": pd.Series(bar_cash, index=labels),
+        "drawdown": drawdown,
+        "holdings": pd.DataFrame(holdings, index=labels, columns=closes.columns),
+        "trades": trade_table,
+        "final_capital": final_capital,
+        "total_return_pct": (final_capital - initial_capital) / initial_capital * 100.0,
+        "max_drawdown_pct": float(drawdown.min() * 100.0),
+        "num_trades": len(trade_table),
+    }
+
+
+def _trade_table(trades, exits_at, fill_bars, labels, symbols, commission):
+    """Round trips as a DataFrame; pnl counts the entry and exit commissions."""
+    count = len(trades["symbol"])
+    entry_bar = trades["entry_bar"].astype(np.int64)
+    exit_bar = np.array([exits_at[k][0] for k in range(count)], dtype=np.int64)
+    exit_fill = np.array([exits_at[k][1] for k in range(count)], dtype=np.int64)
+    exit_price = np.array([exits_at[k][2] for k in range(count)], dtype=float)
+    entry_price = trades["entry_price"]
+    shares = trades["shares"]
+
+    cost = shares * entry_price
+    pnl = shares * exit_price - cost - 2 * commission
+    return pd.DataFrame({
+        "symbol": symbols[trades["symbol"].astype(np.int64)],
+        "entry_index": labels[entry_bar],
+        "entry_fill_index": labels[fill_bars[entry_bar]],
+        "entry_price": entry_price,
+        "exit_index": labels[exit_bar],
+        "exit_fill_index": labels[exit_fill],
+        "exit_price": exit_price,
+        "shares": shares,
+        "pnl": pnl,
+        "return_pct": pnl / cost * 100.0,
+    }, columns=TRADE_COLUMNS)
+
+
+# ============================================================
+# DSL → portfolio
+# ============================================================
+def run_portfolio(dsl_text, frames, backend="pandas", **kwargs):
+    """
+    Run one DSL strategy over {symbol: OHLCV DataFrame} as a single
+    portfolio (see backtest_portfolio for the keyword arguments).
+    """
+    panel = align_panel(frames)
+    entries, exits = panel_signals(dsl_text, frames, panel["close"].index, backend)
+    return backtest_portfolio(panel["open"], panel["close"], entries, exits, **kwargs)
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+
+from caching import BATCH_BYTES
+from instrumentation import stage
+
+RESAMPLING_METHODS = ("bootstrap", "block", "shuffle")
+RETURN_SOURCES = ("bars", "trades")
+METRICS = ["final_capital", "total_return_pct", "max_drawdown_pct"]
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# paths drawn from one child seed: path k is the same whatever n_paths is
+SEED_BLOCK = 256
+
+
+# ============================================================
+# Monte Carlo robustness of a backtest
+# ============================================================
+#
+#     result = backtest_signals(df, signals)
+#     mc = monte_carlo(result, n_paths=10_000, method="block", block=20)
+#     mc["summary"]                       observed value and percentiles per metric
+#     mc["max_drawdown_pct"]              one value per path
+#
+# The returns of a backtest (per bar from its equity curve, or per closed
+# trade) are resampled into an (paths x length) matrix:
+#   bootstrap   draws with replacement (i.i.d.)
+#   block       circular block bootstrap: runs of `block` consecutive
+#               returns, so volatility clusters and autocorrelation survive
+#   shuffle     permutations of the returns: the same final return in a
+#               different order (drawdown risk of the sequencing alone)
+# and every path is compounded from the initial capital at once (cumprod
+# and running maximum along the rows).  Paths are generated in batches that
+# fit BATCH_BYTES; random numbers come from one child of
+# SeedSequence(seed) per SEED_BLOCK paths, so results depend only on the
+# seed, never on batching, and the first paths of a larger run are the
+# paths of a smaller one.
+# ============================================================
+
+
+def backtest_returns(result, source="bars"):
+    """
+    Simple returns of a backtest_signals result: per bar from its equity
+    curve (source="bars"), or per closed trade (source="trades").
+    """
+    if source == "bars":
+        equity = np.asarray(result["equity"], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = equity[1:] / equity[:-1] - 1.0
+        returns[np.isnan(returns)] = 0.0                  # flat at zero equity
+        return returns
+    if source == "trades":
+        trades = result["trades"]
+        records = trades.records if hasattr(trades, "records") else trades
+        if isinstance(records, np.ndarray):
+            returns = records["return_pct"]
+        else:
+            returns = np.array([trade["return_pct"] for trade in records], dtype=np.float64)
+        returns = np.asarray(returns, dtype=np.float64)
+        return returns[~np.isnan(returns)] / 100.0        # open trades have no return yet
+    raise ValueError(f"Unknown return source: {source!r} (expected one of {RETURN_SOURCES})")
+
+
+# ============================================================
+# Resampled paths
+# ============================================================
+def _generators(seed, first_path, n_paths):
+    """(generator, paths) per SEED_BLOCK paths covering [first_path, first_path + n_paths)."""
+    first_block = first_path // SEED_BLOCK
+    children = np.random.SeedSequence(seed).spawn(first_block + -(-n_paths // SEED_BLOCK))
+    for block in range(first_block, len(children)):
+        start = block * SEED_BLOCK
+        yield np.random.default_rng(children[block]), min(SEED_BLOCK, first_path + n_paths - start)
+
+
+def resample_indices(n, n_paths, length=None, method="bootstrap", block=20, seed=0, first_path=0):
+    """
+    (n_paths x length) positions into a series of `n` returns (length
+    defaults to n).  Pass first_path to draw a later slice of the same
+    paths (first_path must be a multiple of SEED_BLOCK).
+    """
+    if method not in RESAMPLING_METHODS:
+        raise ValueError(f"Unknown resampling method: {method!r} (expected one of {RESAMPLING_METHODS})")
+    if first_path % SEED_BLOCK:
+        raise ValueError(f"first_path must be a multiple of {SEED_BLOCK}")
+    if n < 1:
+        raise ValueError("need at least one return to resample")
+    length = n if length is None else length
+    if method == "shuffle" and length != n:
+        raise ValueError("shuffle paths are permutations: length must be the number of returns")
+
+    parts = []
+    for rng, paths in _generators(seed, first_path, n_paths):
+        if method == "bootstrap":
+            parts.append(rng.integers(0, n, size=(paths, length)))
+        elif method == "block":
+            blocks = -(-length // block)
+            starts = rng.integers(0, n, size=(paths, blocks, 1))
+            positions = (starts + np.arange(block)) % n            # blocks wrap around the end
+            parts.append(positions.reshape(paths, blocks * block)[:, :length])
+        else:
+            parts.append(rng.permuted(np.broadcast_to(np.arange(n), (paths, n)), axis=1))
+    return np.concatenate(parts) if parts else np.empty((0, length), dtype=np.int64)
+
+
+def resample_paths(returns, n_paths, length=None, method="bootstrap", block=20, seed=0):
+    """(n_paths x length) matrix of resampled returns (see resample_indices)."""
+    returns = np.asarray(returns, dtype=np.float64)
+    return returns[resample_indices(len(returns), n_paths, length, method, block, seed)]
+
+
+def path_metrics(paths, initial_capital=100000.0, keep_equity=False):
+    """
+    final_capital, total_return_pct and max_drawdown_pct of every row of a
+    (paths x steps) return matrix, compounded from initial_capital (same
+    definitions as backtest_signals; the initial capital counts as the
+    first peak).  keep_equity=True adds the (paths x steps + 1) "equity"
+    matrix.  `paths` is overwritten.
+    """
+    growth = np.add(paths, 1.0, out=paths)
+    np.cumprod(growth, axis=1, out=growth)
+    peak = np.maximum.accumulate(growth, axis=1)
+    np.maximum(peak, 1.0, out=peak)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.min(growth / peak, axis=1, initial=1.0) - 1.0
+
+    final = growth[:, -1] if growth.shape[1] else np.ones(len(growth))
+    metrics = {
+        "final_capital": initial_capital * final,
+        "total_return_pct": (final - 1.0) * 100.0,
+        "max_drawdown_pct": drawdown * 100.0,
+    }
+    if keep_equity:
+        metrics["equity"] = initial_capital * np.hstack([np.ones((len(growth), 1)), growth])
+    return metrics
+
+
+# ============================================================
+# Entry point
+# ============================================================
+def monte_carlo(result, n_paths=10000, method="bootstrap", source="bars", block=20, length=None,
+                seed=0, initial_capital=None, keep_equity=False):
+    """
+    Distribution of return and drawdown over `n_paths` resampled versions
+    of a backtest.
+
+    Args:
+        result: backtest_signals result dict, or a 1-D array of simple returns
+        method (str): "bootstrap", "block" (circular blocks of `block`
+                      returns) or "shuffle" (permutations)
+        source (str): "bars" (equity-curve returns) or "trades" (one return
+                      per closed trade) when `result` is a backtest result
+        length (int): returns per path (default: as many as the original)
+        seed (int): paths are reproducible for a given seed
+        initial_capital (float): default: the result's first equity value, or 100000
+        keep_equity (bool): also return the (paths x length + 1) equity curves
+
+    Returns:
+        dict with:
+        - final_capital, total_return_pct, max_drawdown_pct (one value per path)
+        - observed (the same metrics for the original, unshuffled returns)
+        - summary (DataFrame: one row per metric; observed, mean, std and
+          the PERCENTILES of the paths)
+        - equity (only with keep_equity)
+    """
+    if isinstance(result, dict):
+        returns = backtest_returns(result, source)
+        if initial_capital is None:
+            initial_capital = float(np.asarray(result["equity"])[0])
+    else:
+        returns = np.asarray(result, dtype=np.float64)
+    initial_capital = 100000.0 if initial_capital is None else initial_capital
+    length = len(returns) if length is None else length
+
+    metrics = {name: np.empty(n_paths) for name in METRICS}
+    equity = np.empty((n_paths, length + 1)) if keep_equity else None
+    # indices, returns, running peak and drawdown of a batch stay under BATCH_BYTES
+    per_batch = max(1, BATCH_BYTES // (32 * max(length, 1))) // SEED_BLOCK * SEED_BLOCK or SEED_BLOCK
+
+    with stage("robustness", rows=n_paths * length):
+        for first in range(0, n_paths, per_batch):
+            paths = min(per_batch, n_paths - first)
+            indices = resample_indices(len(returns), paths, length, method, block, seed, first_path=first)
+            batch = path_metrics(returns[indices], initial_capital, keep_equity)
+            for name in METRICS:
+                metrics[name][first:first + paths] = batch[name]
+            if keep_equity:
+                equity[first:first + paths] = batch["equity"]
+
+    observed = {name: float(value[0])
+                for name, value in path_metrics(returns[None, :].copy(), initial_capital).items()}
+    summary = pd.DataFrame({
+        "observed": [observed[name] for name in METRICS],
+        "mean": [metrics[name].mean() for name in METRICS],
+        "std": [metrics[name].std() for name in METRICS],
+        **{f"p{q}": [np.percentile(metrics[name], q) for name in METRICS] for q in PERCENTILES},
+    }, index=METRICS)
+
+    results = dict(metrics, observed=observed, summary=summary)
+    if keep_equity:
+        results["equity"] = equity
+    return results
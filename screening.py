@@ -0,0 +1,181 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from backtest import backtest_signal_matrix, require_no_risk_exits
+from caching import BATCH_BYTES
+from datastore import as_frame
+from instrumentation import stage, count
+from strategy_compiler import normalize_dsl, parse_dsl_to_ast
+from sweep import BatchEvaluator, _walk
+
+SUMMARY_COLUMNS = ["dsl", "final_capital", "total_return_pct", "max_drawdown_pct", "num_trades",
+                   "entry_bars", "error"]
+
+
+# -----------------------------------------------------------
+# Result
+# -----------------------------------------------------------
+class ScreenResult:
+    """
+    Outcome of `screen`.
+
+    summary     DataFrame, one row per input strategy (input order): the
+                DSL text, backtest metrics, entry_bars (bars with an ENTRY
+                signal) and error (None, or why the strategy was skipped)
+    entries,
+    exits       (strategies x ceil(bars / 8)) uint8 bit-packed signals
+                (np.packbits along the bars); rows of failed strategies are 0
+    seconds     wall time of the whole call
+    """
+
+    def __init__(self, summary, entries, exits, bars, seconds):
+        self.summary = summary
+        self.entries = entries
+        self.exits = exits
+        self.bars = bars
+        self.seconds = seconds
+
+    def signals(self, i):
+        """(entry, exit) boolean arrays of strategy `i`."""
+        return (np.unpackbits(self.entries[i], count=self.bars).astype(bool),
+                np.unpackbits(self.exits[i], count=self.bars).astype(bool))
+
+    @property
+    def strategies_per_sec(self):
+        return len(self.summary) / self.seconds if self.seconds > 0 else float("inf")
+
+    def __len__(self):
+        return len(self.summary)
+
+    def __repr__(self):
+        return (f"ScreenResult({len(self)} strategies, {self.bars} bars, "
+                f"{self.strategies_per_sec:,.0f} strategies/s)")
+
+
+# -----------------------------------------------------------
+# Screening
+# -----------------------------------------------------------
+def screen(dsl_texts, df, initial_capital=100000.0, slippage=0.0, commission=0.0, batch_size=None):
+    """
+    Evaluate and backtest a whole library of DSL strategies on one dataset.
+
+    - Strategies are parsed once each (identical texts, after whitespace
+      normalization, are evaluated once and share their results).
+    - One BatchEvaluator serves the whole library, so every distinct
+      indicator, shifted series and condition is computed once across all
+      strategies, and SMA / RSI periods share one bank pass per column.
+      A memoized result is dropped after the last strategy using it.
+    - Signals are produced `batch_size` strategies at a time (default:
+      as many as fit in BATCH_BYTES) and backtested together with
+      backtest_signal_matrix.
+
+    A strategy that fails to parse or evaluate gets an `error` and no
+    metrics; the rest of the library is unaffected.
+
+    Returns a ScreenResult (summary, bit-packed signals, strategies_per_sec).
+    """
+    start = time.perf_counter()
+    df = as_frame(df)
+    n = len(df)
+    texts = list(dsl_texts)
+
+    # -------------------------------------------------------------
+    # Parse, deduplicating identical strategies
+    # -------------------------------------------------------------
+    with stage("screen.parse", rows=len(texts)):
+        unique = {}             # normalized text → position in `asts`, or the parse error
+        slots = []              # per input strategy: its unique position / parse error
+        asts = []
+        for text in texts:
+            key = normalize_dsl(text)
+            if key not in unique:
+                try:
+                    final_ast = parse_dsl_to_ast(text)
+                    require_no_risk_exits(final_ast, "screen")
+                    asts.append(final_ast)
+                    unique[key] = len(asts) - 1
+                except Exception as exc:      # one bad strategy must not sink the library
+                    unique[key] = f"{type(exc).__name__}: {exc}"
+            slots.append(unique[key])
+    count("screen.duplicates", len(texts) - len(unique))
+
+    # -------------------------------------------------------------
+    # Evaluate and backtest in batches
+    # -------------------------------------------------------------
+    evaluator = BatchEvaluator(df, asts)
+    last_use = _last_use(evaluator, asts)
+
+    packed = (n + 7) // 8
+    entries = np.zeros((len(asts), packed), dtype=np.uint8)
+    exits = np.zeros((len(asts), packed), dtype=np.uint8)
+    metrics = {name: np.full(len(asts), np.nan) for name in SUMMARY_COLUMNS[1:5]}
+    entry_bars = np.full(len(asts), np.nan)
+    failed = {}
+
+    batch_size = batch_size or max(1, BATCH_BYTES // max(8 * n, 1))
+    with stage("screen.evaluate", rows=n * len(asts)):
+        for first in range(0, len(asts), batch_size):
+            batch = range(first, min(first + batch_size, len(asts)))
+            entry_matrix = np.zeros((n, len(batch)), dtype=bool)
+            exit_matrix = np.zeros((n, len(batch)), dtype=bool)
+            ok = np.ones(len(batch), dtype=bool)
+
+            for j, k in enumerate(batch):
+                try:
+                    entry_matrix[:, j], exit_matrix[:, j] = evaluator.signals(asts[k])
+                except Exception as exc:
+                    failed[k] = f"{type(exc).__name__}: {exc}"
+                    ok[j] = False
+                evaluator.release(last_use.pop(k, ()))
+
+            entries[batch.start:batch.stop] = np.packbits(entry_matrix, axis=0).T
+            exits[batch.start:batch.stop] = np.packbits(exit_matrix, axis=0).T
+            entry_bars[np.asarray(batch)[ok]] = entry_matrix[:, ok].sum(axis=0)
+
+            if ok.any():
+                with stage("screen.backtest", rows=n * int(ok.sum())), np.errstate(all="ignore"):
+                    results = backtest_signal_matrix(df, entry_matrix[:, ok], exit_matrix[:, ok],
+                                                     initial_capital, slippage, commission)
+                columns = np.asarray(batch)[ok]
+                for name in metrics:
+                    metrics[name][columns] = results[name]
+
+    # -------------------------------------------------------------
+    # One row per input strategy
+    # -------------------------------------------------------------
+    rows = np.array([slot if isinstance(slot, int) else -1 for slot in slots], dtype=np.int64)
+    valid = rows >= 0
+
+    summary = pd.DataFrame({"dsl": texts})
+    for name, values in {**metrics, "entry_bars": entry_bars}.items():
+        column = np.full(len(texts), np.nan)
+        column[valid] = values[rows[valid]]
+        summary[name] = column
+    summary["num_trades"] = summary["num_trades"].astype("Int64")
+    summary["entry_bars"] = summary["entry_bars"].astype("Int64")
+    summary["error"] = [slot if isinstance(slot, str) else failed.get(slot) for slot in slots]
+    summary.index.name = "strategy"
+
+    # signal rows in input order (duplicates get copies of the same bits)
+    all_entries = np.zeros((len(texts), packed), dtype=np.uint8)
+    all_exits = np.zeros((len(texts), packed), dtype=np.uint8)
+    all_entries[valid] = entries[rows[valid]]
+    all_exits[valid] = exits[rows[valid]]
+
+    return ScreenResult(summary, all_entries, all_exits, n, time.perf_counter() - start)
+
+
+def _last_use(evaluator, asts):
+    """Strategy index → node keys whose last user it is (for releasing memo entries)."""
+    last = {}
+    for k, final_ast in enumerate(asts):
+        for section in ("entry", "exit"):
+            for root in final_ast.get(section, []):
+                for node in _walk(root):
+                    last[evaluator.key(node)] = k
+    releases = {}
+    for key, k in last.items():
+        releases.setdefault(k, []).append(key)
+    return releases
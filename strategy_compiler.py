@@ -0,0 +1,189 @@
+import hashlib
+import json
+
+from caching import LRUCache
+from instrumentation import stage, count
+
+# lark, NumPy and pandas are imported on first parse / compile rather than
+# with this module, so processes that only hit the caches start quickly.
+
+
+# -----------------------------------------------------------
+# DSL → AST
+# -----------------------------------------------------------
+_ast_memo = LRUCache(maxsize=1024)    # normalized DSL text → final AST
+
+
+def parse_dsl_to_ast(dsl_text):
+    """
+    DSL text → final AST, memoized on the whitespace-normalized text.
+
+    The AST is shared by every caller parsing the same text: treat it as
+    read-only.
+    """
+    key = normalize_dsl(dsl_text)
+    final_ast = _ast_memo.get(key)
+    if final_ast is None:
+        count("parse_cache.misses")
+        final_ast = _parse(dsl_text)
+        _ast_memo.put(key, final_ast)
+    else:
+        count("parse_cache.hits")
+    return final_ast
+
+
+def _parse(dsl_text):
+    from lark.exceptions import VisitError
+
+    from ast_builder import DSLtoAST, build_final_ast
+    from dsl_parser import get_parser
+
+    with stage("parse"):
+        tree = get_parser().parse(dsl_text)
+    with stage("transform"):
+        try:
+            return build_final_ast(DSLtoAST().transform(tree))
+        except VisitError as exc:       # e.g. unknown indicator: report the builder's error
+            raise exc.orig_exc from None
+
+
+# -----------------------------------------------------------
+# Cache keys
+# -----------------------------------------------------------
+def normalize_dsl(dsl_text):
+    """Collapse whitespace (the grammar ignores it) so reformatted DSL shares a key."""
+    return " ".join(dsl_text.split())
+
+
+def ast_hash(final_ast):
+    """Stable hash of an AST (NUMBER tokens serialize as their text)."""
+    payload = json.dumps(final_ast, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# -----------------------------------------------------------
+# Compiled strategy
+# -----------------------------------------------------------
+def _column_array(df, name):
+    """Contiguous float64 values of a column (no copy when already float64)."""
+    import numpy as np
+    return np.ascontiguousarray(df[name].to_numpy(dtype=np.float64))
+
+
+def _bool_array(values, n):
+    import numpy as np
+    values = np.asarray(values, dtype=bool)
+    if values.shape != (n,):          # a constant condition, e.g. an empty section
+        values = np.full(n, values)
+    return values
+
+
+_namespaces = {}
+
+
+def _namespace(backend):
+    """Names the generated code of each backend (code_generator target) refers to."""
+    if not _namespaces:
+        import numpy as np
+        import pandas as pd
+
+        from caching import cached_indicator, cached_array_indicator
+        from indicators import INDICATORS, ARRAY_INDICATORS, shift_array
+        from timeframes import align, timeframe_bars
+
+        _namespaces["pandas"] = {**INDICATORS, "pd": pd, "INDICATOR": cached_indicator,
+                                 "TF": timeframe_bars, "ALIGN": align}
+        _namespaces["numpy"] = {**ARRAY_INDICATORS, "np": np, "INDICATOR": cached_array_indicator,
+                                "COLUMN": _column_array, "SHIFT": shift_array, "BOOLS": _bool_array,
+                                "TF": timeframe_bars, "ALIGN": align}
+    return _namespaces[backend]
+
+
+class CompiledStrategy:
+    """
+    A `run_strategy(df, cache=None)` function compiled from generated source.
+
+    Calling it returns the boolean ['entry','exit'] signals DataFrame, or
+    with backend="numpy" an (entry, exit) pair of boolean arrays computed
+    without pandas (same signals as the pandas path).
+    Indicators go through `cache` (default: caching.default_indicator_cache).
+
+    `risk` holds the STOP_LOSS / TAKE_PROFIT / TRAILING_STOP percentages;
+    the signals DataFrame carries them in .attrs["risk"] for
+    backtest_signals (pass them yourself with the numpy backend:
+    backtest_signals(df, signals, **strategy.risk)).
+    """
+
+    def __init__(self, final_ast, key=None, backend="pandas"):
+        self.ast = final_ast
+        self.key = key or ast_hash(final_ast)
+        self.backend = backend
+        self.risk = dict(final_ast.get("risk", {}))
+
+        from code_generator import ast_to_python_code
+
+        with stage("codegen"):
+            self.source = ast_to_python_code(final_ast, target=backend)
+            namespace = dict(_namespace(backend))
+            code = compile(self.source, f"<strategy {self.key[:12]}>", "exec")
+            exec(code, namespace)
+        self.run = namespace["run_strategy"]
+
+    def __call__(self, df, cache=None):
+        with stage("evaluate", rows=len(df)):
+            signals = self.run(df, cache)
+        if self.risk and self.backend == "pandas":
+            signals.attrs["risk"] = dict(self.risk)
+        return signals
+
+    def __repr__(self):
+        if self.backend == "pandas":
+            return f"CompiledStrategy({self.key[:12]})"
+        return f"CompiledStrategy({self.key[:12]}, backend={self.backend!r})"
+
+
+_text_cache = LRUCache(maxsize=256)   # (normalized DSL text, backend) → CompiledStrategy
+_ast_cache = LRUCache(maxsize=256)    # (AST hash, backend) → CompiledStrategy
+
+
+def compile_ast(final_ast, backend="pandas"):
+    """Compile a final AST ({'entry': [...], 'exit': [...]}), reusing cached code."""
+    key = ast_hash(final_ast)
+    strategy = _ast_cache.get((key, backend))
+    if strategy is None:
+        count("strategy_cache.misses")
+        strategy = CompiledStrategy(final_ast, key, backend)
+        _ast_cache.put((key, backend), strategy)
+    else:
+        count("strategy_cache.hits")
+    return strategy
+
+
+def compile_strategy(dsl_text, backend="pandas"):
+    """
+    Parse, generate and compile a DSL strategy once.
+
+    Repeat calls with the same (whitespace-normalized) DSL skip parsing,
+    AST transformation, code generation and compilation entirely.
+
+    backend="numpy" compiles to NumPy-only code returning (entry, exit)
+    boolean arrays instead of a signals DataFrame.
+    """
+    key = (normalize_dsl(dsl_text), backend)
+    strategy = _text_cache.get(key)
+    if strategy is None:
+        strategy = compile_ast(parse_dsl_to_ast(dsl_text), backend)
+        _text_cache.put(key, strategy)
+    else:
+        count("strategy_cache.hits")
+    return strategy
+
+
+def strategy_cache_info():
+    return {"dsl": _text_cache.info(), "ast": _ast_cache.info(), "parse": _ast_memo.info()}
+
+
+def clear_strategy_cache():
+    _text_cache.clear()
+    _ast_cache.clear()
+    _ast_memo.clear()
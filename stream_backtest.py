@@ -0,0 +1,477 @@
+import copy
+import csv
+import math
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from ast_optimizer import eliminate_common_subexpressions
+from backtest import position_state, require_no_risk_exits
+from code_generator import parse_number
+from indicators import ROC_array, indicator_params, shift_array
+from kernels import KERNELS
+from strategy_compiler import ast_hash, parse_dsl_to_ast
+from streaming import COMPARISONS
+
+# bumped whenever the pickled StreamingBacktest state changes shape
+CHECKPOINT_VERSION = 3
+
+
+# -----------------------------------------------------------
+# Chunk-wise signal evaluation with carried state
+# -----------------------------------------------------------
+class _Tail:
+    """The last `size` inputs of a node, prepended to the next chunk's inputs."""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = np.empty(0)
+
+    def extend(self, values):
+        data = np.concatenate([self.values, values])
+        self.values = data[max(len(data) - self.size, 0):] if self.size else data[:0]
+        return data
+
+
+class _ShiftChunks:
+    def __init__(self, periods):
+        self.periods = periods
+        self.tail = _Tail(periods)
+
+    def process(self, values):
+        carried = len(self.tail.values)
+        return shift_array(self.tail.extend(values), self.periods)[carried:]
+
+
+class _WindowChunks:
+    """
+    Rolling-window indicator: its whole state is its last `lookback` inputs,
+    so each chunk is computed as indicator(tail + chunk) minus the tail.
+    """
+
+    def __init__(self, indicator, period, lookback):
+        self.indicator = indicator
+        self.period = period
+        self.tail = _Tail(lookback)
+
+    def process(self, values):
+        carried = len(self.tail.values)
+        data = self.tail.extend(np.asarray(values, dtype=float))
+        return self.indicator(data, self.period)[carried:]
+
+
+class _KernelChunks:
+    """SMA and recursive indicators (EMA, Wilder RSI / ATR, MACD): the kernel carries its own state."""
+
+    def __init__(self, name, *params):
+        self.kernel = KERNELS[name](*params)
+
+    def process(self, values, *inputs):
+        return self.kernel.process(values, *inputs)
+
+
+# DSL indicator name → chunk state factory (arguments: the indicator's periods)
+CHUNK_INDICATORS = {
+    "SMA": lambda period: _KernelChunks("SMA", period),
+    "RSI": lambda period: _KernelChunks("RSI", period),
+    "EMA": lambda period: _KernelChunks("EMA", period),
+    "ATR": lambda period: _KernelChunks("ATR", period),
+    "MACD": lambda *periods: _KernelChunks("MACD", *periods),
+    "ROC": lambda period: _WindowChunks(ROC_array, period, period),
+}
+
+
+class ChunkedSignals:
+    """
+    ENTRY / EXIT arrays for consecutive chunks of one long bar series.
+
+    Shift and ROC nodes carry only their lookback across chunk boundaries,
+    SMA and the recursive indicators (EMA, RSI, ATR, MACD) their kernel
+    state, so memory is bounded by chunk size plus the longest lookback.
+    Signals do not depend on how the bars are split into chunks, and equal
+    the compiled strategy's bit for bit.
+    """
+
+    def __init__(self, final_ast):
+        self.ast = final_ast
+        self._plan = eliminate_common_subexpressions(final_ast)
+        self._states = {}
+        for name, definition in self._plan.temps.items():
+            if "timeframe" in definition:
+                raise ValueError("Timeframe-qualified series (close@1W) are not supported on chunks: "
+                                 "a period can span chunks")
+            if definition["type"] == "shift":
+                self._states[name] = _ShiftChunks(definition["periods"])
+            elif definition["type"] == "indicator":
+                factory = CHUNK_INDICATORS[definition["name"].upper()]
+                self._states[name] = factory(*indicator_params(definition["period"]))
+
+    def process(self, chunk):
+        n = len(chunk)
+        values = {}
+
+        def value(operand):
+            if isinstance(operand, dict):
+                return values[operand["name"]]
+            return float(parse_number(operand))
+
+        for name, definition in self._plan.temps.items():
+            kind = definition["type"]
+            if kind == "column":
+                values[name] = chunk[definition["name"]].to_numpy(dtype=float)
+            elif kind == "shift":
+                values[name] = self._states[name].process(value(definition["operand"]))
+            else:
+                source = np.broadcast_to(value(definition["series"]), (n,))
+                inputs = [np.broadcast_to(value(operand), (n,)) for operand in definition.get("inputs", ())]
+                values[name] = self._states[name].process(source, *inputs)
+
+        def condition(node):
+            kind = node["type"]
+            if kind == "and":
+                return condition(node["left"]) & condition(node["right"])
+            if kind == "or":
+                return condition(node["left"]) | condition(node["right"])
+            if kind == "comparison":
+                return COMPARISONS[node["operator"]](value(node["left"]), value(node["right"]))
+            if kind == "cross":
+                if node["direction"] == "above":
+                    return ((value(node["left_prev"]) <= value(node["right_prev"]))
+                            & (value(node["left"]) > value(node["right"])))
+                return ((value(node["left_prev"]) >= value(node["right_prev"]))
+                        & (value(node["left"]) < value(node["right"])))
+            raise ValueError("Unknown AST node:", node)
+
+        def section(name):
+            nodes = self._plan.ast[name]
+            if not nodes:
+                return np.zeros(n, dtype=bool)
+            return np.broadcast_to(np.asarray(condition(nodes[0]), dtype=bool), (n,))
+
+        return section("entry"), section("exit")
+
+
+# -----------------------------------------------------------
+# Output sinks
+# -----------------------------------------------------------
+class MemorySink:
+    """Collects equity and trades in memory (small runs, tests)."""
+
+    def __init__(self):
+        self._equity = []
+        self.trades = []
+
+    def write_equity(self, index, values):
+        self._equity.append(pd.Series(values, index=index))
+
+    def write_trades(self, trades):
+        self.trades.extend(trades)
+
+    @property
+    def equity(self):
+        if not self._equity:
+            return pd.Series(dtype=float)
+        return pd.concat(self._equity)
+
+
+class CsvSink:
+    """
+    Appends equity rows and closed trades to two CSV files as they are
+    produced.  append=True continues existing files (a resumed backtest).
+    """
+
+    TRADE_FIELDS = ["entry_index", "entry_fill_index", "entry_price", "exit_index",
+                    "exit_fill_index", "exit_price", "shares", "pnl", "return_pct"]
+
+    def __init__(self, equity_path, trades_path, append=False):
+        mode = "a" if append else "w"
+        self._equity_file = open(equity_path, mode, newline="")
+        self._trades_file = open(trades_path, mode, newline="")
+        self._equity_writer = csv.writer(self._equity_file)
+        self._trades_writer = csv.DictWriter(self._trades_file, fieldnames=self.TRADE_FIELDS)
+        if self._equity_file.tell() == 0:
+            self._equity_writer.writerow(["index", "equity"])
+        if self._trades_file.tell() == 0:
+            self._trades_writer.writeheader()
+
+    def write_equity(self, index, values):
+        self._equity_writer.writerows(zip(map(str, index), values.tolist()))
+
+    def write_trades(self, trades):
+        self._trades_writer.writerows(trades)
+
+    def close(self):
+        self._equity_file.close()
+        self._trades_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -----------------------------------------------------------
+# Incremental backtester
+# -----------------------------------------------------------
+class StreamingBacktest:
+    """
+    backtest_signals over a stream of OHLCV chunks with bounded memory.
+
+    Cash / position / open trade, indicator state and running drawdown are
+    carried from chunk to chunk; equity and closed trades go to `sink` as
+    soon as they are final.  The last bar of every chunk is held back until
+    the next chunk arrives, because its signal fills at the next bar's open.
+
+        bt = StreamingBacktest("ENTRY: ...\\nEXIT: ...", sink=CsvSink("eq.csv", "trades.csv"))
+        for chunk in pd.read_csv("bars.csv", chunksize=1_000_000):
+            bt.feed(chunk)
+        summary = bt.finish()
+
+    Checkpoints hold the whole carried state (indicator tails and kernels,
+    shift buffers, which also give cross events their previous values,
+    cash / position / open trade, drawdown and the held-back bar), so a
+    nightly job only feeds the new bars:
+
+        bt = StreamingBacktest.resume("spy.ckpt", sink=CsvSink("eq.csv", "trades.csv", append=True))
+        bt.feed(todays_bars)
+        bt.checkpoint("spy.ckpt")
+        summary = bt.summary()
+
+    and gets the trades, equity and summary of a run over the whole
+    history, bit for bit.
+    """
+
+    def __init__(self, strategy, sink=None, initial_capital=100000.0, slippage=0.0, commission=0.0):
+        final_ast = parse_dsl_to_ast(strategy) if isinstance(strategy, str) else strategy
+        require_no_risk_exits(final_ast, "StreamingBacktest")
+        self.signals = ChunkedSignals(final_ast)
+        self.strategy_hash = ast_hash(final_ast)
+        self.sink = sink if sink is not None else MemorySink()
+
+        self.initial_capital = float(initial_capital)
+        self.slippage = slippage
+        self.commission = commission
+
+        self.cash = float(initial_capital)
+        self.shares = 0.0
+        self.held = False
+        self.open_trade = None
+        self.num_trades = 0
+
+        self.peak = math.nan
+        self.max_drawdown = math.nan
+        self.last_equity = math.nan
+        self.bars = 0
+        self.last_index = None
+        self.finished = False
+        self._pending = None        # held-back last bar: (index, open, close, entry, exit)
+        self._resumed = False
+
+    # ------------------------------------------------------------
+    # Feeding chunks
+    # ------------------------------------------------------------
+    def feed(self, chunk):
+        if len(chunk) == 0:
+            return
+        if self.finished:
+            raise ValueError("StreamingBacktest already finished")
+        if self._resumed and not chunk.index[0] > self.last_index:
+            raise ValueError(f"Resumed after bar {self.last_index!r}: new bars must follow it "
+                             f"(got {chunk.index[0]!r})")
+        self._resumed = False
+        self.bars += len(chunk)
+        self.last_index = chunk.index[-1]
+        entry, exit = self.signals.process(chunk)
+        bars = (chunk.index,
+                chunk["open"].to_numpy(dtype=float),
+                chunk["close"].to_numpy(dtype=float),
+                entry, exit)
+
+        if self._pending is not None:
+            index = self._pending[0].append(bars[0])
+            bars = (index,) + tuple(np.concatenate([p, b]) for p, b in zip(self._pending[1:], bars[1:]))
+
+        count = len(bars[0]) - 1
+        self._process(*bars, count=count)
+        self._pending = (bars[0][count:],) + tuple(b[count:] for b in bars[1:])
+
+    def finish(self):
+        """Settle the held-back bar, force-close any open position, return the summary."""
+        self.finished = True
+        if self._pending is not None:
+            self._process(*self._pending, count=len(self._pending[0]), final=True)
+            self._pending = None
+
+        return {
+            "final_capital": self.last_equity,
+            "total_return_pct": (self.last_equity - self.initial_capital) / self.initial_capital * 100.0,
+            "max_drawdown_pct": self.max_drawdown * 100.0,
+            "num_trades": self.num_trades,
+        }
+
+    def summary(self):
+        """
+        What `finish` would return now, without finishing: the backtest can
+        still be fed (and checkpointed) afterwards, and nothing is written to
+        the sink (the settled last bar and forced close are provisional).
+        """
+        return copy.deepcopy(self).finish()
+
+    # ------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["sink"]                   # output goes wherever the resumed run says
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.sink = MemorySink()
+
+    def checkpoint(self, path):
+        """
+        Write the carried state to `path` (replaced atomically, so a crash
+        never leaves half a checkpoint).  Take it before `finish`: a
+        finished backtest has closed its position for good.
+        """
+        if self.finished:
+            raise ValueError("Cannot checkpoint a finished StreamingBacktest (checkpoint, then finish)")
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            pickle.dump({"version": CHECKPOINT_VERSION, "backtest": self}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    @classmethod
+    def resume(cls, path, sink=None, strategy=None):
+        """
+        StreamingBacktest saved by `checkpoint`, writing to `sink` from now
+        on (default: a new MemorySink).  With `strategy` (DSL text or final
+        AST) the checkpoint must belong to that strategy.  Checkpoints are
+        pickles: only resume files you wrote.
+        """
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+        if not isinstance(saved, dict) or saved.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path} is not a version {CHECKPOINT_VERSION} StreamingBacktest checkpoint")
+        backtest = saved["backtest"]
+        if strategy is not None:
+            final_ast = parse_dsl_to_ast(strategy) if isinstance(strategy, str) else strategy
+            if ast_hash(final_ast) != backtest.strategy_hash:
+                raise ValueError(f"{path} was saved for a different strategy")
+        backtest.sink = sink if sink is not None else MemorySink()
+        backtest._resumed = backtest.last_index is not None
+        return backtest
+
+    # ------------------------------------------------------------
+    # One block of bars whose fills are all known
+    # ------------------------------------------------------------
+    def _process(self, index, opens, closes, entry, exit, count, final=False):
+        if count == 0:
+            return
+        n = len(closes)
+        held = position_state(entry[:count], exit[:count], initial=self.held)
+
+        start_cash, start_shares = self.cash, self.shares
+        events, event_cash, event_shares = [], [], []
+        changes = _transitions(held, self.held)
+        i = 0
+        while i < len(changes):
+            bar = int(changes[i])
+            fill_bar = bar + 1 if bar + 1 < n else bar
+            fill_price = float(opens[fill_bar]) if bar + 1 < n else float(closes[bar])
+
+            if held[bar]:
+                buy_price = fill_price + self.slippage
+                shares = self.cash / buy_price if buy_price > 0 else 0
+                if not shares > 0:
+                    # rejected entry: stay flat and re-derive the rest of the block
+                    held[bar] = False
+                    held[bar + 1:] = position_state(entry[bar + 1:count], exit[bar + 1:count])
+                    changes = np.concatenate([changes[:i], bar + 1 + _transitions(held[bar + 1:], False)])
+                    continue
+
+                self.cash -= self.commission
+                self.shares = shares
+                self.num_trades += 1
+                self.open_trade = {
+                    "entry_index": str(index[bar]),
+                    "entry_fill_index": str(index[fill_bar]),
+                    "entry_price": float(buy_price),
+                    "exit_index": None,
+                    "exit_fill_index": None,
+                    "exit_price": None,
+                    "shares": float(shares),
+                    "pnl": None,
+                    "return_pct": None
+                }
+            else:
+                self._close_trade(str(index[bar]), str(index[fill_bar]), fill_price - self.slippage)
+
+            events.append(bar)
+            event_cash.append(self.cash)
+            event_shares.append(self.shares)
+            i += 1
+
+        # cash / shares after each bar → mark-to-market equity
+        last_event = np.full(count, -1, dtype=np.int64)
+        last_event[events] = np.arange(len(events))
+        last_event = np.maximum.accumulate(last_event)
+        event_cash = np.append(event_cash, start_cash)         # index -1 → carried state
+        event_shares = np.append(event_shares, start_shares)
+        equity = event_cash[last_event] + event_shares[last_event] * closes[:count]
+
+        if final and held[-1]:
+            self._close_trade(str(index[count - 1]), str(index[count - 1]), float(closes[count - 1]) - self.slippage)
+            equity[-1] = self.cash
+
+        self.held = bool(held[-1]) and not final
+        self._record_equity(index[:count], equity)
+
+    def _close_trade(self, exit_index, exit_fill_index, sell_price):
+        trade = self.open_trade
+        proceeds = self.shares * sell_price
+        cost = trade["shares"] * trade["entry_price"]
+        pnl = proceeds - cost - self.commission
+        return_pct = pnl / cost if cost != 0 else 0
+
+        trade["exit_index"] = exit_index
+        trade["exit_fill_index"] = exit_fill_index
+        trade["exit_price"] = float(sell_price)
+        trade["pnl"] = float(pnl)
+        trade["return_pct"] = float(return_pct) * 100.0
+
+        self.cash += proceeds
+        self.shares = 0.0
+        self.open_trade = None
+        self.sink.write_trades([trade])
+
+    def _record_equity(self, index, equity):
+        roll_max = np.fmax.accumulate(np.concatenate(([self.peak], equity)))[1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drawdown = (equity - roll_max) / roll_max
+        if not np.all(np.isnan(drawdown)):
+            self.max_drawdown = np.fmin(self.max_drawdown, np.nanmin(drawdown))
+        self.peak = roll_max[-1]
+        self.last_equity = float(equity[-1])
+        self.sink.write_equity(index, equity)
+
+
+def _transitions(held, initial):
+    """Bars where the held state changes (entries and exits, in time order)."""
+    return np.flatnonzero(held != np.concatenate(([initial], held[:-1])))
+
+
+def backtest_stream(chunks, strategy, sink=None, initial_capital=100000.0, slippage=0.0, commission=0.0):
+    """
+    Backtest a strategy (DSL text or final AST) over an iterable of OHLCV
+    chunks, e.g. pd.read_csv(path, chunksize=...).  Returns the summary dict;
+    equity and trades are written to `sink` (default: a MemorySink).
+    """
+    backtest = StreamingBacktest(strategy, sink, initial_capital, slippage, commission)
+    for chunk in chunks:
+        backtest.feed(chunk)
+    return backtest.finish()
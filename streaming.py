@@ -0,0 +1,373 @@
+import math
+import operator
+
+import pandas as pd
+
+from ast_optimizer import eliminate_common_subexpressions
+from code_generator import parse_number
+from indicators import indicator_params
+from kernels import ema_alpha, smoothing_weights, wilder_alpha
+from strategy_compiler import parse_dsl_to_ast
+
+NAN = float("nan")
+
+COMPARISONS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "==": operator.eq,
+}
+
+
+def _divide(a, b):
+    """IEEE division like NumPy / pandas (x/0 → ±inf, 0/0 → NaN) instead of raising."""
+    if b == 0:
+        if a == 0 or a != a:
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _fmax(a, b):
+    """np.fmax: the larger value, ignoring a NaN operand."""
+    if a != a:
+        return b
+    if b != b:
+        return a
+    return a if a >= b else b
+
+
+# -----------------------------------------------------------
+# O(1)-update building blocks
+# -----------------------------------------------------------
+class RingBuffer:
+    """Last `size` values pushed; `push` returns the value that falls out (NaN while filling)."""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = [NAN] * size
+        self.position = 0
+
+    def push(self, value):
+        oldest = self.values[self.position]
+        self.values[self.position] = value
+        self.position = (self.position + 1) % self.size
+        return oldest
+
+
+class RollingMean:
+    """
+    Fixed-window mean updated one value at a time.
+
+    Replicates pandas' rolling-mean kernel (Kahan-compensated add/remove,
+    NaN-aware observation count, sign and repeated-value corrections) so the
+    streaming values are bit-identical to Series.rolling(period).mean().
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.window = RingBuffer(period)
+        self.filled = 0
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.same_count = 0
+        self.prev_value = None
+
+    def _add(self, value):
+        if value != value:
+            return
+        self.nobs += 1
+        y = value - self.compensation_add
+        t = self.sum_x + y
+        self.compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct += 1
+        if value == self.prev_value:
+            self.same_count += 1
+        else:
+            self.same_count = 1
+        self.prev_value = value
+
+    def _remove(self, value):
+        if value != value:
+            return
+        self.nobs -= 1
+        y = -value - self.compensation_remove
+        t = self.sum_x + y
+        self.compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct -= 1
+
+    def update(self, value):
+        if self.period == 1:
+            # pandas re-seeds a window that shares no value with the previous one
+            self.nobs = self.neg_ct = self.same_count = 0
+            self.sum_x = self.compensation_add = self.compensation_remove = 0.0
+            self.prev_value = value
+            self._add(value)
+        else:
+            if self.prev_value is None:
+                self.prev_value = value
+            dropped = self.window.push(value)
+            if self.filled == self.period:
+                self._remove(dropped)
+            else:
+                self.filled += 1
+            self._add(value)
+
+        if self.nobs < self.period:
+            return NAN
+
+        result = self.sum_x / self.nobs
+        if self.same_count >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+
+# -----------------------------------------------------------
+# Streaming indicators (one instance per indicator temp)
+# -----------------------------------------------------------
+class StreamingSMA:
+    def __init__(self, period):
+        self.mean = RollingMean(period)
+
+    def update(self, value):
+        return self.mean.update(value)
+
+
+class RecursiveMean:
+    """
+    One-value-at-a-time kernels.RecursiveMean: simple-mean seed over the
+    first `period` observations, then the same smoothing update (NaN
+    skipped), so values are bit-identical to the array kernels.
+    """
+
+    def __init__(self, alpha, period):
+        self.period = period
+        self.old_weight, self.new_weight = smoothing_weights(alpha)
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, value):
+        if value != value:
+            return NAN
+        if self.count < self.period:
+            self.total += value
+            self.count += 1
+            if self.count < self.period:
+                return NAN
+            self.value = self.total / self.period
+        elif self.value != value:
+            self.value = ((self.old_weight * self.value + self.new_weight * value)
+                          / (self.old_weight + self.new_weight))
+        return self.value
+
+
+class StreamingEMA:
+    def __init__(self, period):
+        self.mean = RecursiveMean(ema_alpha(period), period)
+
+    def update(self, value):
+        return self.mean.update(value)
+
+
+class StreamingRSI:
+    """Same definition as indicators.RSI: Wilder averages of gains / losses."""
+
+    def __init__(self, period):
+        self.avg_gain = RecursiveMean(wilder_alpha(period), period)
+        self.avg_loss = RecursiveMean(wilder_alpha(period), period)
+        self.prev = NAN
+
+    def update(self, value):
+        delta = value - self.prev
+        self.prev = value
+
+        gain = max(delta, 0.0)           # NaN stays NaN (skipped), like np.maximum
+        loss = max(-delta, 0.0)
+
+        rs = _divide(self.avg_gain.update(gain), self.avg_loss.update(loss))
+        return 100 - _divide(100, 1 + rs)
+
+
+class StreamingATR:
+    def __init__(self, period):
+        self.mean = RecursiveMean(wilder_alpha(period), period)
+        self.prev_close = NAN
+
+    def update(self, close, high, low):
+        prev_close, self.prev_close = self.prev_close, close
+        true_range = _fmax(high - low, _fmax(abs(high - prev_close), abs(low - prev_close)))
+        return self.mean.update(true_range)
+
+
+class StreamingMACD:
+    def __init__(self, fast, slow, signal=None):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal) if signal else None
+
+    def update(self, value):
+        line = self.fast.update(value) - self.slow.update(value)
+        if self.signal is None:
+            return line
+        return line - self.signal.update(line)
+
+
+class StreamingROC:
+    def __init__(self, period):
+        self.window = RingBuffer(period)
+
+    def update(self, value):
+        previous = self.window.push(value)
+        return NAN if previous == 0 else (value - previous) / previous * 100.0
+
+
+STREAMING_INDICATORS = {
+    "SMA": StreamingSMA,
+    "RSI": StreamingRSI,
+    "EMA": StreamingEMA,
+    "ATR": StreamingATR,
+    "MACD": StreamingMACD,
+    "ROC": StreamingROC,
+}
+
+
+class _Shift:
+    def __init__(self, periods):
+        self.buffer = RingBuffer(periods)
+
+    def update(self, value):
+        return self.buffer.push(value)
+
+
+# -----------------------------------------------------------
+# Incremental strategy evaluator
+# -----------------------------------------------------------
+class StreamingStrategy:
+    """
+    Bar-by-bar evaluation of a strategy AST.
+
+    Built from the same common-subexpression plan as the generated pandas
+    code: every distinct series / shift / indicator keeps O(1)-update state,
+    so `on_bar` costs the same whatever the history length.  Signals match
+    the batch path (ast_to_signals) bar for bar.
+
+        strategy = StreamingStrategy.from_dsl("ENTRY: close crosses_above SMA(close,20)")
+        for bar in feed:                      # mapping with OHLCV keys
+            entry, exit = strategy.on_bar(bar)
+    """
+
+    def __init__(self, final_ast):
+        self.ast = final_ast
+        self._plan = eliminate_common_subexpressions(final_ast)
+        self.reset()
+
+        self._entry = self._compile_section("entry")
+        self._exit = self._compile_section("exit")
+
+    @classmethod
+    def from_dsl(cls, dsl_text):
+        return cls(parse_dsl_to_ast(dsl_text))
+
+    def reset(self):
+        """Drop all indicator state (start a fresh stream)."""
+        self._steps = []
+        for name, definition in self._plan.temps.items():
+            kind = definition["type"]
+            if "timeframe" in definition:
+                raise ValueError("Timeframe-qualified series (close@1W) need timestamps and are "
+                                 "not supported on live bars; evaluate them on the full frame")
+            if kind == "column":
+                self._steps.append((name, kind, definition["name"], None))
+            elif kind == "shift":
+                self._steps.append((name, kind, definition["operand"]["name"],
+                                    _Shift(definition["periods"])))
+            elif kind == "indicator":
+                factory = STREAMING_INDICATORS[definition["name"].upper()]
+                state = factory(*indicator_params(definition["period"]))
+                if definition.get("inputs"):        # ATR: close plus high / low
+                    getters = [self._getter(operand)
+                               for operand in [definition["series"]] + definition["inputs"]]
+                    self._steps.append((name, "indicator_inputs", getters, state))
+                else:
+                    self._steps.append((name, kind, self._getter(definition["series"]), state))
+            else:
+                raise ValueError("Unsupported streaming node:", definition)
+        self.values = {}
+
+    # ------------------------------------------------------------
+    # Condition closures over the current bar's values
+    # ------------------------------------------------------------
+    def _getter(self, operand):
+        if isinstance(operand, dict):
+            name = operand["name"]
+            return lambda values: values[name]
+        constant = float(parse_number(operand))
+        return lambda values: constant
+
+    def _condition(self, node):
+        kind = node["type"]
+
+        if kind in ("and", "or"):
+            left, right = self._condition(node["left"]), self._condition(node["right"])
+            if kind == "and":
+                return lambda values: left(values) and right(values)
+            return lambda values: left(values) or right(values)
+
+        if kind == "comparison":
+            compare = COMPARISONS[node["operator"]]
+            left, right = self._getter(node["left"]), self._getter(node["right"])
+            return lambda values: compare(left(values), right(values))
+
+        if kind == "cross":
+            left, right = self._getter(node["left"]), self._getter(node["right"])
+            left_prev, right_prev = self._getter(node["left_prev"]), self._getter(node["right_prev"])
+            if node["direction"] == "above":
+                return lambda values: (left_prev(values) <= right_prev(values)
+                                       and left(values) > right(values))
+            return lambda values: (left_prev(values) >= right_prev(values)
+                                   and left(values) < right(values))
+
+        raise ValueError("Unknown AST node:", node)
+
+    def _compile_section(self, section):
+        nodes = self._plan.ast[section]
+        if not nodes:
+            return lambda values: False
+        return self._condition(nodes[0])
+
+    # ------------------------------------------------------------
+    # Feeding bars
+    # ------------------------------------------------------------
+    def on_bar(self, bar):
+        """Consume one bar (mapping of column → value); return (entry, exit)."""
+        values = self.values
+        for name, kind, source, state in self._steps:
+            if kind == "column":
+                values[name] = float(bar[source])
+            elif kind == "shift":
+                values[name] = state.update(values[source])
+            elif kind == "indicator":
+                values[name] = state.update(source(values))
+            else:
+                values[name] = state.update(*[getter(values) for getter in source])
+        return bool(self._entry(values)), bool(self._exit(values))
+
+    def run(self, df):
+        """Feed every row of `df`; returns the same ['entry','exit'] frame as ast_to_signals."""
+        columns = list(df.columns)
+        rows = [self.on_bar(dict(zip(columns, row)))
+                for row in zip(*(df[c].to_numpy() for c in columns))]
+        return pd.DataFrame(rows, index=df.index, columns=["entry", "exit"], dtype=bool)
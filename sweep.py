@@ -0,0 +1,268 @@
+import itertools
+import operator
+
+import numpy as np
+import pandas as pd
+
+from ast_optimizer import node_key
+from backtest import backtest_signal_matrix, require_no_risk_exits
+from code_generator import parse_number
+from indicators import ARRAY_INDICATORS, INDICATOR_BANKS, INDICATOR_INPUTS, indicator_params, shift_array
+from strategy_compiler import parse_dsl_to_ast
+from timeframes import align, timeframe_bars
+
+COMPARISONS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "==": operator.eq,
+}
+
+
+# -----------------------------------------------------------
+# Helpers
+# -----------------------------------------------------------
+def expand_grid(grid):
+    """{'fast': [5, 10], 'slow': [50]} → [{'fast': 5, 'slow': 50}, {'fast': 10, 'slow': 50}]"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _walk(node):
+    """Yield every dict node of an AST expression."""
+    if isinstance(node, dict):
+        yield node
+        for child in node.values():
+            yield from _walk(child)
+
+
+def _timeframe(operand):
+    """Timeframe an operand is computed on (close@1W, SMA(close@1W,20)); None for the base bars."""
+    while isinstance(operand, dict):
+        if operand.get("type") == "series":
+            return operand.get("timeframe")
+        operand = operand.get("series")
+    return None
+
+
+# -----------------------------------------------------------
+# Shared evaluation of many ASTs over one dataset
+# -----------------------------------------------------------
+class BatchEvaluator:
+    """
+    Evaluates many ASTs against one OHLCV frame with NumPy arrays.
+
+    - Every distinct value / condition node (by structure) is computed once
+      and shared by all ASTs evaluated through this object.
+    - Indicators with a bank kernel (SMA, RSI) are computed for all the
+      periods the ASTs need in a single pass per (indicator, column, lag).
+    - Timeframe-qualified operands (SMA(close@1W,20)) are computed by one
+      evaluator per timeframe over the resampled bars and aligned back to
+      the base bars (timeframes.py).
+
+    Signals match the pandas path exactly.
+    """
+
+    def __init__(self, df, asts=(), timeframe=None):
+        self.df = df
+        self.timeframe = timeframe  # set on the evaluators of resampled bars
+        self._asts = list(asts)
+        self._resampled = {}        # timeframe → BatchEvaluator over the resampled bars
+        self._columns = {}
+        self._memo = {}
+        self._keys = {}             # id(node) → node_key (nodes stay alive with their ASTs)
+        self._bank_periods = {}     # (NAME, column, lag) → set of periods
+        self._banks = {}            # (NAME, column, lag) → (matrix, {period: col})
+
+        for final_ast in asts:
+            for section in ("entry", "exit"):
+                for root in final_ast.get(section, []):
+                    self._plan(root)
+
+    def _plan(self, root):
+        for node in _walk(root):
+            if node.get("type") != "indicator":
+                continue
+            name, series = node["name"].upper(), node["series"]
+            if (name in INDICATOR_BANKS and isinstance(node["period"], int)
+                    and isinstance(series, dict) and series.get("type") == "series"
+                    and series.get("timeframe") == self.timeframe):
+                key = (name, series["name"], series.get("index") or 0)
+                self._bank_periods.setdefault(key, set()).add(node["period"])
+
+    def key(self, node):
+        """node_key of `node`, computed once per node object."""
+        entry = self._keys.get(id(node))
+        if entry is None or entry[0] is not node:
+            entry = (node, node_key(node))
+            self._keys[id(node)] = entry
+        return entry[1]
+
+    def release(self, keys):
+        """Drop memoized results (by node key) no later evaluation needs."""
+        for key in keys:
+            self._memo.pop(key, None)
+
+    # ------------------------------------------------------------
+    # Values
+    # ------------------------------------------------------------
+    def column(self, name, lag=0):
+        values = self._columns.get(name)
+        if values is None:
+            values = self.df[name].to_numpy(dtype=float)
+            self._columns[name] = values
+        return shift_array(values, lag)
+
+    def _bank(self, key, period):
+        entry = self._banks.get(key)
+        if entry is None or period not in entry[1]:
+            periods = sorted(self._bank_periods.get(key, set()) | {period})
+            name, column, lag = key
+            matrix = INDICATOR_BANKS[name](self.column(column, lag), periods)
+            entry = (matrix, {p: j for j, p in enumerate(periods)})
+            self._banks[key] = entry
+        matrix, positions = entry
+        return matrix[:, positions[period]]
+
+    def _on_timeframe(self, timeframe):
+        evaluator = self._resampled.get(timeframe)
+        if evaluator is None:
+            evaluator = BatchEvaluator(timeframe_bars(self.df, timeframe), self._asts, timeframe)
+            self._resampled[timeframe] = evaluator
+        return evaluator
+
+    def value(self, operand):
+        if not isinstance(operand, dict):
+            return float(parse_number(operand))
+
+        key = self.key(operand)
+        result = self._memo.get(key)
+        if result is not None:
+            return result
+
+        timeframe = _timeframe(operand)
+        if timeframe != self.timeframe:
+            # computed on the resampled bars, each base bar sees the last completed period
+            result = align(self.df, self._on_timeframe(timeframe).value(operand), timeframe)
+
+        elif operand["type"] == "series":
+            result = self.column(operand["name"], operand.get("index") or 0)
+
+        elif operand["type"] == "indicator":
+            name, series = operand["name"].upper(), operand["series"]
+            if (name in INDICATOR_BANKS and isinstance(operand["period"], int)
+                    and isinstance(series, dict) and series.get("type") == "series"):
+                bank_key = (name, series["name"], series.get("index") or 0)
+                result = self._bank(bank_key, operand["period"])
+            else:
+                source = np.broadcast_to(self.value(series), (len(self.df),))
+                # same lag (and timeframe) as the series
+                inputs = [self.value(dict(series, name=column)) for column in INDICATOR_INPUTS.get(name, ())]
+                result = ARRAY_INDICATORS[name](source, *indicator_params(operand["period"]), *inputs)
+
+        else:
+            raise ValueError("Unsupported operand:", operand)
+
+        self._memo[key] = result
+        return result
+
+    def _previous(self, operand):
+        value = self.value(operand)
+        if isinstance(value, np.ndarray):
+            return shift_array(value, 1)
+        return value
+
+    # ------------------------------------------------------------
+    # Conditions
+    # ------------------------------------------------------------
+    def condition(self, node):
+        key = self.key(node)
+        result = self._memo.get(key)
+        if result is not None:
+            return result
+
+        if node["type"] == "and":
+            result = self.condition(node["left"]) & self.condition(node["right"])
+
+        elif node["type"] == "or":
+            result = self.condition(node["left"]) | self.condition(node["right"])
+
+        elif node["type"] == "comparison":
+            compare = COMPARISONS[node["operator"]]
+            result = compare(self.value(node["left"]), self.value(node["right"]))
+
+        elif node["type"] == "cross":
+            left_now, right_now = self.value(node["left"]), self.value(node["right"])
+            left_prev, right_prev = self._previous(node["left"]), self._previous(node["right"])
+            if node["direction"] == "above":
+                result = (left_prev <= right_prev) & (left_now > right_now)
+            else:
+                result = (left_prev >= right_prev) & (left_now < right_now)
+
+        else:
+            raise ValueError("Unknown AST node:", node)
+
+        result = np.broadcast_to(np.asarray(result, dtype=bool), (len(self.df),))
+        self._memo[key] = result
+        return result
+
+    def signals(self, final_ast):
+        """(entry, exit) boolean arrays for one final AST."""
+        n = len(self.df)
+        entry = self.condition(final_ast["entry"][0]) if final_ast["entry"] else np.zeros(n, dtype=bool)
+        exit = self.condition(final_ast["exit"][0]) if final_ast["exit"] else np.zeros(n, dtype=bool)
+        return entry, exit
+
+    def signal_matrices(self, asts):
+        """(bars x len(asts)) ENTRY and EXIT matrices."""
+        n = len(self.df)
+        entries = np.zeros((n, len(asts)), dtype=bool)
+        exits = np.zeros((n, len(asts)), dtype=bool)
+        for j, final_ast in enumerate(asts):
+            entries[:, j], exits[:, j] = self.signals(final_ast)
+        return entries, exits
+
+
+# -----------------------------------------------------------
+# Parameter sweep
+# -----------------------------------------------------------
+def sweep_signals(dsl_template, grid, df):
+    """
+    Expand `dsl_template` (str.format placeholders, e.g. SMA(close,{fast}))
+    over `grid` and build the (bars x combinations) signal matrices.
+
+    Returns (combinations, entries, exits).
+    """
+    combinations = expand_grid(grid)
+    asts = [parse_dsl_to_ast(dsl_template.format(**params)) for params in combinations]
+    for final_ast in asts:
+        require_no_risk_exits(final_ast, "sweep")
+
+    evaluator = BatchEvaluator(df, asts)
+    entries, exits = evaluator.signal_matrices(asts)
+    return combinations, entries, exits
+
+
+def sweep(dsl_template, grid, df, initial_capital=100000.0, slippage=0.0, commission=0.0):
+    """
+    Run one DSL template over every parameter combination in `grid`.
+
+        sweep("ENTRY: SMA(close,{fast}) crosses_above SMA(close,{slow})\\n"
+              "EXIT: RSI(close,{rsi}) > 70",
+              {"fast": range(5, 50, 5), "slow": [100, 200], "rsi": [7, 14]}, df)
+
+    All periods of an indicator are computed in one pass and all
+    combinations are backtested together.
+
+    Returns:
+        DataFrame, one row per combination: the parameters plus
+        final_capital, total_return_pct, max_drawdown_pct, num_trades
+    """
+    combinations, entries, exits = sweep_signals(dsl_template, grid, df)
+    metrics = backtest_signal_matrix(df, entries, exits, initial_capital, slippage, commission)
+
+    results = pd.DataFrame(combinations, columns=list(grid))
+    for name, values in metrics.items():
+        results[name] = values
+    return results
@@ -0,0 +1,87 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def random_ohlcv(bars, seed=0, start="2020-01-01", freq="D", decimals=2):
+    """
+    Random-walk OHLCV bars with prices rounded to `decimals` (cents: ties
+    and equal bars do occur; None keeps full precision).
+    """
+    rng = np.random.default_rng(seed)
+    round_ = (lambda values: values) if decimals is None else (lambda values: np.round(values, decimals))
+    close = round_(100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, bars))))
+    opens = round_(np.concatenate(([100.0], close[:-1])) * (1 + rng.normal(0.0, 0.003, bars)))
+    spread = round_(np.abs(rng.normal(0.0, 0.005, bars)) * close)
+    return pd.DataFrame({
+        "open": opens,
+        "high": np.maximum(opens, close) + spread,
+        "low": np.minimum(opens, close) - spread,
+        "close": close,
+        "volume": rng.integers(100_000, 2_000_000, bars).astype(float),
+    }, index=pd.date_range(start, periods=bars, freq=freq))
+
+
+def flat_ticks(bars, seed=0, start="2024-01-02 09:30"):
+    """
+    Minute bars moving a cent at a time and mostly not at all: long runs of
+    equal closes, where `close == SMA(close, n)` ties decide the signals.
+    """
+    rng = np.random.default_rng(seed)
+    steps = rng.choice([-1, 0, 1], bars, p=[0.2, 0.6, 0.2])
+    close = np.round(100.0 + 0.01 * np.cumsum(steps), 2)
+    opens = np.concatenate(([100.0], close[:-1]))
+    return pd.DataFrame({
+        "open": opens,
+        "high": np.maximum(opens, close),
+        "low": np.minimum(opens, close),
+        "close": close,
+        "volume": rng.integers(100, 1000, bars).astype(float),
+    }, index=pd.date_range(start, periods=bars, freq="min"))
+
+
+def random_signals(index, seed=0, density=0.1):
+    """Independent random ENTRY / EXIT flags (both on one bar included)."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"entry": rng.random(len(index)) < density,
+                         "exit": rng.random(len(index)) < density}, index=index)
+
+
+@pytest.fixture
+def ohlcv():
+    return random_ohlcv(500, seed=1)
+
+
+# strategies exercising shifts, crosses, every indicator and AND / OR nesting
+STRATEGIES = [
+    "ENTRY: close crosses_above SMA(close,20)\nEXIT: close crosses_below SMA(close,20)",
+    "ENTRY: SMA(close,5) > SMA(close,30) AND RSI(close,14) < 70\nEXIT: RSI(close,14) > 60 OR close < close[2]",
+    "ENTRY: close[1] crosses_above high[2] AND volume > volume[3]\nEXIT: close crosses_below EMA(close,10)",
+    "ENTRY: MACD(close,12,26,9) crosses_above 0\nEXIT: ATR(close,14) > 2 OR ROC(close,3) < -2",
+    "ENTRY: (close > EMA(close,50) OR RSI(close,7) < 30) AND ROC(volume,5) > 10\nEXIT: close < SMA(close,10)",
+]
+
+
+# signals that flip on `close == SMA` ties
+TIE_STRATEGY = "ENTRY: close > SMA(close,20)\nEXIT: close < SMA(close,20)"
+
+
+SUMMARY_METRICS = ["final_capital", "total_return_pct", "max_drawdown_pct", "num_trades"]
+
+
+def assert_same_backtest(actual, expected, rtol=1e-9):
+    """Same trades (bars, prices, shares, pnl), equity curve and summary metrics."""
+    got, want = actual["trades"].records, expected["trades"].records
+    assert len(got) == len(want)
+    for field in ("entry_bar", "entry_fill_bar", "exit_bar", "exit_fill_bar"):
+        np.testing.assert_array_equal(got[field], want[field], err_msg=field)
+    for field in ("entry_price", "exit_price", "shares", "pnl", "return_pct"):
+        np.testing.assert_allclose(got[field], want[field], rtol=rtol, err_msg=field)
+    pd.testing.assert_series_equal(actual["equity"], expected["equity"], check_exact=False, rtol=rtol)
+    for name in SUMMARY_METRICS:
+        assert actual[name] == pytest.approx(expected[name], rel=rtol), name
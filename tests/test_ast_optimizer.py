@@ -0,0 +1,52 @@
+import re
+
+import pandas as pd
+import pytest
+
+from caching import cached_indicator
+from code_generator import ast_to_python_code
+from conftest import STRATEGIES
+from indicators import INDICATORS
+from strategy_compiler import parse_dsl_to_ast
+
+
+def generated(dsl, optimize=True):
+    return ast_to_python_code(parse_dsl_to_ast(dsl), optimize=optimize)
+
+
+def temporaries(source):
+    """name → right-hand side of every `_tN = ...` line."""
+    return dict(re.findall(r"^\s*(_t\d+) = (.+)$", source, flags=re.M))
+
+
+def run(source, df):
+    namespace = {**INDICATORS, "pd": pd, "INDICATOR": cached_indicator}
+    exec(source, namespace)
+    return namespace["run_strategy"](df)
+
+
+def test_repeated_subexpressions_become_one_temporary():
+    source = generated("ENTRY: close crosses_above SMA(close,50) AND close > SMA(close,50)\n"
+                       "EXIT: close[1] < SMA(close,50) OR close[2] > 3")
+    temps = temporaries(source)
+
+    assert list(temps.values()).count("df['close']") == 1
+    assert [name for name, value in temps.items() if "SMA" in value] == ["_t1"]
+    assert "_t0, 50" in temps["_t1"]
+    assert len(set(temps.values())) == len(temps)
+    assert source.count("SMA") == 1 and source.count("df['close']") == 1
+
+
+def test_nested_shifts_fold_into_one_shift_of_the_column():
+    # the cross needs close[1] one bar back: that is close shifted by 2, shared with close[2]
+    temps = temporaries(generated("ENTRY: close[1] crosses_above high[1]\nEXIT: close[2] > high"))
+
+    shifts = [value for value in temps.values() if ".shift(" in value]
+    assert "_t0.shift(2)" in shifts
+    assert all(re.fullmatch(r"_t\d+\.shift\(\d\)", value) for value in shifts)
+    assert all(temps[value.split(".")[0]].startswith("df[") for value in shifts)
+
+
+@pytest.mark.parametrize("dsl", STRATEGIES)
+def test_optimized_code_gives_the_unoptimized_signals(ohlcv, dsl):
+    pd.testing.assert_frame_equal(run(generated(dsl), ohlcv), run(generated(dsl, optimize=False), ohlcv))
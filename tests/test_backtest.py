@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from backtest import _backtest_vectorized, backtest_signals
+from conftest import assert_same_backtest, random_ohlcv, random_signals
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("density", [0.02, 0.1, 0.4])
+def test_vectorized_matches_loop(seed, density):
+    df = random_ohlcv(400, seed=seed)
+    signals = random_signals(df.index, seed=seed + 100, density=density)
+    loop = backtest_signals(df, signals, slippage=0.05, commission=1.0, engine="loop")
+    vectorized = backtest_signals(df, signals, slippage=0.05, commission=1.0, engine="vectorized")
+    assert_same_backtest(vectorized, loop)
+
+
+def test_signals_on_the_last_bar(ohlcv):
+    signals = random_signals(ohlcv.index, seed=3, density=0.0)
+    signals.iloc[-1] = [True, False]
+    loop = backtest_signals(ohlcv, signals, engine="loop")
+    vectorized = backtest_signals(ohlcv, signals, engine="vectorized")
+    assert_same_backtest(vectorized, loop)
+    assert vectorized["num_trades"] == 1
+
+
+def test_no_signals(ohlcv):
+    signals = random_signals(ohlcv.index, density=0.0)
+    loop = backtest_signals(ohlcv, signals, engine="loop")
+    vectorized = backtest_signals(ohlcv, signals, engine="vectorized")
+    assert_same_backtest(vectorized, loop)
+    assert vectorized["num_trades"] == 0
+
+
+@pytest.mark.parametrize("price", [0.0, -1.0])
+def test_non_positive_fill_falls_back_to_loop(ohlcv, price):
+    signals = random_signals(ohlcv.index, seed=5, density=0.1)
+    entry = int(np.flatnonzero(signals["entry"])[0])
+    ohlcv.iloc[entry + 1, ohlcv.columns.get_loc("open")] = price
+    assert _backtest_vectorized(ohlcv, signals, 100000.0, 0.0, 0.0) is None
+
+    loop = backtest_signals(ohlcv, signals, engine="loop")
+    vectorized = backtest_signals(ohlcv, signals, engine="vectorized")
+    assert_same_backtest(vectorized, loop)
+    assert loop["trades"][0]["entry_index"] != str(ohlcv.index[entry])    # the loop skips that entry
+
+
+def test_unknown_engine(ohlcv):
+    with pytest.raises(ValueError, match="Unknown backtest engine"):
+        backtest_signals(ohlcv, random_signals(ohlcv.index), engine="numba")
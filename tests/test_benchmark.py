@@ -0,0 +1,28 @@
+from benchmark import STAGES, compare_results, format_results, load_results, run_suite, save_results
+
+
+def small_suite():
+    corpus = {"trend": "ENTRY: close > SMA(close,20)\nEXIT: close < SMA(close,20)"}
+    return run_suite(bars=(500,), corpus=corpus, repeat=1)
+
+
+def test_suite_times_every_stage():
+    report = small_suite()
+
+    assert {row["stage"] for row in report["results"]} == set(STAGES)
+    assert all(row["seconds"] > 0 and row["peak_mb"] >= 0 for row in report["results"])
+    assert "evaluate" in format_results(report)
+
+
+def test_saved_report_compares_against_itself(tmp_path):
+    report = small_suite()
+    save_results(report, tmp_path / "baseline.json")
+    baseline = load_results(tmp_path / "baseline.json")
+
+    assert compare_results(baseline, baseline).empty
+
+    slower = load_results(tmp_path / "baseline.json")
+    slower["results"][0]["seconds"] *= 2
+    regressions = compare_results(baseline, slower)
+    assert len(regressions) == 1
+    assert regressions["slowdown"].iloc[0] == 2
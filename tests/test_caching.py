@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+import caching
+from caching import IndicatorCache, dataset_key, default_indicator_cache, invalidate_dataset
+from strategy_compiler import clear_strategy_cache, compile_strategy
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    clear_strategy_cache()
+    default_indicator_cache.clear()
+    yield
+    clear_strategy_cache()
+    default_indicator_cache.clear()
+
+
+def test_strategies_on_one_frame_share_indicator_results(ohlcv):
+    compile_strategy("ENTRY: close > SMA(close,20)\nEXIT: close < SMA(close,10)")(ohlcv)
+    misses = default_indicator_cache.misses
+    assert default_indicator_cache.hits == 0 and misses == 2
+
+    compile_strategy("ENTRY: SMA(close,20) > SMA(close,10)\nEXIT: close < close[1]")(ohlcv)
+
+    assert default_indicator_cache.hits == 2
+    assert default_indicator_cache.misses == misses
+
+
+def test_other_frames_and_lags_are_separate_entries(ohlcv):
+    compile_strategy("ENTRY: close > SMA(close,20)\nEXIT: close < SMA(close[1],20)")(ohlcv)
+    compile_strategy("ENTRY: close > SMA(close,20)\nEXIT: close < SMA(close[1],20)")(ohlcv.copy())
+
+    assert default_indicator_cache.hits == 0
+    assert len(default_indicator_cache) == 4
+
+
+def test_invalidate_dataset_forces_a_recompute(ohlcv):
+    dsl = "ENTRY: close > SMA(close,5)\nEXIT: close < SMA(close,5)"
+    before = compile_strategy(dsl)(ohlcv)
+
+    ohlcv.loc[ohlcv.index[100:], "close"] *= 2
+    compile_strategy(dsl)(ohlcv)                   # the edit was not announced: stale hit
+    assert (default_indicator_cache.hits, default_indicator_cache.misses) == (1, 1)
+
+    invalidate_dataset(ohlcv)
+    after = compile_strategy(dsl)(ohlcv)
+
+    assert (default_indicator_cache.hits, default_indicator_cache.misses) == (1, 2)
+    assert not after.equals(before)
+    pd.testing.assert_frame_equal(after, compile_strategy(dsl)(ohlcv.copy()))
+
+
+def test_dataset_key_is_stable_until_invalidated_and_dropped_with_the_frame(ohlcv):
+    key = dataset_key(ohlcv)
+    assert dataset_key(ohlcv) == key
+
+    invalidate_dataset(ohlcv)
+    assert dataset_key(ohlcv) == (key[0], key[1] + 1)
+
+    frame = ohlcv.copy()
+    token = dataset_key(frame)[0]
+    del frame
+    assert token not in caching._dataset_versions
+
+
+def test_cache_evicts_least_recently_used():
+    cache = IndicatorCache(maxsize=2)
+    frame = pd.DataFrame({"close": [1.0, 2.0]})
+    for period in (1, 2, 1, 3):
+        cache.get_or_compute(frame, "SMA", "close", 0, period, lambda: period)
+
+    assert len(cache) == 2
+    assert cache.info()["hits"] == 1
+    assert cache.get(dataset_key(frame) + ("close", 0, "SMA", 2)) is None
@@ -0,0 +1,99 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import backtest_signals
+from conftest import STRATEGIES, assert_same_backtest, random_ohlcv
+from datastore import convert_csv, open_dataset, write_frame
+from stream_backtest import MemorySink, backtest_stream
+from strategy_compiler import compile_strategy
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.csv")
+
+
+def test_round_trip(tmp_path, ohlcv):
+    write_frame(ohlcv, tmp_path / "bars")
+    frame = open_dataset(tmp_path / "bars").to_frame()
+    pd.testing.assert_frame_equal(frame, ohlcv, check_freq=False, check_index_type=False, check_names=False)
+    np.testing.assert_array_equal(open_dataset(tmp_path / "bars")["close"], ohlcv["close"])
+
+
+def test_convert_csv_in_chunks(tmp_path):
+    dataset = convert_csv(SAMPLE_CSV, tmp_path / "sample", dayfirst=True, chunksize=3)
+
+    expected = pd.read_csv(SAMPLE_CSV)
+    expected.index = pd.DatetimeIndex(pd.to_datetime(expected.pop("date"), dayfirst=True), name="date")
+    pd.testing.assert_frame_equal(dataset.to_frame(), expected, check_dtype=False, check_freq=False,
+                                  check_index_type=False)
+    assert dataset.meta["columns"]["close"] == "float64"
+    assert dataset.meta["columns"]["volume"] == "int64"
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2020-03-01", "2020-03-31"),
+    ("2020-02-15", "2020-04-01 00:00"),
+    (None, "2020-01-10"),
+    ("2021-05-01", None),
+    ("2020-05-10", "2020-05-01"),
+])
+def test_daily_between_matches_loc(tmp_path, ohlcv, start, end):
+    dataset = write_frame(ohlcv, tmp_path / "bars")
+    pd.testing.assert_frame_equal(dataset.between(start, end).to_frame(), ohlcv.loc[start:end],
+                                  check_freq=False, check_index_type=False, check_names=False)
+
+
+def test_strategies_and_backtests_take_a_dataset(tmp_path, ohlcv):
+    # as the store keeps it (no freq is stored)
+    ohlcv.index = pd.DatetimeIndex(ohlcv.index.as_unit("ns"), name="date", freq=None)
+    dataset = write_frame(ohlcv, tmp_path / "bars")
+    signals = compile_strategy(STRATEGIES[1])(dataset)
+    pd.testing.assert_frame_equal(signals, compile_strategy(STRATEGIES[1])(ohlcv), check_freq=False)
+
+    expected = backtest_signals(ohlcv, signals)
+    assert_same_backtest(backtest_signals(dataset, signals), expected)
+
+    sink = MemorySink()
+    summary = backtest_stream(dataset.chunks(64), STRATEGIES[1], sink)
+    assert summary["num_trades"] == expected["num_trades"]
+    assert summary["final_capital"] == pytest.approx(expected["final_capital"], rel=1e-12)
+
+
+@pytest.fixture(params=[None, "America/New_York"])
+def intraday(request, tmp_path):
+    df = random_ohlcv(24 * 90, seed=5, start="2021-02-20", freq="h")
+    df.index = df.index.as_unit("ns").rename("date")    # as the store names and keeps it
+    if request.param:
+        df.index = df.index.tz_localize("UTC").tz_convert(request.param)
+    write_frame(df, tmp_path / "bars")
+    return df, open_dataset(tmp_path / "bars")
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2021-03-01", "2021-03-05"),
+    ("2021-03-01 10:00", "2021-03-05 13:00"),
+    ("2021-03-01 10:30", "2021-03-05 13:30"),
+    ("2021-03", "2021-04"),
+    (None, "2021-03-15"),
+    ("2021-04-30", None),
+    ("2021-05-10", "2021-05-01"),
+])
+def test_between_matches_loc(intraday, start, end):
+    df, dataset = intraday
+    pd.testing.assert_frame_equal(dataset.between(start, end).to_frame(), df.loc[start:end], check_freq=False)
+
+
+def test_date_end_covers_the_whole_day(intraday):
+    df, dataset = intraday
+    frame = dataset.between(datetime.date(2021, 3, 1), datetime.date(2021, 3, 5)).to_frame()
+    assert len(frame) == 5 * 24
+    assert frame.index[-1].hour == 23
+
+
+def test_timestamp_end_is_exact(intraday):
+    df, dataset = intraday
+    end = pd.Timestamp("2021-03-05 12:00", tz=df.index.tz)
+    frame = dataset.between(end=end).to_frame()
+    assert frame.index[-1] == end
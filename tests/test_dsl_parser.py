@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import dsl_parser
+from strategy_compiler import clear_strategy_cache, parse_dsl_to_ast, strategy_cache_info
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(code):
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                            env={**os.environ, "DSL_PARSER_CACHE": ""})
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def test_module_attribute_is_the_lazily_built_parser():
+    from dsl_parser import dsl_parser as parser
+
+    assert parser is dsl_parser.get_parser()
+    assert parser.parse("ENTRY: close > SMA(close,20)").data == "start"
+    with pytest.raises(AttributeError, match="no attribute 'parser'"):
+        dsl_parser.parser
+
+
+def test_importing_the_compiler_loads_neither_lark_nor_pandas():
+    loaded = run_python("import sys, strategy_compiler; "
+                        "print(sorted({'lark', 'pandas', 'numpy'} & set(sys.modules)))")
+    assert loaded == "[]"
+
+
+def test_first_parse_builds_the_parser():
+    assert run_python("import sys, dsl_parser; assert 'lark' not in sys.modules; "
+                      "from dsl_parser import dsl_parser; print(type(dsl_parser).__name__)") == "Lark"
+
+
+def test_parse_is_memoized_on_normalized_text():
+    clear_strategy_cache()
+    first = parse_dsl_to_ast("ENTRY: close > SMA(close,20)\nEXIT: close < SMA(close,20)")
+    again = parse_dsl_to_ast("ENTRY:  close > SMA(close,20)   EXIT: close < SMA(close,20)")
+
+    assert again is first
+    assert strategy_cache_info()["parse"]["hits"] == 1
+    clear_strategy_cache()
+    assert strategy_cache_info()["parse"]["size"] == 0
+    assert parse_dsl_to_ast("ENTRY: close > SMA(close,20)\nEXIT: close < SMA(close,20)") == first
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import kernels
+from conftest import flat_ticks, random_ohlcv
+from indicators import ATR, EMA, MACD, ROC, ROC_array, RSI, SMA
+
+# Wilder's RSI worked example as published by StockCharts: closes and
+# RSI(14) to two decimals, the first value on the 15th close.  The table
+# rounds its running averages to two decimals, which moves the RSI by up
+# to ~0.07 (unrounded, the first value is 70.46).
+WILDER_CLOSES = [
+    44.34, 44.09, 44.15, 43.61, 44.33, 44.83, 45.10, 45.42, 45.84, 46.08, 45.89, 46.03, 45.61,
+    46.28, 46.28, 46.00, 46.03, 46.41, 46.22, 45.64, 46.21, 46.25, 45.71, 46.45, 45.78, 45.35,
+    44.03, 44.18, 44.22, 44.57, 43.42, 42.66, 43.13,
+]
+WILDER_RSI = [
+    70.53, 66.32, 66.55, 69.41, 66.36, 57.97, 62.93, 63.26, 56.06, 62.38, 54.71, 50.42, 39.99,
+    41.46, 41.87, 45.46, 37.30, 33.08, 37.77,
+]
+
+
+def reference_rsi(closes, period):
+    """Textbook per-bar Wilder RSI: simple-mean seed, then avg = (avg * (period - 1) + x) / period."""
+    out = [np.nan] * len(closes)
+    gains = [max(b - a, 0.0) for a, b in zip(closes, closes[1:])]
+    losses = [max(a - b, 0.0) for a, b in zip(closes, closes[1:])]
+    avg_gain, avg_loss = sum(gains[:period]) / period, sum(losses[:period]) / period
+    for i in range(period, len(closes)):
+        if i > period:
+            avg_gain = (avg_gain * (period - 1) + gains[i - 1]) / period
+            avg_loss = (avg_loss * (period - 1) + losses[i - 1]) / period
+        out[i] = 100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.array(out)
+
+
+def test_rsi_matches_wilders_worked_example():
+    rsi = RSI(pd.Series(WILDER_CLOSES), 14)
+
+    assert rsi.iloc[:14].isna().all()
+    assert rsi.iloc[14] == pytest.approx(70.4641, abs=1e-4)
+    np.testing.assert_allclose(rsi.iloc[14:], WILDER_RSI, atol=0.08)
+    np.testing.assert_allclose(rsi, reference_rsi(WILDER_CLOSES, 14), rtol=1e-12)
+
+
+@pytest.mark.parametrize("period", [2, 7, 14, 30])
+def test_rsi_matches_the_per_bar_reference(period):
+    closes = random_ohlcv(400, seed=period)["close"]
+    np.testing.assert_allclose(RSI(closes, period), reference_rsi(list(closes), period), rtol=1e-10)
+
+
+@pytest.fixture
+def gappy_close():
+    close = random_ohlcv(2000, seed=4)["close"].copy()
+    close.iloc[[0, 3, 40, 41, 42, 777, 1999]] = np.nan
+    return close
+
+
+@pytest.mark.parametrize("indicator, args", [
+    (EMA, (10,)), (RSI, (14,)), (MACD, (12, 26, 9)),
+])
+def test_loop_kernel_matches_the_pandas_fallback(monkeypatch, gappy_close, indicator, args):
+    monkeypatch.setattr(kernels, "numba", None)
+    fallback = indicator(gappy_close, *args)
+    # with numba installed this runs the compiled loop, otherwise the same loop in Python
+    monkeypatch.setattr(kernels, "numba", kernels.numba or object())
+    looped = indicator(gappy_close, *args)
+
+    np.testing.assert_array_equal(looped.to_numpy(), fallback.to_numpy())
+
+
+@pytest.mark.parametrize("period", [1, 2, 20, 200])
+def test_rolling_mean_loop_matches_pandas(gappy_close, period):
+    flat = flat_ticks(20_000)["close"].to_numpy()
+    for values in (gappy_close.to_numpy(), flat, -flat):
+        expected = pd.Series(values).rolling(period).mean().to_numpy()
+        np.testing.assert_array_equal(kernels.RollingMean(period).process(values), expected)
+
+
+def test_kernels_resume_across_blocks(gappy_close):
+    values = gappy_close.to_numpy()
+    kernel = kernels.RSIKernel(14)
+    blocks = np.concatenate([kernel.process(values[start:start + 37]) for start in range(0, len(values), 37)])
+
+    np.testing.assert_array_equal(blocks, kernels.rsi(values, 14))
+
+    kernel = kernels.RollingMean(20)
+    blocks = np.concatenate([kernel.process(values[start:start + 37]) for start in range(0, len(values), 37)])
+    np.testing.assert_array_equal(blocks, SMA(gappy_close, 20).to_numpy())
+
+
+@pytest.mark.parametrize("name, compute, warmup", [
+    ("RSI", lambda df: RSI(df["close"], 14), 14),
+    ("EMA", lambda df: EMA(df["close"], 10), 9),
+    ("ATR", lambda df: ATR(df["close"], 14, df["high"], df["low"]), 13),
+    ("MACD line", lambda df: MACD(df["close"], 12, 26), 25),
+    ("MACD histogram", lambda df: MACD(df["close"], 12, 26, 9), 25 + 8),
+])
+def test_warm_up_length(ohlcv, name, compute, warmup):
+    values = compute(ohlcv)
+
+    assert values.iloc[:warmup].isna().all(), name
+    assert values.iloc[warmup:].notna().all(), name
+
+
+def test_roc_is_the_percent_change_and_skips_zero_bases():
+    series = pd.Series([10.0, 0.0, 12.0, 15.0, 0.0, 3.0])
+
+    # bar 3 compares 15 with a base of 0
+    np.testing.assert_allclose(ROC(series, 2), [np.nan, np.nan, 20.0, np.nan, -100.0, -80.0])
+    np.testing.assert_array_equal(ROC_array(series.to_numpy(), 2), ROC(series, 2).to_numpy())
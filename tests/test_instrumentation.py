@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+import instrumentation
+from backtest import backtest_signals
+from caching import IndicatorCache
+from instrumentation import add_hook, instrumented, remove_hook, stage
+from strategy_compiler import clear_strategy_cache, compile_strategy
+
+
+@pytest.fixture(autouse=True)
+def empty_strategy_cache():
+    clear_strategy_cache()
+    yield
+    clear_strategy_cache()
+
+
+def test_indicator_cache_hits_are_counted_across_strategies(ohlcv):
+    cache = IndicatorCache()
+    with instrumented() as metrics:
+        compile_strategy("ENTRY: close > SMA(close,20)\nEXIT: RSI(close,14) > 70")(ohlcv, cache)
+        assert metrics.counters["indicator_cache.misses"] == 2
+        assert "indicator_cache.hits" not in metrics.counters
+
+        compile_strategy("ENTRY: SMA(close,20) > close[1]\nEXIT: RSI(close,14) < 30")(ohlcv, cache)
+
+    assert metrics.counters["indicator_cache.hits"] == 2
+    assert metrics.counters["indicator_cache.misses"] == 2
+    assert metrics.stages["indicator.SMA"]["calls"] == 1
+    assert metrics.stages["evaluate"]["calls"] == 2
+    assert metrics.stages["evaluate"]["rows"] == 2 * len(ohlcv)
+
+
+def test_pipeline_stages_are_recorded(ohlcv):
+    with instrumented() as metrics:
+        strategy = compile_strategy("ENTRY: close > SMA(close,20)\nEXIT: close < SMA(close,20)")
+        backtest_signals(ohlcv, strategy(ohlcv, IndicatorCache()))
+
+    assert {"parse", "transform", "codegen", "evaluate", "backtest"} <= set(metrics.stages)
+    assert metrics.stages["backtest"]["rows"] == len(ohlcv)
+    assert list(metrics.to_frame().columns) == ["calls", "seconds", "rows", "rows_per_sec"]
+    assert json.loads(metrics.to_json())["counters"] == metrics.counters
+
+
+def test_nothing_is_recorded_while_disabled(ohlcv):
+    assert instrumentation.active_metrics() is None
+    assert stage("anything") is stage("other")
+
+    with instrumented() as metrics:
+        pass
+    compile_strategy("ENTRY: close > SMA(close,20)")(ohlcv)
+    assert metrics.stages == {} and metrics.counters == {}
+
+
+def test_hooks_see_every_stage_without_metrics(ohlcv):
+    seen = []
+    hook = add_hook(lambda name, seconds, rows: seen.append((name, rows)))
+    try:
+        compile_strategy("ENTRY: close > SMA(close,20)")(ohlcv, IndicatorCache())
+    finally:
+        remove_hook(hook)
+
+    assert ("evaluate", len(ohlcv)) in seen
+    assert instrumentation.active_metrics() is None
@@ -0,0 +1,85 @@
+import asyncio
+import os
+
+import pandas as pd
+import pytest
+
+from backtest import backtest_signals
+from conftest import STRATEGIES, random_ohlcv
+from datastore import write_frame
+from job_service import JobService, run_job
+from strategy_compiler import compile_strategy
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def submit_all(df, texts, processes):
+    async with JobService(workers=2, processes=processes) as service:
+        service.add_dataset("bars", df)
+        jobs = [await service.submit(text, "bars", commission=1.0) for text in texts]
+        for job in jobs:
+            await job
+    return jobs
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_jobs_match_backtest_signals(ohlcv, processes):
+    jobs = run(submit_all(ohlcv, STRATEGIES[:2], processes))
+    for job, dsl in zip(jobs, STRATEGIES):
+        expected = backtest_signals(ohlcv, compile_strategy(dsl)(ohlcv), commission=1.0)
+        assert job.status == "done" and job.error is None
+        assert job.result["bars"] == len(ohlcv)
+        for name in ("final_capital", "total_return_pct", "max_drawdown_pct", "num_trades"):
+            assert job.result[name] == pytest.approx(expected[name], rel=1e-12), name
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_bad_dsl_fails_the_job_with_its_error(ohlcv, processes):
+    jobs = run(submit_all(ohlcv, ["ENTRY: close >", STRATEGIES[0]], processes))
+    assert jobs[0].status == "failed" and jobs[0].result is None
+    assert jobs[0].error.startswith("UnexpectedToken: ") and "cannot pickle" not in jobs[0].error
+    assert jobs[1].status == "done"
+
+
+def test_run_job_wraps_errors(tmp_path, ohlcv):
+    write_frame(ohlcv, tmp_path / "bars")
+    with pytest.raises(RuntimeError, match="^UnexpectedToken: "):
+        run_job("ENTRY: close >", str(tmp_path / "bars"))
+
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.csv")
+WEEKLY = "ENTRY: close@1W > SMA(close@1W,2)\nEXIT: close < SMA(close,3)"
+
+
+def test_csv_dates_are_parsed():
+    # sample.csv is dd-mm-yyyy: 01-01-2023 .. 10-01-2023
+    df = pd.read_csv(SAMPLE, index_col=0)
+    df.index = pd.to_datetime(df.index, dayfirst=True)
+    dsl = "ENTRY: close > SMA(close,2)\nEXIT: close < SMA(close,2)"
+
+    result = run_job(dsl, SAMPLE, start="2023-01-02", end="2023-01-05", dayfirst=True)
+    window = df.loc["2023-01-02":"2023-01-05"]
+    assert result["bars"] == len(window) == 4
+    assert result["final_capital"] == backtest_signals(window, compile_strategy(dsl)(window))["final_capital"]
+
+    assert run_job(WEEKLY, SAMPLE, dayfirst=True)["bars"] == 10
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_add_csv_serves_date_ranges(tmp_path, processes):
+    df = random_ohlcv(300, seed=6)
+    df.rename_axis("date").to_csv(tmp_path / "bars.csv", date_format="%d/%m/%Y")
+    expected_frame = df.loc["2020-03-01":"2020-06-30"]
+    expected = backtest_signals(expected_frame, compile_strategy(WEEKLY)(expected_frame))
+
+    async def submit():
+        async with JobService(workers=2, processes=processes) as service:
+            service.add_csv("bars", tmp_path / "bars.csv", dayfirst=True)
+            return await service.submit(WEEKLY, "bars", start="2020-03-01", end="2020-06-30")
+
+    job = run(submit())
+    assert job.status == "done", job.error
+    assert job.result["bars"] == len(expected_frame)
+    assert job.result["final_capital"] == pytest.approx(expected["final_capital"], rel=1e-12)
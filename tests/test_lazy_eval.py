@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from caching import IndicatorCache
+from conftest import STRATEGIES, random_ohlcv
+from instrumentation import instrumented
+from lazy_eval import LazyStrategy, compile_lazy
+from strategy_compiler import compile_strategy
+
+EXTRA_STRATEGIES = [
+    # a filter that is never true: the RSI behind it is dead
+    "ENTRY: close > 1000000 AND RSI(close,14) < 30\nEXIT: close < 0 OR SMA(close,5) > SMA(close,20)",
+    "ENTRY: close@1W > SMA(close@1W,4) AND close > open\nEXIT: close < SMA(close,10)",
+    "ENTRY: close > SMA(close,20)\nSTOP_LOSS: 5%",
+]
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("dsl", STRATEGIES + EXTRA_STRATEGIES)
+def test_lazy_matches_compiled(dsl, seed):
+    df = random_ohlcv(600, seed=seed)
+    expected = compile_strategy(dsl)(df, IndicatorCache())
+    signals = compile_lazy(dsl)(df, IndicatorCache())
+    pd.testing.assert_frame_equal(signals, expected)
+    assert signals.attrs == expected.attrs
+
+
+@pytest.mark.parametrize("dsl", STRATEGIES + EXTRA_STRATEGIES[:2])
+def test_lazy_numpy_matches_compiled_numpy(dsl, ohlcv):
+    expected = compile_strategy(dsl, backend="numpy")(ohlcv, IndicatorCache())
+    entry, exit = compile_lazy(dsl, backend="numpy")(ohlcv, IndicatorCache())
+    np.testing.assert_array_equal(entry, expected[0])
+    np.testing.assert_array_equal(exit, expected[1])
+
+
+def test_dead_branch_indicator_is_not_computed(ohlcv):
+    with instrumented() as metrics:
+        signals = compile_lazy(EXTRA_STRATEGIES[0])(ohlcv, IndicatorCache())
+    assert not signals["entry"].any()
+    computed = {name for name in metrics.stages if name.startswith("indicator.")}
+    assert computed == {"indicator.SMA"}
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown backend"):
+        LazyStrategy(compile_strategy(STRATEGIES[0]).ast, backend="cuda")
@@ -0,0 +1,72 @@
+import pytest
+
+from demo import json_to_dsl
+from nl_parser import clear_nl_cache, nl_to_json_rules, nl_to_json_rules_batch, parse_one_condition
+from strategy_compiler import compile_strategy
+
+
+@pytest.mark.parametrize("text, rule", [
+    ("the close is above the 20-day moving average", {"left": "close", "operator": ">", "right": "SMA(close,20)"}),
+    ("volume is above 1 million", {"left": "volume", "operator": ">", "right": 1000000}),
+    ("price crosses above yesterday's high", {"left": "close", "operator": "crosses_above", "right": "high[1]"}),
+    ("RSI(14) is below 30", {"left": "RSI(close,14)", "operator": "<", "right": 30}),
+    ("the close is at least 100", {"left": "close", "operator": ">=", "right": 100}),
+    ("the close is below -5", {"left": "close", "operator": "<", "right": -5}),
+    ("RSI(7) is above -2.5", {"left": "RSI(close,7)", "operator": ">", "right": -2.5}),
+    ("volume increases by more than 30 percent compared to last week",
+     {"left": "ROC(volume,7)", "operator": ">", "right": 30}),
+])
+def test_conditions(text, rule):
+    assert parse_one_condition(text) == rule
+
+
+@pytest.mark.parametrize("text", [
+    "the close is at least 2.5 percent below the ma",
+    "price is 3% above the 50-day moving average",
+])
+def test_percentage_offsets_are_rejected(text):
+    # the DSL has no arithmetic for SMA(close,20) * 0.975
+    assert parse_one_condition(text) is None
+
+
+def test_exit_sentence_with_offset_yields_no_rule():
+    assert nl_to_json_rules("Exit when the close is at least 2.5 percent below the ma") == {"entry": [], "exit": []}
+
+
+def test_clauses_and_sections():
+    rules = nl_to_json_rules("Buy when the close price is above the 20-day moving average and volume is above 1 million.")
+    assert rules == {"entry": [{"left": "close", "operator": ">", "right": "SMA(close,20)"},
+                               {"left": "volume", "operator": ">", "right": 1000000}], "exit": []}
+    assert nl_to_json_rules("Exit when RSI(14) is below 30")["exit"] == [
+        {"left": "RSI(close,14)", "operator": "<", "right": 30}]
+
+
+def test_batch_matches_single_calls():
+    texts = ["Buy when the close is above 100", "Exit when RSI is overbought", "buy when  the close is above 100"]
+    clear_nl_cache()
+    assert nl_to_json_rules_batch(texts) == [nl_to_json_rules(text) for text in texts]
+
+
+# every rule the parser produces must compile, with its numbers' signs intact
+CORPUS = [
+    ("Buy when close is below -5", {"entry": [("close", "<", -5)], "exit": []}),
+    ("Buy when the close is above the 20-day moving average and volume is above 1 million",
+     {"entry": [("close", ">", "SMA(close,20)"), ("volume", ">", 1000000)], "exit": []}),
+    ("Buy when the 50-day moving average is above -0.75", {"entry": [("SMA(close,50)", ">", -0.75)], "exit": []}),
+    ("Sell when the close is at least -1.5 million", {"entry": [], "exit": [("close", ">=", -1500000)]}),
+    ("Exit when RSI(14) is below 30", {"entry": [], "exit": [("RSI(close,14)", "<", 30)]}),
+    ("Buy when price crosses above yesterday's high", {"entry": [("close", "crosses_above", "high[1]")], "exit": []}),
+    ("Buy when volume increases by more than 30 percent compared to last week",
+     {"entry": [("ROC(volume,7)", ">", 30)], "exit": []}),
+]
+
+
+@pytest.mark.parametrize("text, expected", CORPUS)
+def test_corpus_rules_compile_with_their_signs(ohlcv, text, expected):
+    rules = nl_to_json_rules(text)
+    for section in ("entry", "exit"):
+        assert [(r["left"], r["operator"], r["right"]) for r in rules[section]] == expected[section]
+
+    for rule in rules["entry"] + rules["exit"]:
+        signals = compile_strategy(json_to_dsl({"entry": [rule], "exit": []}))(ohlcv)
+        assert list(signals.columns) == ["entry", "exit"]
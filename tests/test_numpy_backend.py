@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import backtest_signals
+from caching import IndicatorCache
+from conftest import STRATEGIES, TIE_STRATEGY, assert_same_backtest, flat_ticks, random_ohlcv
+from strategy_compiler import compile_strategy
+
+TIMEFRAME_STRATEGY = "ENTRY: close@1W > SMA(close@1W,4)\nEXIT: close < SMA(close,10)"
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("dsl", STRATEGIES + [TIMEFRAME_STRATEGY])
+def test_numpy_backend_matches_pandas(dsl, seed):
+    df = random_ohlcv(800, seed=seed)
+    expected = compile_strategy(dsl)(df, IndicatorCache())
+    entry, exit = compile_strategy(dsl, backend="numpy")(df, IndicatorCache())
+    assert entry.dtype == bool and exit.dtype == bool
+    np.testing.assert_array_equal(entry, expected["entry"].to_numpy())
+    np.testing.assert_array_equal(exit, expected["exit"].to_numpy())
+
+
+def test_numpy_backend_matches_pandas_on_flat_cent_prices():
+    # 20k bars of mostly unchanged cent prices: the SMA must land on exactly
+    # pandas' side of every `close == SMA` tie
+    df = flat_ticks(20_000)
+    expected = compile_strategy(TIE_STRATEGY)(df, IndicatorCache())
+    entry, exit = compile_strategy(TIE_STRATEGY, backend="numpy")(df, IndicatorCache())
+    np.testing.assert_array_equal(entry, expected["entry"].to_numpy())
+    np.testing.assert_array_equal(exit, expected["exit"].to_numpy())
+
+
+def test_numpy_signals_backtest_the_same(ohlcv):
+    dsl = STRATEGIES[1]
+    expected = backtest_signals(ohlcv, compile_strategy(dsl)(ohlcv))
+    entry, exit = compile_strategy(dsl, backend="numpy")(ohlcv)
+    signals = pd.DataFrame({"entry": entry, "exit": exit}, index=ohlcv.index)
+    assert_same_backtest(backtest_signals(ohlcv, signals), expected)
+
+
+def test_empty_exit_section(ohlcv):
+    entry, exit = compile_strategy("ENTRY: close > SMA(close,20)", backend="numpy")(ohlcv)
+    assert exit.shape == (len(ohlcv),) and not exit.any()
+    assert entry.any()
+
+
+def test_generated_code_does_not_use_pandas():
+    strategy = compile_strategy(STRATEGIES[3], backend="numpy")
+    assert "pd." not in strategy.source
+    assert strategy is compile_strategy(STRATEGIES[3], backend="numpy")
+    assert strategy is not compile_strategy(STRATEGIES[3])
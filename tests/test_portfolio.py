@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import backtest_signals
+from conftest import STRATEGIES, random_ohlcv, random_signals
+from portfolio import align_panel, backtest_portfolio, panel_signals, run_portfolio
+
+SYMBOLS = ["A", "B", "C", "D", "E"]
+
+
+@pytest.fixture
+def frames():
+    return {symbol: random_ohlcv(300, seed=k) for k, symbol in enumerate(SYMBOLS)}
+
+
+def random_panel(frames, seed=0, density=0.08):
+    panel = align_panel(frames)
+    index = panel["close"].index
+    entries = pd.DataFrame({symbol: random_signals(index, seed=seed + k, density=density)["entry"]
+                            for k, symbol in enumerate(frames)})
+    exits = pd.DataFrame({symbol: random_signals(index, seed=seed + k, density=density)["exit"]
+                          for k, symbol in enumerate(frames)})
+    return panel, entries, exits
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_single_symbol_all_in_fills_like_backtest_signals(ohlcv, seed):
+    signals = random_signals(ohlcv.index, seed=seed)
+    expected = backtest_signals(ohlcv, signals, slippage=0.01, commission=1.0)["trades"]
+    result = backtest_portfolio(ohlcv[["open"]], ohlcv[["close"]], signals[["entry"]], signals[["exit"]],
+                                sizing="cash", slippage=0.01, commission=1.0)
+
+    trades = result["trades"]
+    assert len(trades) == len(expected)
+    for field in ("entry_index", "entry_fill_index", "exit_index", "exit_fill_index"):
+        assert list(trades[field]) == [pd.Timestamp(trade[field]) for trade in expected], field
+    for field in ("entry_price", "exit_price"):
+        np.testing.assert_allclose(trades[field], [trade[field] for trade in expected], rtol=1e-12,
+                                   err_msg=field)
+    # all-in: the first position spends the whole balance, less its commission
+    assert trades["shares"].iloc[0] * trades["entry_price"].iloc[0] == pytest.approx(100000.0 - 1.0)
+
+
+@pytest.mark.parametrize("sizing", ["equal", "cash"])
+def test_cash_and_slots_are_respected(frames, sizing):
+    panel, entries, exits = random_panel(frames, seed=3)
+    result = backtest_portfolio(panel["open"], panel["close"], entries, exits, sizing=sizing,
+                                max_positions=2, commission=1.0)
+
+    assert (result["holdings"].gt(0).sum(axis=1) <= 2).all()
+    assert (result["cash"] >= -1e-6).all()
+    assert result["final_capital"] == pytest.approx(100000.0 + result["trades"]["pnl"].sum(), rel=1e-12)
+    assert result["num_trades"] > 0
+
+
+def test_run_portfolio_evaluates_the_strategy_per_symbol(frames):
+    result = run_portfolio(STRATEGIES[0], frames, max_positions=3)
+
+    panel = align_panel(frames)
+    entries, exits = panel_signals(STRATEGIES[0], frames, panel["close"].index)
+    expected = backtest_portfolio(panel["open"], panel["close"], entries, exits, max_positions=3)
+    pd.testing.assert_frame_equal(result["trades"], expected["trades"])
+    assert set(result["trades"]["symbol"]) <= set(SYMBOLS)
+
+
+def test_shape_mismatch(frames):
+    panel, entries, exits = random_panel(frames)
+    with pytest.raises(ValueError, match="same shape"):
+        backtest_portfolio(panel["open"], panel["close"], entries.iloc[:-1], exits)
+
+
+def test_unknown_sizing_rule(frames):
+    panel, entries, exits = random_panel(frames)
+    with pytest.raises(ValueError, match="Unknown sizing rule"):
+        backtest_portfolio(panel["open"], panel["close"], entries, exits, sizing="kelly")
+
+
+def test_skipped_entry_waits_for_next_entry():
+    # A holds the only slot on bars 1-5; B signals ENTRY on bars 1-11 and
+    # must enter once the slot is free instead of being stuck as "wanted"
+    n = 15
+    index = pd.date_range("2021-01-01", periods=n, freq="D")
+    prices = pd.DataFrame({"A": np.full(n, 10.0), "B": np.full(n, 20.0)}, index=index)
+    entries = pd.DataFrame(False, index=index, columns=["A", "B"])
+    exits = entries.copy()
+    entries.loc[index[0], "A"] = True
+    exits.loc[index[4], "A"] = True
+    entries.loc[index[1:12], "B"] = True
+
+    result = backtest_portfolio(prices, prices, entries, exits, max_positions=1)
+    trades = result["trades"]
+
+    assert list(trades["symbol"]) == ["A", "B"]
+    b = trades.iloc[1]
+    # A's EXIT on bar 4 and B's ENTRY on bar 4 both fill at bar 5's open,
+    # exits first, so B takes the freed slot there
+    assert b["entry_index"] == index[4]
+    assert b["entry_fill_index"] == index[5]
+    assert b["exit_index"] == index[-1]          # forced close
+    assert result["holdings"]["B"].iloc[5:].gt(0).all()
+    assert result["holdings"]["B"].iloc[:5].eq(0).all()
+
+
+def test_unfunded_entry_does_not_block_later_entries():
+    # no cash for B's first entry (A took it all); B's later ENTRY after A's exit fills
+    n = 10
+    index = pd.date_range("2021-01-01", periods=n, freq="D")
+    prices = pd.DataFrame({"A": np.full(n, 10.0), "B": np.full(n, 20.0)}, index=index)
+    entries = pd.DataFrame(False, index=index, columns=["A", "B"])
+    exits = entries.copy()
+    entries.loc[index[0], "A"] = True
+    entries.loc[index[1], "B"] = True
+    exits.loc[index[3], "A"] = True
+    entries.loc[index[6], "B"] = True
+
+    result = backtest_portfolio(prices, prices, entries, exits, sizing="cash")
+    trades = result["trades"]
+    assert list(trades["symbol"]) == ["A", "B"]
+    assert trades.iloc[1]["entry_index"] == index[6]
+
+
+def reference_portfolio(opens, closes, entries, exits, initial_capital=100000.0, sizing="equal",
+                        max_positions=None, slippage=0.0, commission=0.0):
+    """backtest_portfolio's rules as a plain loop over every bar and symbol."""
+    from portfolio import SIZING_RULES
+
+    rule = SIZING_RULES[sizing]
+    marks = closes.ffill().to_numpy(dtype=float)
+    open_prices = opens.to_numpy(dtype=float)
+    open_prices = np.where(np.isnan(open_prices), marks, open_prices)
+    entries, exits = np.asarray(entries), np.asarray(exits)
+    n, m = marks.shape
+    slots = max_positions or m
+
+    cash, shares = initial_capital, np.zeros(m)
+    entry, trades = {}, []                               # symbol → (bar, price, shares) while held
+    bar_cash, holdings = np.full(n, initial_capital), np.zeros((n, m))
+    for bar in range(n):
+        # next bar's open (the last close for the last bar's signals); NaN before a symbol's first bar
+        fill = min(bar + 1, n - 1)
+        prices = marks[-1] if bar == n - 1 else open_prices[fill]
+        sold = set()
+        for col in range(m):
+            if shares[col] > 0 and exits[bar, col]:
+                price = prices[col] - slippage
+                cash += shares[col] * price - commission
+                trades.append((col, *entry.pop(col), bar, fill, price))
+                shares[col] = 0.0
+                sold.add(col)
+
+        # a symbol that exits on this bar checks its ENTRY from the next bar on
+        wanted = [col for col in range(m) if shares[col] == 0 and entries[bar, col] and col not in sold]
+        buy = [col for col in wanted if prices[col] + slippage > 0][:max(slots - np.count_nonzero(shares), 0)]
+        if buy:
+            equity = cash + sum(shares[col] * np.nan_to_num(prices[col]) for col in range(m) if shares[col])
+            budgets = np.clip(np.broadcast_to(np.asarray(rule(cash, equity, len(buy), slots), dtype=float),
+                                              (len(buy),)), 0.0, None)
+            free = cash - commission * len(buy)
+            if budgets.sum() > free and budgets.sum() > 0:
+                budgets = budgets * (max(free, 0.0) / budgets.sum())
+            funded = [(col, budget) for col, budget in zip(buy, budgets) if budget > 0]
+            for col, budget in funded:
+                price = prices[col] + slippage
+                shares[col] = budget / price
+                entry[col] = (bar, price, shares[col])
+                cash -= budget
+            cash -= commission * len(funded)
+        if sold or buy:
+            bar_cash[fill:] = cash
+            holdings[fill:] = shares
+
+    equity = bar_cash + (holdings * np.nan_to_num(marks)).sum(axis=1)
+    for col in sorted(entry, key=lambda col: entry[col][0]):
+        price = np.nan_to_num(marks[-1, col]) - slippage
+        cash += shares[col] * price - commission
+        trades.append((col, *entry[col], n - 1, n - 1, price))
+    if entry:
+        equity[-1] = cash
+    return equity, bar_cash, holdings, trades
+
+
+@pytest.mark.parametrize("sizing", ["equal", "cash"])
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_the_per_bar_reference(sizing, seed):
+    rng = np.random.default_rng(seed)
+    # symbols with missing bars (NaN prices) and dense signals: slots and cash run out
+    frames = {symbol: random_ohlcv(200, seed=10 * seed + k).sample(frac=0.9, random_state=k).sort_index()
+              for k, symbol in enumerate(SYMBOLS)}
+    panel, entries, exits = random_panel(frames, seed=seed, density=0.2)
+    kwargs = dict(sizing=sizing, max_positions=int(rng.integers(1, 6)), slippage=0.01, commission=5.0)
+
+    result = backtest_portfolio(panel["open"], panel["close"], entries, exits, **kwargs)
+    equity, cash, holdings, trades = reference_portfolio(panel["open"], panel["close"], entries, exits, **kwargs)
+
+    np.testing.assert_allclose(result["equity"].to_numpy(), equity, rtol=1e-9)
+    np.testing.assert_allclose(result["cash"].to_numpy(), cash, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(result["holdings"].to_numpy(), holdings, rtol=1e-12)
+    table = result["trades"].sort_values(["entry_index", "symbol"], kind="stable")
+    trades = sorted(trades, key=lambda trade: (trade[1], trade[0]))
+    assert list(table["symbol"]) == [SYMBOLS[trade[0]] for trade in trades]
+    index = panel["close"].index
+    assert list(table["entry_index"]) == [index[trade[1]] for trade in trades]
+    assert list(table["exit_fill_index"]) == [index[trade[5]] for trade in trades]
+    np.testing.assert_allclose(table["entry_price"], [trade[2] for trade in trades], rtol=1e-12)
+    np.testing.assert_allclose(table["shares"], [trade[3] for trade in trades], rtol=1e-9)
+    np.testing.assert_allclose(table["exit_price"], [trade[6] for trade in trades], rtol=1e-12)
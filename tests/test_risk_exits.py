@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import backtest_signals
+from conftest import assert_same_backtest, random_ohlcv, random_signals
+from strategy_compiler import compile_strategy
+
+RISK = [
+    {"stop_loss": 2.0},
+    {"take_profit": 3.0},
+    {"trailing_stop": 1.5},
+    {"stop_loss": 5.0, "take_profit": 5.0, "trailing_stop": 2.5},
+]
+
+
+@pytest.mark.parametrize("risk", RISK)
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("density", [0.01, 0.1])
+def test_vectorized_risk_exits_match_loop(risk, seed, density):
+    # sparse EXIT signals hold trades for hundreds of bars (several first-hit windows)
+    df = random_ohlcv(1000, seed=seed)
+    signals = random_signals(df.index, seed=seed + 50, density=density)
+    loop = backtest_signals(df, signals, slippage=0.05, commission=1.0, engine="loop", **risk)
+    vectorized = backtest_signals(df, signals, slippage=0.05, commission=1.0, engine="vectorized", **risk)
+    assert_same_backtest(vectorized, loop)
+
+
+def test_strategy_risk_clauses_are_applied(ohlcv):
+    dsl = "ENTRY: close crosses_above SMA(close,20)\nEXIT: close crosses_below SMA(close,50)"
+    signals = compile_strategy(dsl + "\nSTOP_LOSS: 2%\nTAKE_PROFIT: 4%")(ohlcv)
+    assert signals.attrs["risk"] == {"stop_loss": 2.0, "take_profit": 4.0}
+    for engine in ("loop", "vectorized"):
+        expected = backtest_signals(ohlcv, compile_strategy(dsl)(ohlcv), engine=engine,
+                                    stop_loss=2.0, take_profit=4.0)
+        assert_same_backtest(backtest_signals(ohlcv, signals, engine=engine), expected)
+
+
+def bars(rows):
+    return pd.DataFrame(rows, columns=["open", "high", "low", "close"],
+                        index=pd.date_range("2021-01-01", periods=len(rows))).assign(volume=1.0)
+
+
+@pytest.mark.parametrize("engine", ["loop", "vectorized"])
+def test_stop_fills_at_stop_or_at_a_gapping_open(engine):
+    df = bars([[100, 100, 100, 100],
+               [100, 101, 99, 100],       # entry fill at 100
+               [99, 100, 94, 95],         # low crosses the 5% stop: out at 95
+               [95, 95, 95, 95],
+               [100, 100, 100, 100],      # second entry fill at 100
+               [90, 91, 89, 90]])         # gaps through the stop: out at the open
+    signals = pd.DataFrame({"entry": [True, False, False, True, False, False],
+                            "exit": False}, index=df.index)
+    trades = backtest_signals(df, signals, engine=engine, stop_loss=5.0)["trades"].to_dicts()
+    assert [(t["entry_price"], t["exit_price"], t["exit_index"]) for t in trades] == [
+        (100.0, 95.0, str(df.index[2])), (100.0, 90.0, str(df.index[5]))]
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import robustness
+from backtest import backtest_signals
+from conftest import random_signals
+from robustness import monte_carlo
+
+
+@pytest.fixture
+def result(ohlcv):
+    return backtest_signals(ohlcv, random_signals(ohlcv.index, seed=7, density=0.05))
+
+
+@pytest.mark.parametrize("method", ["bootstrap", "block", "shuffle"])
+def test_paths_do_not_depend_on_batching(result, method, monkeypatch):
+    expected = monte_carlo(result, n_paths=1000, method=method, seed=3)
+    monkeypatch.setattr(robustness, "BATCH_BYTES", 1)     # one SEED_BLOCK of paths per batch
+    batched = monte_carlo(result, n_paths=1000, method=method, seed=3)
+    for name in robustness.METRICS:
+        np.testing.assert_array_equal(batched[name], expected[name])
+    smaller = monte_carlo(result, n_paths=300, method=method, seed=3)
+    np.testing.assert_array_equal(smaller["max_drawdown_pct"], expected["max_drawdown_pct"][:300])
+
+
+def test_observed_and_shuffled_final_capital(result):
+    mc = monte_carlo(result, n_paths=200, method="shuffle")
+    assert mc["observed"]["final_capital"] == pytest.approx(result["final_capital"], rel=1e-9)
+    assert mc["observed"]["max_drawdown_pct"] == pytest.approx(result["max_drawdown_pct"], rel=1e-9)
+    np.testing.assert_allclose(mc["final_capital"], result["final_capital"], rtol=1e-9)
+
+
+def test_import_stays_light():
+    code = "import sys, robustness; print(sorted({'screening', 'sweep', 'lark'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(robustness.__file__)))
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import backtest_signals
+from conftest import STRATEGIES, TIE_STRATEGY, flat_ticks, random_ohlcv
+from screening import screen
+from strategy_compiler import compile_strategy
+
+LIBRARY = STRATEGIES + [
+    "ENTRY: close > SMA(close,7)\nEXIT: RSI(close,9) > 65",
+    "ENTRY: close >",                                   # does not parse
+    STRATEGIES[0],                                      # duplicate
+    "ENTRY: close > SMA(close,20)\nSTOP_LOSS: 5%",      # risk exits are not screened
+]
+FAILED = {6, 8}
+
+
+@pytest.mark.parametrize("batch_size", [None, 1, 3])
+@pytest.mark.parametrize("seed", range(2))
+def test_screen_matches_single_backtests(seed, batch_size):
+    df = random_ohlcv(700, seed=seed)
+    result = screen(LIBRARY, df, slippage=0.05, commission=1.0, batch_size=batch_size)
+    summary = result.summary
+    assert list(summary["dsl"]) == LIBRARY
+
+    for i, dsl in enumerate(LIBRARY):
+        if i in FAILED:
+            assert isinstance(summary["error"].iloc[i], str)
+            assert not result.signals(i)[0].any()
+            continue
+        assert pd.isna(summary["error"].iloc[i])
+        signals = compile_strategy(dsl)(df)
+        entry, exit = result.signals(i)
+        np.testing.assert_array_equal(entry, signals["entry"].to_numpy())
+        np.testing.assert_array_equal(exit, signals["exit"].to_numpy())
+        assert summary["entry_bars"].iloc[i] == signals["entry"].sum()
+
+        expected = backtest_signals(df, signals, slippage=0.05, commission=1.0)
+        for name in ("final_capital", "total_return_pct", "max_drawdown_pct"):
+            assert summary[name].iloc[i] == pytest.approx(expected[name], rel=1e-9), name
+        assert summary["num_trades"].iloc[i] == expected["num_trades"]
+
+
+def test_sma_bank_matches_pandas_on_flat_cent_prices():
+    df = flat_ticks(20_000)
+    result = screen([TIE_STRATEGY, "ENTRY: SMA(close,5) > SMA(close,20)"], df)
+    for i, dsl in enumerate([TIE_STRATEGY, "ENTRY: SMA(close,5) > SMA(close,20)"]):
+        signals = compile_strategy(dsl)(df)
+        entry, exit = result.signals(i)
+        np.testing.assert_array_equal(entry, signals["entry"].to_numpy())
+        np.testing.assert_array_equal(exit, signals["exit"].to_numpy())
+
+
+def test_errors_name_the_exception(ohlcv):
+    errors = screen(LIBRARY, ohlcv).summary["error"]
+    assert errors.iloc[6].startswith("UnexpectedToken")
+    assert "STOP_LOSS" in errors.iloc[8]
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from caching import cached_indicator
+from code_generator import ast_to_python_code
+from conftest import STRATEGIES
+from indicators import INDICATORS
+from strategy_compiler import (clear_strategy_cache, compile_ast, compile_strategy,
+                               parse_dsl_to_ast, strategy_cache_info)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_strategy_cache()
+    yield
+    clear_strategy_cache()
+
+
+def test_repeat_compiles_hit_the_text_cache():
+    first = compile_strategy(STRATEGIES[0])
+    again = compile_strategy("  " + STRATEGIES[0].replace("\n", "\n   ") + " ")
+
+    assert again is first
+    assert strategy_cache_info()["dsl"]["hits"] == 1
+    assert strategy_cache_info()["dsl"]["size"] == 1
+
+
+def test_equal_asts_share_one_compiled_strategy():
+    strategy = compile_strategy(STRATEGIES[1])
+
+    assert compile_ast(parse_dsl_to_ast(STRATEGIES[1])) is strategy
+    assert strategy_cache_info()["ast"]["hits"] == 1
+
+
+def test_clear_drops_entries_and_counters():
+    first = compile_strategy(STRATEGIES[0])
+    compile_strategy(STRATEGIES[0])
+    clear_strategy_cache()
+
+    info = strategy_cache_info()
+    assert info["dsl"] == {"hits": 0, "misses": 0, "size": 0, "maxsize": 256}
+    assert info["ast"]["size"] == 0
+    assert compile_strategy(STRATEGIES[0]) is not first
+
+
+@pytest.mark.parametrize("dsl", STRATEGIES)
+def test_compiled_signals_are_boolean_entry_exit_frames(ohlcv, dsl):
+    signals = compile_strategy(dsl)(ohlcv)
+
+    assert list(signals.columns) == ["entry", "exit"]
+    assert signals.index.equals(ohlcv.index)
+    assert (signals.dtypes == bool).all()
+    assert signals["entry"].any() and signals["exit"].any()
+
+
+@pytest.mark.parametrize("dsl", STRATEGIES)
+def test_compiled_strategy_runs_the_generated_source(ohlcv, dsl):
+    namespace = {**INDICATORS, "pd": pd, "INDICATOR": cached_indicator}
+    exec(ast_to_python_code(parse_dsl_to_ast(dsl)), namespace)
+
+    pd.testing.assert_frame_equal(compile_strategy(dsl)(ohlcv), namespace["run_strategy"](ohlcv))
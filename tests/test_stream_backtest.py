@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import backtest_signals
+from conftest import STRATEGIES, TIE_STRATEGY, flat_ticks, random_ohlcv
+from stream_backtest import ChunkedSignals, CsvSink, MemorySink, StreamingBacktest, backtest_stream
+from strategy_compiler import compile_strategy, parse_dsl_to_ast
+
+
+def chunks(df, size):
+    return (df.iloc[start:start + size] for start in range(0, len(df), size))
+
+
+def chunked_signals(df, dsl, size):
+    signals = ChunkedSignals(parse_dsl_to_ast(dsl))
+    parts = [signals.process(chunk) for chunk in chunks(df, size)]
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+@pytest.mark.parametrize("dsl", STRATEGIES)
+def test_chunked_signals_do_not_depend_on_chunking(dsl):
+    df = random_ohlcv(700, seed=2)
+    entry, exit = chunked_signals(df, dsl, len(df))
+    expected = compile_strategy(dsl)(df)
+    np.testing.assert_array_equal(entry, expected["entry"].to_numpy())
+    np.testing.assert_array_equal(exit, expected["exit"].to_numpy())
+    for size in (2, 13, 250):
+        chunked_entry, chunked_exit = chunked_signals(df, dsl, size)
+        np.testing.assert_array_equal(chunked_entry, entry)
+        np.testing.assert_array_equal(chunked_exit, exit)
+
+
+def test_chunked_sma_matches_pandas_on_flat_cent_prices():
+    df = flat_ticks(20_000)
+    expected = compile_strategy(TIE_STRATEGY)(df)
+    for size in (1000, 4999):
+        entry, exit = chunked_signals(df, TIE_STRATEGY, size)
+        np.testing.assert_array_equal(entry, expected["entry"].to_numpy())
+        np.testing.assert_array_equal(exit, expected["exit"].to_numpy())
+
+
+@pytest.mark.parametrize("size", [3, 7, 100, 700])
+@pytest.mark.parametrize("dsl", STRATEGIES)
+def test_stream_matches_backtest_signals(dsl, size):
+    df = random_ohlcv(700, seed=3)
+    expected = backtest_signals(df, compile_strategy(dsl)(df), slippage=0.05, commission=1.0)
+
+    sink = MemorySink()
+    summary = backtest_stream(chunks(df, size), dsl, sink, slippage=0.05, commission=1.0)
+    assert sink.trades == expected["trades"].to_dicts()
+    pd.testing.assert_series_equal(sink.equity, expected["equity"])
+    for name in ("final_capital", "total_return_pct", "max_drawdown_pct", "num_trades"):
+        assert summary[name] == expected[name], name
+
+
+def test_csv_sink(tmp_path, ohlcv):
+    dsl = STRATEGIES[0]
+    expected = backtest_signals(ohlcv, compile_strategy(dsl)(ohlcv))
+    with CsvSink(tmp_path / "equity.csv", tmp_path / "trades.csv") as sink:
+        backtest_stream(chunks(ohlcv, 64), dsl, sink)
+
+    equity = pd.read_csv(tmp_path / "equity.csv", float_precision="round_trip")
+    np.testing.assert_array_equal(equity["equity"].to_numpy(), expected["equity"].to_numpy())
+    trades = pd.read_csv(tmp_path / "trades.csv", float_precision="round_trip")
+    assert len(trades) == expected["num_trades"]
+    np.testing.assert_array_equal(trades["pnl"].to_numpy(), expected["trades"].records["pnl"])
+
+
+def test_rejects_risk_exits(ohlcv):
+    with pytest.raises(ValueError):
+        backtest_stream(chunks(ohlcv, 64), "ENTRY: close > SMA(close,20)\nSTOP_LOSS: 5%")
+
+
+# -----------------------------------------------------------
+# Checkpoints
+# -----------------------------------------------------------
+@pytest.mark.parametrize("split", [1, 57, 300, 699])
+@pytest.mark.parametrize("dsl", STRATEGIES)
+def test_resumed_run_matches_one_stream(tmp_path, dsl, split):
+    df = random_ohlcv(700, seed=4)
+    full = MemorySink()
+    expected = backtest_stream(chunks(df, 50), dsl, full, commission=1.0)
+
+    first = MemorySink()
+    backtest = StreamingBacktest(dsl, first, commission=1.0)
+    for chunk in chunks(df.iloc[:split], 50):
+        backtest.feed(chunk)
+    backtest.checkpoint(tmp_path / "run.ckpt")
+    del backtest
+
+    second = MemorySink()
+    backtest = StreamingBacktest.resume(tmp_path / "run.ckpt", sink=second, strategy=dsl)
+    for chunk in chunks(df.iloc[split:], 33):
+        backtest.feed(chunk)
+    assert backtest.summary() == expected             # summary() leaves the run open
+    assert backtest.finish() == expected
+
+    assert first.trades + second.trades == full.trades
+    pd.testing.assert_series_equal(pd.concat([first.equity, second.equity]), full.equity, check_freq=False)
+
+
+@pytest.mark.filterwarnings("ignore:overflow encountered")
+def test_nightly_resumes_match_the_compiled_strategy(tmp_path):
+    # one checkpoint per 5000-bar "night" over 20k flat cent-priced bars
+    df = flat_ticks(20_000)
+    expected = backtest_signals(df, compile_strategy(TIE_STRATEGY)(df))
+
+    sink = MemorySink()
+    backtest = StreamingBacktest(TIE_STRATEGY, sink)
+    for night in chunks(df, 5000):
+        backtest.feed(night)
+        backtest.checkpoint(tmp_path / "run.ckpt")
+        backtest = StreamingBacktest.resume(tmp_path / "run.ckpt", sink=sink, strategy=TIE_STRATEGY)
+    assert backtest.finish()["num_trades"] == expected["num_trades"]
+
+    # share counts compound past float range over a thousand trades: compare fills
+    fields = ("entry_fill_index", "entry_price", "exit_fill_index", "exit_price")
+    fills = [tuple(trade[field] for field in fields) for trade in sink.trades]
+    assert fills == [tuple(trade[field] for field in fields) for trade in expected["trades"].to_dicts()]
+
+
+def test_summary_does_not_finish(ohlcv):
+    sink = MemorySink()
+    backtest = StreamingBacktest(STRATEGIES[0], sink)
+    backtest.feed(ohlcv.iloc[:250])
+    written = (len(sink.trades), len(sink.equity))
+    backtest.summary()
+    assert (len(sink.trades), len(sink.equity)) == written and not backtest.finished
+    backtest.feed(ohlcv.iloc[250:])
+    assert backtest.finish() == backtest_stream([ohlcv], STRATEGIES[0])
+
+
+def test_resume_checks(tmp_path, ohlcv):
+    path = tmp_path / "run.ckpt"
+    backtest = StreamingBacktest(STRATEGIES[0])
+    backtest.feed(ohlcv.iloc[:100])
+    backtest.checkpoint(path)
+
+    with pytest.raises(ValueError, match="different strategy"):
+        StreamingBacktest.resume(path, strategy=STRATEGIES[1])
+    resumed = StreamingBacktest.resume(path)
+    with pytest.raises(ValueError, match="must follow"):
+        resumed.feed(ohlcv.iloc[50:150])
+
+    backtest.finish()
+    with pytest.raises(ValueError, match="finished"):
+        backtest.checkpoint(path)
+    (tmp_path / "other.ckpt").write_bytes(b"not a checkpoint")
+    with pytest.raises(Exception):
+        StreamingBacktest.resume(tmp_path / "other.ckpt")
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+from conftest import STRATEGIES, random_ohlcv
+from strategy_compiler import compile_strategy
+from streaming import StreamingStrategy
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("dsl", STRATEGIES)
+def test_streaming_matches_batch(dsl, seed):
+    df = random_ohlcv(600, seed=seed)
+    expected = compile_strategy(dsl)(df)
+    pd.testing.assert_frame_equal(StreamingStrategy.from_dsl(dsl).run(df), expected)
+
+
+def test_on_bar_matches_run(ohlcv):
+    strategy = StreamingStrategy.from_dsl(STRATEGIES[1])
+    expected = strategy.run(ohlcv)
+    strategy.reset()
+    rows = [strategy.on_bar(bar) for bar in ohlcv.to_dict("records")]
+    assert rows == list(zip(expected["entry"], expected["exit"]))
+
+
+def test_timeframe_series_are_rejected():
+    with pytest.raises(ValueError, match="Timeframe-qualified"):
+        StreamingStrategy.from_dsl("ENTRY: close > SMA(close@1W,4)")
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from backtest import backtest_signal_matrix, backtest_signals
+from conftest import SUMMARY_METRICS, random_ohlcv, random_signals
+from indicators import RSI, SMA, RSI_bank, SMA_bank
+from strategy_compiler import compile_strategy
+from sweep import expand_grid, sweep, sweep_signals
+
+TEMPLATE = ("ENTRY: SMA(close,{fast}) crosses_above SMA(close,{slow}) AND RSI(close,{rsi}) < 70\n"
+            "EXIT: SMA(close,{fast}) crosses_below SMA(close,{slow}) OR RSI(close[1],{rsi}) > 75")
+GRID = {"fast": [3, 5, 10], "slow": [20, 30], "rsi": [7, 14]}
+
+
+@pytest.fixture
+def bars():
+    return random_ohlcv(800, seed=5)
+
+
+def test_expand_grid_orders_like_itertools_product():
+    assert expand_grid({"a": [1, 2], "b": [3]}) == [{"a": 1, "b": 3}, {"a": 2, "b": 3}]
+
+
+def test_banks_match_the_single_period_indicators(bars):
+    periods = [1, 2, 7, 14, 50]
+    sma, rsi = SMA_bank(bars["close"], periods), RSI_bank(bars["close"], periods)
+
+    for j, period in enumerate(periods):
+        np.testing.assert_array_equal(sma[:, j], SMA(bars["close"], period).to_numpy())
+        np.testing.assert_array_equal(rsi[:, j], RSI(bars["close"], period).to_numpy())
+
+
+def test_sweep_signals_match_each_compiled_strategy(bars):
+    combinations, entries, exits = sweep_signals(TEMPLATE, GRID, bars)
+
+    assert len(combinations) == entries.shape[1] == 12
+    for j, params in enumerate(combinations):
+        signals = compile_strategy(TEMPLATE.format(**params))(bars)
+        np.testing.assert_array_equal(entries[:, j], signals["entry"].to_numpy())
+        np.testing.assert_array_equal(exits[:, j], signals["exit"].to_numpy())
+
+
+def test_signal_matrix_metrics_match_backtest_signals(ohlcv):
+    columns = [random_signals(ohlcv.index, seed=seed, density=0.05 + seed / 100) for seed in range(6)]
+    entries = np.column_stack([signals["entry"] for signals in columns])
+    exits = np.column_stack([signals["exit"] for signals in columns])
+
+    metrics = backtest_signal_matrix(ohlcv, entries, exits, slippage=0.02, commission=1.0)
+
+    for j, signals in enumerate(columns):
+        expected = backtest_signals(ohlcv, signals, slippage=0.02, commission=1.0)
+        for name in SUMMARY_METRICS:
+            assert metrics[name][j] == pytest.approx(expected[name], rel=1e-9), name
+
+
+def test_sweep_reports_one_row_per_combination(bars):
+    results = sweep(TEMPLATE, GRID, bars)
+
+    assert list(results.columns) == list(GRID) + SUMMARY_METRICS
+    params = results.loc[4, list(GRID)].to_dict()
+    expected = backtest_signals(bars, compile_strategy(TEMPLATE.format(**params))(bars))
+    for name in SUMMARY_METRICS:
+        assert results.loc[4, name] == pytest.approx(expected[name], rel=1e-9)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from caching import IndicatorCache
+from conftest import random_ohlcv
+from strategy_compiler import compile_strategy
+from timeframes import ResampledBars, clear_resample_cache, period_starts, timeframe_bars
+
+DSL = "ENTRY: close@1W > SMA(close@1W,4)\nEXIT: close < SMA(close,10)"
+
+
+def weekly_reference(df):
+    """Monday-to-Sunday bars labelled with their Monday."""
+    return df.resample("W-MON", label="left", closed="left").agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+
+
+def test_weekly_bars_match_pandas_resample():
+    clear_resample_cache()
+    df = random_ohlcv(400, seed=1, start="2021-01-06")
+    bars = timeframe_bars(df, "1W")
+    pd.testing.assert_frame_equal(bars, weekly_reference(df), check_freq=False, check_index_type=False)
+    assert (bars.index.dayofweek == 0).all()
+    assert pd.DatetimeIndex(period_starts(df.index, "1W")).isin(bars.index).all()
+
+
+def test_base_bars_see_the_last_completed_week():
+    clear_resample_cache()
+    df = random_ohlcv(400, seed=2, start="2021-01-06")
+    weekly = weekly_reference(df)
+    above = weekly["close"] > weekly["close"].rolling(4).mean()
+    # each bar sees the week before its own; the first (partial) week sees nothing
+    expected = above.shift(1, fill_value=False).reindex(df.index, method="ffill").to_numpy()
+
+    signals = compile_strategy(DSL)(df, IndicatorCache())
+    np.testing.assert_array_equal(signals["entry"].to_numpy(), expected)
+
+
+def test_appended_bars_extend_the_cached_bars():
+    clear_resample_cache()
+    df = random_ohlcv(400, seed=1)
+    timeframe_bars(df.iloc[:300].copy(), "1W")
+    pd.testing.assert_frame_equal(timeframe_bars(df, "1W"), ResampledBars.build(df, "1W").bars)
+
+
+def test_changed_earlier_bar_is_not_a_continuation():
+    clear_resample_cache()
+    df = random_ohlcv(400, seed=2)
+    cached = df.iloc[:300].copy()
+    timeframe_bars(cached, "1W")
+
+    # revised history: one early close changes, the first and last cached rows do not
+    revised = df.copy()
+    revised.iloc[11, revised.columns.get_loc("close")] *= 1.5      # the close of week 1
+    assert not ResampledBars.build(cached, "1W").continued_by(revised)
+    bars = timeframe_bars(revised, "1W")
+    pd.testing.assert_frame_equal(bars, ResampledBars.build(revised, "1W").bars)
+    assert bars["close"].iloc[1] != timeframe_bars(cached, "1W")["close"].iloc[1]
+
+
+def test_shifted_timestamps_are_not_a_continuation():
+    df = random_ohlcv(300, seed=3)
+    moved = df.copy()
+    moved.index = moved.index.where(np.arange(len(df)) != 100, moved.index[100] + pd.Timedelta(hours=1))
+    assert not ResampledBars.build(df.iloc[:200], "1W").continued_by(moved)
+    assert ResampledBars.build(df.iloc[:200], "1W").continued_by(df)
+
+
+def test_weekly_signals_on_a_growing_frame():
+    df = random_ohlcv(500, seed=4)
+    strategy = compile_strategy(DSL)
+    stops = (200, 201, 260, 500)
+    expected = []
+    for stop in stops:
+        clear_resample_cache()
+        expected.append(strategy(df.iloc[:stop].copy(), IndicatorCache()))
+
+    clear_resample_cache()
+    for stop, signals in zip(stops, expected):
+        pd.testing.assert_frame_equal(strategy(df.iloc[:stop].copy(), IndicatorCache()), signals)
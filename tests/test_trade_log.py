@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import TRADE_FIELDS, TradeLog, backtest_signals
+from conftest import random_signals
+
+
+@pytest.fixture
+def result(ohlcv):
+    signals = random_signals(ohlcv.index, seed=7)
+    signals.iloc[-3:] = [[True, False]] * 3          # left open: force-closed on the last bar
+    return backtest_signals(ohlcv, signals, commission=1.0)
+
+
+def test_dicts_keep_the_earlier_list_format(result, ohlcv):
+    trades = result["trades"]
+    dicts = trades.to_dicts()
+
+    assert isinstance(trades, TradeLog) and len(trades) == len(dicts) == result["num_trades"]
+    assert list(dicts[0]) == TRADE_FIELDS
+    assert dicts[0] == trades[0] and dicts[-2:] == trades[-2:] and dicts == list(trades)
+    record = trades.records[0]
+    assert dicts[0]["entry_index"] == str(ohlcv.index[record["entry_bar"]])
+    assert dicts[0]["pnl"] == record["pnl"]
+
+
+def test_equality_compares_like_the_list_of_dicts(result, ohlcv):
+    trades = result["trades"]
+    same = TradeLog(ohlcv.index, trades.records.copy())
+
+    assert trades == same and trades == trades.to_dicts()
+    assert trades != trades.to_dicts()[:-1]
+    assert (trades == "trades") is False
+    with pytest.raises(TypeError):
+        hash(trades)
+
+
+def test_frame_keeps_index_labels(result, ohlcv):
+    frame = result["trades"].to_frame()
+    records = result["trades"].records
+
+    assert list(frame.columns) == TRADE_FIELDS
+    assert list(frame["entry_index"]) == list(ohlcv.index[records["entry_bar"]])
+    assert frame["exit_index"].iloc[-1] == ohlcv.index[-1]
+    np.testing.assert_array_equal(frame["pnl"], records["pnl"])
+
+
+def test_open_trades_have_no_exit_fields(ohlcv):
+    log = TradeLog(ohlcv.index, capacity=1)
+    log.open(3, 4, 101.0, 10.0)
+    log.close(8, 9, 103.0, 20.0, 2.0)
+    log.open(10, 11, 99.0, 5.0)             # grows past the initial capacity
+
+    assert len(log) == 2
+    assert log[0]["exit_fill_index"] == str(ohlcv.index[9])
+    assert log[1]["exit_index"] is None and log[1]["pnl"] is None
+    frame = log.to_frame()
+    assert pd.isna(frame["exit_index"].iloc[1]) and np.isnan(frame["pnl"].iloc[1])
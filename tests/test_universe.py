@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from backtest import backtest_signals
+from conftest import STRATEGIES, random_ohlcv
+from strategy_compiler import compile_strategy
+from universe import load_spilled, run_universe, spill_frame, spilled_symbols
+
+SYMBOLS = ["AAPL", "BRK/B", "X", "X.index", "x", "../etc", "ÄRM"]
+
+
+def test_any_symbol_spills_to_its_own_files(tmp_path):
+    frames = {symbol: random_ohlcv(50, seed=k) for k, symbol in enumerate(SYMBOLS)}
+    frames["X"].index = frames["X"].index.tz_localize("America/New_York")
+    for symbol, df in frames.items():
+        spill_frame(df, tmp_path, symbol)
+
+    assert spilled_symbols(tmp_path) == sorted(SYMBOLS)
+    assert all(path.parent == tmp_path for path in tmp_path.rglob("*"))
+    for symbol, df in frames.items():
+        pd.testing.assert_frame_equal(load_spilled(tmp_path, symbol), df, check_freq=False,
+                                      check_index_type=False)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_universe_matches_single_backtests(workers):
+    frames = {symbol: random_ohlcv(300, seed=k) for k, symbol in enumerate(SYMBOLS)}
+    summary = run_universe(STRATEGIES[0], frames, workers=workers, commission=1.0)
+
+    assert sorted(summary.index) == sorted(SYMBOLS)
+    for symbol, df in frames.items():
+        expected = backtest_signals(df, compile_strategy(STRATEGIES[0])(df), commission=1.0)
+        row = summary.loc[symbol]
+        assert pd.isna(row["error"])
+        assert row["bars"] == len(df)
+        for name in ("final_capital", "total_return_pct", "max_drawdown_pct", "num_trades"):
+            assert row[name] == pytest.approx(expected[name], rel=1e-12), name
+
+
+def test_a_failing_symbol_is_reported_not_raised(tmp_path):
+    spill_frame(random_ohlcv(100, seed=1), tmp_path, "GOOD")
+    spill_frame(random_ohlcv(100, seed=2).drop(columns="open"), tmp_path, "BAD")
+
+    summary = run_universe(STRATEGIES[0], tmp_path, workers=1)
+
+    assert pd.isna(summary.loc["GOOD", "error"])
+    assert summary.loc["BAD", "error"].startswith("KeyError")
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from backtest import backtest_signals
+from conftest import STRATEGIES, random_ohlcv, random_signals
+from strategy_compiler import compile_strategy
+from walk_forward import (METRICS, rolling_backtest, rolling_windows, walk_forward,
+                          walk_forward_windows, window_metrics)
+
+
+def sliced_backtest(df, signals, start, stop, **kwargs):
+    return backtest_signals(df.iloc[start:stop], signals.iloc[start:stop], **kwargs)
+
+
+def assert_metrics(actual, expected):
+    for name in METRICS:
+        assert actual[name] == pytest.approx(expected[name], rel=1e-9), name
+
+
+def test_windows():
+    np.testing.assert_array_equal(walk_forward_windows(10, 4, 3),
+                                  [[0, 4, 4, 7], [3, 7, 7, 10]])
+    np.testing.assert_array_equal(walk_forward_windows(10, 4, 3, anchored=True),
+                                  [[0, 4, 4, 7], [0, 7, 7, 10]])
+    np.testing.assert_array_equal(rolling_windows(10, 4, 3), [[0, 4], [3, 7], [6, 10]])
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_window_metrics_match_sliced_backtests(seed):
+    df = random_ohlcv(300, seed=seed)
+    columns = [random_signals(df.index, seed=seed * 10 + k, density=density)
+               for k, density in enumerate([0.05, 0.2, 0.5])]
+    entries = np.column_stack([signals["entry"] for signals in columns])
+    exits = np.column_stack([signals["exit"] for signals in columns])
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, 290, 20)
+    bounds = np.column_stack([starts, starts + rng.integers(1, 300 - starts + 1)])
+
+    metrics = window_metrics(df, entries, exits, bounds, slippage=0.05, commission=1.0)
+    for w, (start, stop) in enumerate(bounds):
+        for k, signals in enumerate(columns):
+            expected = sliced_backtest(df, signals, start, stop, slippage=0.05, commission=1.0)
+            assert_metrics({name: metrics[name][w, k] for name in METRICS}, expected)
+
+
+def test_walk_forward_selects_best_train_candidate():
+    df = random_ohlcv(600, seed=4)
+    results = walk_forward(STRATEGIES, df, train=200, test=100)
+    windows = walk_forward_windows(len(df), 200, 100)
+    assert len(results) == len(windows)
+
+    signals = [compile_strategy(dsl)(df) for dsl in STRATEGIES]
+    for (train_start, train_stop, test_start, test_stop), row in zip(windows, results.itertuples()):
+        train = [sliced_backtest(df, s, train_start, train_stop)["total_return_pct"] for s in signals]
+        assert row.strategy == int(np.argmax(train))
+        assert row.train_total_return_pct == pytest.approx(max(train), rel=1e-9)
+        expected = sliced_backtest(df, signals[row.strategy], test_start, test_stop)
+        assert_metrics(row._asdict(), expected)
+
+
+def test_rolling_backtest(ohlcv):
+    results = rolling_backtest(STRATEGIES[:2], ohlcv, window=120, step=60)
+    bounds = rolling_windows(len(ohlcv), 120, 60)
+    assert len(results) == 2 * len(bounds)
+    for row in results.itertuples():
+        signals = compile_strategy(STRATEGIES[row.strategy])(ohlcv)
+        start, stop = bounds[row.window]
+        assert_metrics(row._asdict(), sliced_backtest(ohlcv, signals, start, stop))
+
+
+def test_unknown_metric(ohlcv):
+    with pytest.raises(ValueError, match="Unknown metric"):
+        walk_forward(STRATEGIES[0], ohlcv, train=100, test=50, metric="sharpe")
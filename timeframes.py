@@ -0,0 +1,202 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from caching import LRUCache, dataset_key
+from instrumentation import stage, count
+
+
+# ============================================================
+# Higher-timeframe bars for qualified series (close@1W)
+# ============================================================
+#
+#     ENTRY: close > SMA(close@1W,20)
+#
+#   _t0 = df['close']
+#   _t1 = TF(df, '1W')['close']                          weekly closes
+#   _t2 = INDICATOR(df, 'SMA', _t1, 20, 'close@1W', 0, cache)
+#   _t3 = ALIGN(df, _t2, '1W')                           back on the base bars
+#
+# Series and indicators of a timeframe are computed on the resampled bars
+# (open first, high max, low min, close last, volume sum, other columns
+# last; one row per period that has bars, labelled with its start), so
+# SMA(close@1W,20) is a 20-week average and close@1W[1] the week before.
+# ALIGN gives each base bar the value of the last *completed* period: bars
+# of week k see week k-1, never the week they belong to (which is still
+# forming), and NaN before the first week completes.
+#
+# Resampling happens once per (dataset, timeframe): results are cached by
+# dataset identity (caching.dataset_key).  A frame that continues a
+# resampled one (the same bars, timestamps and values, with more rows
+# appended, e.g. the next `pd.concat` of a live feed; checked against a
+# hash of the cached frame) re-aggregates only from the last, possibly
+# partial, period of the cached bars on.
+# ============================================================
+
+OHLCV_AGGREGATION = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+# length of one unit of each fixed-length timeframe, and where its periods start
+_UNIT_NANOS = {"m": 60 * 10**9, "h": 3600 * 10**9, "D": 86400 * 10**9, "W": 7 * 86400 * 10**9}
+_MONDAY = 4 * 86400 * 10**9          # 1970-01-05: weeks run Monday to Sunday
+
+
+def split_timeframe(timeframe):
+    """'4h' → (4, 'h')"""
+    unit = timeframe.lstrip("0123456789")
+    return int(timeframe[:len(timeframe) - len(unit)]), unit
+
+
+def period_starts(index, timeframe):
+    """
+    Start of the period each timestamp of a DatetimeIndex falls in.
+
+    Periods are counted from fixed origins (the epoch; Mondays for weeks;
+    calendar months), never from the first bar, so every slice of a frame
+    splits into the same periods.  Timezone-aware indexes use local time.
+    """
+    periods, unit = split_timeframe(timeframe)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    if unit == "M":
+        months = (index.year * 12 + index.month - 1) // periods * periods
+        starts = pd.to_datetime({"year": months // 12, "month": months % 12 + 1, "day": 1})
+        return starts.to_numpy().astype("datetime64[ns]")
+    nanos = index.as_unit("ns").asi8
+    step = _UNIT_NANOS[unit] * periods
+    origin = _MONDAY if unit == "W" else 0
+    return ((nanos - origin) // step * step + origin).astype("datetime64[ns]")
+
+
+def _aggregate(df, timeframe):
+    """Bars of `timeframe` over df and the base-bar count of each (periods without bars are absent)."""
+    starts = period_starts(df.index, timeframe)
+    first = np.flatnonzero(np.concatenate([[True], starts[1:] != starts[:-1]]))
+    counts = np.diff(np.append(first, len(df)))
+    how = {column: OHLCV_AGGREGATION.get(column, "last") for column in df.columns}
+    bars = df.groupby(np.repeat(np.arange(len(first)), counts)).agg(how)
+    bars.index = pd.DatetimeIndex(starts[first], name=df.index.name)
+    return bars, counts
+
+
+def _frame_digest(df):
+    """Hash of a frame's index, column names and values (row by row)."""
+    rows = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    digest = hashlib.blake2b(rows.tobytes(), digest_size=16)
+    digest.update(repr(list(df.columns)).encode("utf-8"))
+    return digest.digest()
+
+
+class ResampledBars:
+    """
+    A frame aggregated to `timeframe`.
+
+        bars    one row per non-empty period (the last one possibly still forming)
+        period  row of `bars` each base bar falls in
+    """
+
+    def __init__(self, df, timeframe, bars, counts, period):
+        self.timeframe = timeframe
+        self.bars = bars
+        self.counts = counts
+        self.period = period
+        # enough of the base frame to recognise a continuation of it
+        self.rows = len(df)
+        self.first = df.index[0] if len(df) else None
+        self.last_row = df.iloc[-1] if len(df) else None
+        self.digest = _frame_digest(df)
+
+    @classmethod
+    def build(cls, df, timeframe):
+        if not isinstance(df.index, pd.DatetimeIndex):
+            raise ValueError(f"Timeframe {timeframe} needs a DatetimeIndex'ed frame")
+        if not df.index.is_monotonic_increasing:
+            raise ValueError(f"Timeframe {timeframe} needs bars in time order")
+        bars, counts = _aggregate(df, timeframe)
+        return cls(df, timeframe, bars, counts, np.repeat(np.arange(len(counts)), counts))
+
+    def continued_by(self, df):
+        """
+        True when df starts with the rows these bars were built from: same
+        timestamps and values on all of them (the first / last row checks
+        only rule out most other frames before the prefix is hashed).
+        """
+        return (0 < self.rows <= len(df)
+                and df.index[0] == self.first
+                and df.iloc[self.rows - 1].equals(self.last_row)
+                and _frame_digest(df.iloc[:self.rows]) == self.digest)
+
+    def extended(self, df):
+        """Bars of df, a continuation of this frame: only the last period onwards is re-aggregated."""
+        start = self.rows - int(self.counts[-1])        # first base bar of the last period
+        if not df.index[start:].is_monotonic_increasing:
+            raise ValueError(f"Timeframe {self.timeframe} needs bars in time order")
+        tail, tail_counts = _aggregate(df.iloc[start:], self.timeframe)
+        kept = len(self.counts) - 1
+        bars = pd.concat([self.bars.iloc[:kept], tail])
+        counts = np.concatenate([self.counts[:kept], tail_counts])
+        period = np.concatenate([self.period[:start], kept + np.repeat(np.arange(len(tail_counts)), tail_counts)])
+        return ResampledBars(df, self.timeframe, bars, counts, period)
+
+    def align(self, values):
+        """Per-period values → per base bar, from the last completed period (NaN before)."""
+        padded = np.concatenate([[np.nan], np.asarray(values, dtype=np.float64)])
+        return padded[self.period]
+
+    def __repr__(self):
+        return f"ResampledBars({self.timeframe}, {len(self.bars)} bars from {self.rows})"
+
+
+# -----------------------------------------------------------
+# Cache
+# -----------------------------------------------------------
+_resampled = LRUCache(maxsize=64)     # (dataset token, version, timeframe) → ResampledBars
+
+
+def resampled(df, timeframe):
+    """ResampledBars of df (cached per dataset and timeframe, extended when df continues a cached one)."""
+    key = dataset_key(df) + (timeframe,)
+    entry = _resampled.get(key)
+    if entry is not None:
+        count("resample_cache.hits")
+        return entry
+
+    count("resample_cache.misses")
+    # another dataset (not an older version of this one, edited in place)
+    # that df continues: re-aggregate only its last period and the new rows
+    previous = max((bars for (token, _, frame), bars in _resampled.items()
+                    if frame == timeframe and token != key[0] and bars.continued_by(df)),
+                   key=lambda bars: bars.rows, default=None)
+    if previous is not None:
+        count("resample_cache.extended")
+        with stage(f"resample.{timeframe}", rows=len(df) - previous.rows + int(previous.counts[-1])):
+            entry = previous.extended(df)
+    else:
+        with stage(f"resample.{timeframe}", rows=len(df)):
+            entry = ResampledBars.build(df, timeframe)
+    _resampled.put(key, entry)
+    return entry
+
+
+def clear_resample_cache():
+    _resampled.clear()
+
+
+# -----------------------------------------------------------
+# Called by generated strategy code
+# -----------------------------------------------------------
+def timeframe_bars(df, timeframe):
+    """TF(df, '1W'): df's bars aggregated to the timeframe (a DataFrame indexed by period)."""
+    return resampled(df, timeframe).bars
+
+
+def align(df, values, timeframe):
+    """
+    ALIGN(df, values, '1W'): values computed on timeframe_bars(df, '1W')
+    placed on df's bars without lookahead.  Returns a Series on df.index
+    for a Series, a float64 array otherwise.
+    """
+    aligned = resampled(df, timeframe).align(values)
+    if isinstance(values, pd.Series):
+        return pd.Series(aligned, index=df.index)
+    return aligned
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backtest import backtest_signals
+from caching import IndicatorCache
+from strategy_compiler import compile_strategy
+
+SUMMARY_COLUMNS = ["bars", "final_capital", "total_return_pct", "max_drawdown_pct", "num_trades", "error"]
+
+
+# -----------------------------------------------------------
+# Spilling frames to memory-mappable files
+# -----------------------------------------------------------
+# One symbol = <name>.npy, a (bars x columns) float64 matrix, plus
+# <name>.index.npy and <name>.json (the symbol, column names, index kind).
+# A single float block lets workers wrap the memory map in a DataFrame
+# without a copy.  <name> is the symbol reduced to letters, digits, "_" and
+# "-" plus a hash of the symbol itself, so any symbol ("BRK/B", "X.index")
+# is a valid file name that no other symbol's files can collide with.
+def spilled_name(symbol):
+    """File name stem of a symbol's spilled files."""
+    symbol = str(symbol)
+    digest = hashlib.sha1(symbol.encode("utf-8")).hexdigest()[:10]
+    return f"{re.sub(r'[^A-Za-z0-9_-]', '_', symbol)}-{digest}"
+
+
+def spill_frame(df, directory, symbol):
+    directory = Path(directory)
+    name = spilled_name(symbol)
+    columns = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    np.save(directory / f"{name}.npy", df[columns].to_numpy(dtype=np.float64))
+
+    index = df.index
+    if isinstance(index, pd.DatetimeIndex):
+        kind, values = "datetime", index.as_unit("ns").asi8
+    elif index.dtype.kind in "iuf":
+        kind, values = "numeric", index.to_numpy()
+    else:
+        kind, values = "string", index.astype(str).to_numpy(dtype=str)
+    np.save(directory / f"{name}.index.npy", values)
+
+    with open(directory / f"{name}.json", "w") as f:
+        json.dump({"symbol": symbol, "columns": columns, "index": kind,
+                   "tz": str(getattr(index, "tz", None) or "")}, f)
+
+
+def load_spilled(directory, symbol):
+    """Memory-map a spilled symbol back into a (read-only, zero-copy) DataFrame."""
+    directory = Path(directory)
+    name = spilled_name(symbol)
+    with open(directory / f"{name}.json") as f:
+        meta = json.load(f)
+
+    values = np.load(directory / f"{name}.npy", mmap_mode="r")
+    index = np.load(directory / f"{name}.index.npy")
+    if meta["index"] == "datetime":
+        index = pd.DatetimeIndex(index.view("datetime64[ns]"))
+        if meta["tz"]:
+            index = index.tz_localize("UTC").tz_convert(meta["tz"])
+
+    return pd.DataFrame(values, index=index, columns=meta["columns"], copy=False)
+
+
+def spilled_symbols(directory):
+    """Symbols spilled to `directory` (read from their metadata, not the file names)."""
+    symbols = []
+    for path in Path(directory).glob("*.json"):
+        with open(path) as f:
+            symbols.append(json.load(f)["symbol"])
+    return sorted(symbols)
+
+
+# -----------------------------------------------------------
+# Worker side: strategy compiled once per process
+# -----------------------------------------------------------
+_worker = {}
+
+
+def _init_worker(dsl_text, backtest_kwargs):
+    _worker["strategy"] = compile_strategy(dsl_text)
+    _worker["backtest_kwargs"] = backtest_kwargs
+
+
+def _run_symbol(task):
+    directory, symbol = task
+    try:
+        df = load_spilled(directory, symbol)
+        # per-symbol cache: indicators are never shared across symbols, and
+        # a long-lived worker should not pin every symbol's results in memory
+        signals = _worker["strategy"](df, IndicatorCache())
+        result = backtest_signals(df, signals, engine="vectorized", **_worker["backtest_kwargs"])
+    except Exception as exc:          # one bad symbol must not sink the universe
+        return symbol, {"error": f"{type(exc).__name__}: {exc}"}
+
+    return symbol, {
+        "bars": len(df),
+        "final_capital": result["final_capital"],
+        "total_return_pct": result["total_return_pct"],
+        "max_drawdown_pct": result["max_drawdown_pct"],
+        "num_trades": result["num_trades"],
+        "error": None,
+    }
+
+
+# -----------------------------------------------------------
+# Entry point
+# -----------------------------------------------------------
+def run_universe(dsl_text, data_source, workers=None, chunksize=None, **backtest_kwargs):
+    """
+    Backtest one DSL strategy over many symbols in parallel.
+
+    Args:
+        dsl_text (str): strategy, compiled once per worker process
+        data_source: {symbol: DataFrame} (spilled to a temporary directory of
+                     memory-mapped .npy files first) or a directory already
+                     written by `spill_frame`
+        workers (int): process count (default: os.cpu_count()); 1 runs inline
+        chunksize (int): symbols per task batch (default: spread ~4 batches per worker)
+        **backtest_kwargs: initial_capital, slippage, commission
+
+    Returns:
+        DataFrame indexed by symbol with bars, final_capital, total_return_pct,
+        max_drawdown_pct, num_trades and error (None on success)
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if isinstance(data_source, (str, os.PathLike)):
+        return _run_directory(dsl_text, data_source, workers, chunksize, backtest_kwargs)
+
+    with tempfile.TemporaryDirectory(prefix="universe-") as directory:
+        for symbol, df in data_source.items():
+            spill_frame(df, directory, symbol)
+        return _run_directory(dsl_text, directory, workers, chunksize, backtest_kwargs)
+
+
+def _run_directory(dsl_text, directory, workers, chunksize, backtest_kwargs):
+    tasks = [(str(directory), symbol) for symbol in spilled_symbols(directory)]
+
+    if workers == 1:
+        _init_worker(dsl_text, backtest_kwargs)
+        rows = [_run_symbol(task) for task in tasks]
+    else:
+        chunksize = chunksize or max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(dsl_text, backtest_kwargs)) as pool:
+            rows = list(pool.map(_run_symbol, tasks, chunksize=chunksize))
+
+    summary = pd.DataFrame.from_dict(dict(rows), orient="index", columns=SUMMARY_COLUMNS)
+    summary.index.name = "symbol"
+    return summary
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+from backtest import backtest_price_matrix, position_state, require_no_risk_exits
+from caching import BATCH_BYTES
+from datastore import as_frame
+from instrumentation import stage
+from strategy_compiler import parse_dsl_to_ast
+from sweep import BatchEvaluator
+
+METRICS = ["final_capital", "total_return_pct", "max_drawdown_pct", "num_trades"]
+
+
+# ============================================================
+# Windows
+# ============================================================
+def walk_forward_windows(n, train, test, step=None, anchored=False):
+    """
+    (windows x 4) array of [train_start, train_stop, test_start, test_stop)
+    bar positions over `n` bars.
+
+    Each test window follows its train window; windows advance by `step`
+    bars (default: `test`, so test windows tile the history).  anchored=True
+    keeps every train window starting at bar 0 (expanding window).  The last
+    test window is cut at the end of the data.
+    """
+    if train < 1 or test < 1:
+        raise ValueError("train and test must be at least one bar")
+    step = step or test
+    windows = []
+    for train_stop in range(train, n, step):
+        train_start = 0 if anchored else train_stop - train
+        windows.append((train_start, train_stop, train_stop, min(train_stop + test, n)))
+    return np.array(windows, dtype=np.int64).reshape(-1, 4)
+
+
+def rolling_windows(n, window, step=None):
+    """(windows x 2) array of [start, stop) positions of full `window`-bar windows."""
+    starts = np.arange(0, n - window + 1, step or window, dtype=np.int64)
+    return np.column_stack([starts, starts + window])
+
+
+# ============================================================
+# Backtests of many windows at once
+# ============================================================
+def window_metrics(df, entries, exits, bounds, initial_capital=100000.0, slippage=0.0, commission=0.0):
+    """
+    Backtest every column of the (bars x strategies) ENTRY / EXIT matrices
+    on each [start, stop) window of `bounds`, as if df and the signals had
+    been sliced to the window (flat at its first bar, forced close at its
+    last).
+
+    Signals are taken as computed on the full history, so indicators are
+    already warmed up at a window's first bar (as they would be when
+    trading it live); nothing is recomputed per window.  Windows are
+    gathered into one padded (bars x windows*strategies) matrix, batched
+    to BATCH_BYTES, and backtested together (backtest_price_matrix).
+
+    Returns:
+        dict of (windows x strategies) arrays: final_capital,
+        total_return_pct, max_drawdown_pct, num_trades
+    """
+    df = as_frame(df)
+    entries = np.asarray(entries, dtype=bool)
+    exits = np.asarray(exits, dtype=bool)
+    if entries.ndim == 1:
+        entries, exits = entries[:, None], exits[:, None]
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 2)
+    opens = df["open"].to_numpy(dtype=float)
+    closes = df["close"].to_numpy(dtype=float)
+
+    strategies = entries.shape[1]
+    lengths = bounds[:, 1] - bounds[:, 0]
+    if (lengths < 1).any() or bounds.min(initial=0) < 0 or bounds.max(initial=0) > len(df):
+        raise ValueError("every window needs 0 <= start < stop <= len(df)")
+
+    results = {name: np.empty((len(bounds), strategies),
+                              dtype=np.int64 if name == "num_trades" else np.float64)
+               for name in METRICS}
+
+    with stage("walk_forward.backtest", rows=int(lengths.sum()) * strategies):
+        # Position state over the full history.  A window starts flat, but
+        # from its first single-flag bar on its state is the full-history
+        # state (position_state); before that only the parity of the
+        # toggles (ENTRY and EXIT on one bar) since its start counts.
+        held = position_state(entries, exits)
+        bars = np.arange(len(df), dtype=np.int32)[:, None]
+        next_forced = np.where(entries != exits, bars, np.int32(len(df)))
+        next_forced = np.minimum.accumulate(next_forced[::-1], axis=0)[::-1]
+        toggles = np.cumsum(entries & exits, axis=0, dtype=np.uint8)     # parity survives wrapping
+
+        # similar lengths share a batch, so little of it is padding
+        order = np.argsort(lengths, kind="stable")
+        longest = int(lengths.max(initial=1))
+        per_batch = max(1, BATCH_BYTES // (8 * longest * strategies))
+        for first in range(0, len(bounds), per_batch):
+            batch = order[first:first + per_batch]
+            start, length = bounds[batch, 0], lengths[batch]
+            rows, count = int(length.max()), len(batch) * strategies
+
+            # bar positions of each window, the last one repeated as padding
+            positions = start + np.minimum(np.arange(rows)[:, None], length - 1)
+            toggles_before = np.where((start > 0)[:, None], toggles[np.maximum(start - 1, 0)], 0)
+            window_held = np.where(positions[:, :, None] < next_forced[start],
+                                   ((toggles[positions] - toggles_before) & 1).astype(bool),
+                                   held[positions])
+
+            metrics = backtest_price_matrix(
+                np.repeat(opens[positions], strategies, axis=1),
+                np.repeat(closes[positions], strategies, axis=1),
+                entries[positions].reshape(rows, count),
+                exits[positions].reshape(rows, count),
+                initial_capital, slippage, commission,
+                stops=np.repeat(length, strategies),
+                held=window_held.reshape(rows, count),
+            )
+            for name in METRICS:
+                results[name][batch] = metrics[name].reshape(len(batch), strategies)
+    return results
+
+
+def _strategy_signals(dsl_texts, df):
+    """Parse the strategies and evaluate them once over the full history."""
+    texts = [dsl_texts] if isinstance(dsl_texts, str) else list(dsl_texts)
+    with stage("walk_forward.evaluate", rows=len(df) * len(texts)):
+        asts = [parse_dsl_to_ast(text) for text in texts]
+        for final_ast in asts:
+            require_no_risk_exits(final_ast, "walk_forward")
+        entries, exits = BatchEvaluator(df, asts).signal_matrices(asts)
+    return texts, entries, exits
+
+
+# ============================================================
+# Entry points
+# ============================================================
+def walk_forward(dsl_texts, df, train, test, step=None, anchored=False, metric="total_return_pct",
+                 initial_capital=100000.0, slippage=0.0, commission=0.0):
+    """
+    Walk-forward analysis of one or many candidate DSL strategies.
+
+    In every window the candidate with the best train-window `metric`
+    (highest value) is selected and its test-window result reported.  All
+    candidates are evaluated once over the full history (shared indicators,
+    BatchEvaluator); each train and test window is then only a slice of
+    those signals, backtested together with the other windows.
+
+    Returns:
+        DataFrame, one row per window: train_start / train_end / test_start /
+        test_end (index labels, ends inclusive), strategy (position in
+        dsl_texts), dsl, train_<metric>, and the test window's
+        final_capital, total_return_pct, max_drawdown_pct, num_trades
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric!r} (expected one of {METRICS})")
+    df = as_frame(df)
+    texts, entries, exits = _strategy_signals(dsl_texts, df)
+    windows = walk_forward_windows(len(df), train, test, step, anchored)
+
+    # train and test windows in one call: one full-history position state
+    metrics = window_metrics(df, entries, exits, np.vstack([windows[:, :2], windows[:, 2:]]),
+                             initial_capital, slippage, commission)
+    trained = {name: values[:len(windows)] for name, values in metrics.items()}
+    tested = {name: values[len(windows):] for name, values in metrics.items()}
+
+    # candidates with no usable train score (NaN) are never selected
+    score = np.where(np.isnan(trained[metric]), -np.inf, trained[metric])
+    best = score.argmax(axis=1)
+    rows = np.arange(len(windows))
+
+    labels = df.index
+    results = pd.DataFrame({
+        "train_start": labels[windows[:, 0]],
+        "train_end": labels[windows[:, 1] - 1],
+        "test_start": labels[windows[:, 2]],
+        "test_end": labels[windows[:, 3] - 1],
+        "strategy": best,
+        "dsl": [texts[k] for k in best],
+        f"train_{metric}": trained[metric][rows, best],
+    })
+    for name in METRICS:
+        results[name] = tested[name][rows, best]
+    results.index.name = "window"
+    return results
+
+
+def rolling_backtest(dsl_texts, df, window, step=None, initial_capital=100000.0, slippage=0.0,
+                     commission=0.0):
+    """
+    Backtest one or many DSL strategies on every `window`-bar window
+    (advancing by `step`, default `window`) of the history.
+
+    Returns:
+        DataFrame, one row per (window, strategy): start / end (index
+        labels, end inclusive), strategy, final_capital, total_return_pct,
+        max_drawdown_pct, num_trades
+    """
+    df = as_frame(df)
+    texts, entries, exits = _strategy_signals(dsl_texts, df)
+    bounds = rolling_windows(len(df), window, step)
+    metrics = window_metrics(df, entries, exits, bounds, initial_capital, slippage, commission)
+
+    strategies = len(texts)
+    results = pd.DataFrame({
+        "window": np.repeat(np.arange(len(bounds)), strategies),
+        "start": df.index[np.repeat(bounds[:, 0], strategies)],
+        "end": df.index[np.repeat(bounds[:, 1] - 1, strategies)],
+        "strategy": np.tile(np.arange(strategies), len(bounds)),
+    })
+    for name in METRICS:
+        results[name] = metrics[name].ravel()
+    return results